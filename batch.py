@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Batch Z80 Disassembler:
+
+    Disassembles many ROM files in one run. Starting dasm.py once per ROM
+    means paying for the interpreter start up and building the decode
+    tables every time, which for small 4-16KB ROMs is most of the run time.
+    Here the tables are built once and the files are shared out to a pool
+    of worker processes (which inherit the tables when they are forked).
+
+    The arguments can be files, directories (all the files below them) or
+    glob patterns. Each file's listing, in the same format as dasm.py, is
+    written to <outdir>/<name>.asm and a manifest of what was done is
+    written to <outdir>/manifest.json.
+
+    Undefined op-codes and truncated instructions do not stop a file (they
+    are listed as data, as dasm.py --keep-going) but are counted in the
+    manifest so suspicious images can be found without reprocessing them.
+
+        ./batch.py -d <outdir> [-j <jobs>] <file|dir|glob> ...
+"""
+from glob import glob
+import json
+import multiprocessing
+from optparse import OptionParser
+import os
+import sys
+from decoder import disassemble_lenient, new_anomalies
+from listing import write_listing, write_symbols
+from symbols import SymbolIndex
+
+OUTPUT_EXTENSION = '.asm'
+MANIFEST_NAME = 'manifest.json'
+JOB_CHUNK_SIZE = 16
+
+def _is_output( path, outdir ) :
+    """Is path the output directory (a real path, or None if there is not
+        one) or a listing or manifest written below it
+    """
+    if outdir is None :
+        return( False )
+    path = os.path.realpath( path )
+    if path == outdir :
+        return( True )
+
+    return( os.path.commonpath(( path, outdir )) == outdir and
+            ( path.endswith( OUTPUT_EXTENSION ) or os.path.basename( path ) == MANIFEST_NAME ))
+
+def find_files( paths, outdir=None ) :
+    """Expand the command line arguments into a list of ( input file,
+        output name ) pairs. Directories are walked and the output name
+        keeps the path below the directory. If the output directory is
+        given it is not walked (it may be inside an input directory) and
+        the listings and manifest below it are left out, so an earlier
+        run's output is never taken as input.
+    """
+    if outdir is not None :
+        outdir = os.path.realpath( outdir )
+    found = []
+    for path in paths :
+        if os.path.isdir( path ) :
+            for ( dirpath, dirnames, filenames ) in os.walk( path ) :
+                dirnames[ : ] = sorted( name for name in dirnames
+                                        if not _is_output( os.path.join( dirpath, name ), outdir ))
+                for filename in sorted( filenames ) :
+                    filepath = os.path.join( dirpath, filename )
+                    if not _is_output( filepath, outdir ) :
+                        found.append(( filepath, os.path.relpath( filepath, path )))
+        elif os.path.exists( path ) :
+            if not _is_output( path, outdir ) :
+                found.append(( path, os.path.basename( path )))
+        else :
+            for filepath in sorted( glob( path )) :
+                if os.path.isfile( filepath ) and not _is_output( filepath, outdir ) :
+                    found.append(( filepath, os.path.basename( filepath )))
+
+    # Two inputs with the same name (e.g. from different globs) must not
+    # overwrite each other's output
+    names = set()
+    files = []
+    for ( filepath, name ) in found :
+        output_name = name
+        count = 1
+        while output_name in names :
+            output_name = '{}.{}'.format( name, count )
+            count += 1
+        names.add( output_name )
+        files.append(( filepath, output_name + OUTPUT_EXTENSION ))
+
+    return( files )
+
+def disassemble_file( job ) :
+    """Worker: disassemble one file and write its listing. Any error is
+        caught and reported in the summary so one bad ROM does not stop
+        the batch.
+    """
+    ( filepath, output ) = job
+    summary = { 'file' : filepath, 'output' : output, 'bytes' : 0,
+                'lines' : 0, 'symbols' : 0, 'anomalies' : new_anomalies(), 'error' : None }
+    try :
+        with open( filepath, 'rb' ) as fh :
+            memory = fh.read()
+        summary[ 'bytes' ] = len( memory )
+
+        os.makedirs( os.path.dirname( output ) or '.', exist_ok=True )
+        symbols = SymbolIndex()
+        with open( output, 'w' ) as out :
+            summary[ 'lines' ] = write_listing( disassemble_lenient( memory, anomalies=summary[ 'anomalies' ] ),
+                                                out, symbols )
+            write_symbols( symbols.symbol_table(), out )
+        summary[ 'symbols' ] = len( symbols )
+
+    except Exception as e :
+        summary[ 'error' ] = '{}: {}'.format( type( e ).__name__, e )
+
+    return( summary )
+
+def run_batch( paths, outdir, workers=None ) :
+    """Disassemble every file found from paths into outdir using a pool of
+        workers and write the manifest. Returns the list of summaries.
+    """
+    if workers is None :
+        workers = multiprocessing.cpu_count()
+
+    jobs = [( filepath, os.path.join( outdir, output ))
+            for ( filepath, output ) in find_files( paths, outdir )]
+    os.makedirs( outdir, exist_ok=True )
+
+    if workers > 1 :
+        with multiprocessing.Pool( workers ) as pool :
+            summaries = list( pool.imap( disassemble_file, jobs, JOB_CHUNK_SIZE ))
+    else :
+        summaries = [ disassemble_file( job ) for job in jobs ]
+
+    with open( os.path.join( outdir, MANIFEST_NAME ), 'w' ) as fh :
+        json.dump( summaries, fh, indent=1 )
+
+    return( summaries )
+
+if __name__ == "__main__" :
+    parser = OptionParser()
+    parser.add_option( '-d', '--outdir', dest='outdir', default=None)
+    parser.add_option( '-j', '--jobs', dest='jobs', type='int', default=None)
+    (opt, args) = parser.parse_args()
+
+    if not opt.outdir or not args :
+        print( 'usage: -d <outdir> | --outdir <outdir> [-j <jobs>] <file|dir|glob> ...')
+        sys.exit(1)
+
+    summaries = run_batch( args, opt.outdir, opt.jobs )
+    failed = [ summary for summary in summaries if summary[ 'error' ]]
+    for summary in failed :
+        print( '{}: {}'.format( summary[ 'file' ], summary[ 'error' ] ), file=sys.stderr )
+
+    print( '{} files, {} failed, manifest in {}'.format(
+            len( summaries ), len( failed ), os.path.join( opt.outdir, MANIFEST_NAME )))
+    sys.exit( 1 if failed else 0 )
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Benchmarks:
+
+    Simple timings for the parts of the disassembler that have been tuned.
+    Run with the names of the benchmarks to run (default all of them):
+
+        ./benchmark.py [listing | import | starts ...]
+
+    The test image is built from every defined op-code in turn so that all
+    of the decode tables are exercised.
+"""
+import os
+import subprocess
+import sys
+import time
+from decoder import disassemble, encode, MNEMONICS, LENGTHS, LAYOUTS, OPERAND_WORD
+
+IMAGE_SIZE = 1024 * 1024
+IMPORT_RUNS = 20
+
+# Import decoder.py with the snapshot turned off, so the tables are loaded
+# from opcode.py and compiled as they were before there was a snapshot
+COMPILE_IMPORT = 'import snapshot; snapshot.load = lambda *args : None; import decoder'
+
+def make_image( size=IMAGE_SIZE ) :
+    """Build a test image of at least size bytes out of every defined
+        op-code, with incrementing values for the operand bytes
+    """
+    encodings = []
+    value = 0
+    for entry in range( len( LENGTHS )) :
+        if MNEMONICS[ entry ] is None :
+            continue
+
+        encodings.append( encode( entry, value if LAYOUTS[ entry ] == OPERAND_WORD else value & 0xff ))
+        value = ( value + 0x0101 ) % 0x10000
+
+    block = b''.join( encodings )
+    return( block * ( size // len( block ) + 1 ))
+
+def report( name, count, seconds, unit ) :
+    print( '{:24s} {:10d} {} in {:7.3f}s = {:12.0f} {}/s'.format(
+            name, count, unit, seconds, count / seconds, unit ))
+
+def bench_listing( image ) :
+    """Lines per second for the listing output: one print() per line (as
+        dasm.py used to) against the buffered listing writer.
+    """
+    from dasm import get_opcode
+    from listing import write_listing
+    from symbols import SymbolIndex
+
+    with open( os.devnull, 'w' ) as out :
+        start = time.perf_counter()
+        pc = 0
+        count = 0
+        mem_size = len( image )
+        symbol_table = {}
+        while pc < mem_size :
+            ( pc, prt_pc, prt_op, mne, symbol_table ) = get_opcode( pc, image, symbol_table )
+            print( '{} {} :           {}'.format( prt_pc, prt_op, mne ), file=out )
+            count += 1
+        report( 'listing print()', count, time.perf_counter() - start, 'lines' )
+
+        start = time.perf_counter()
+        count = write_listing( disassemble( image ), out, SymbolIndex() )
+        report( 'listing write_listing()', count, time.perf_counter() - start, 'lines' )
+
+def _start_up_times( codes ) :
+    """The best time, over IMPORT_RUNS runs, to start Python and run each
+        piece of code. The runs are interleaved so that anything else going
+        on affects them all alike.
+    """
+    directory = os.path.dirname( os.path.abspath( __file__ ))
+    best = [ None ] * len( codes )
+    for run in range( IMPORT_RUNS ) :
+        for ( index, code ) in enumerate( codes ) :
+            start = time.perf_counter()
+            subprocess.run([ sys.executable, '-c', code ], cwd=directory, check=True )
+            elapsed = time.perf_counter() - start
+            if best[ index ] is None or elapsed < best[ index ] :
+                best[ index ] = elapsed
+
+    return( best )
+
+def bench_import( image ) :
+    """Start up time of a new process importing decoder.py: reading the
+        table snapshot against loading opcode.py and compiling the tables.
+        The time for Python to start with no imports is taken off both.
+    """
+    names = ( 'import snapshot', 'import opcode.py+compile' )
+    ( python, *times ) = _start_up_times(( 'pass', 'import decoder', COMPILE_IMPORT ))
+    for ( name, elapsed ) in zip( names, times ) :
+        print( '{:24s} {:10.3f} ms per import (best of {})'.format(
+                name, ( elapsed - python ) * 1000, IMPORT_RUNS ))
+
+def bench_starts( image ) :
+    """Instruction start addresses per second: from the disassemble()
+        records against boundaries.py with and without NumPy
+    """
+    from boundaries import instruction_starts, numpy
+
+    start = time.perf_counter()
+    count = len([ instruction.address for instruction in disassemble( image )])
+    report( 'starts disassemble()', count, time.perf_counter() - start, 'starts' )
+
+    start = time.perf_counter()
+    count = len( instruction_starts( image, use_numpy=False ))
+    report( 'starts python', count, time.perf_counter() - start, 'starts' )
+
+    if numpy is None :
+        print( 'starts numpy             not installed' )
+    else :
+        start = time.perf_counter()
+        count = len( instruction_starts( image, use_numpy=True ))
+        report( 'starts numpy', count, time.perf_counter() - start, 'starts' )
+
+BENCHMARKS = {
+    'listing' : bench_listing,
+    'import' : bench_import,
+    'starts' : bench_starts,
+}
+
+if __name__ == "__main__" :
+    names = sys.argv[ 1: ] or list( BENCHMARKS )
+    for name in names :
+        if name not in BENCHMARKS :
+            print( 'unknown benchmark: {} (choose from {})'.format( name, ', '.join( BENCHMARKS )))
+            sys.exit(1)
+
+    image = make_image()
+    for name in names :
+        BENCHMARKS[ name ]( image )
@@ -0,0 +1,51 @@
+"""Binary File Helpers:
+
+    The cache, signature index, control flow graph, symbol index and decoder
+    snapshot files are all written the same way: a header followed by the
+    little endian contents of some arrays.
+
+        - to_bytes              An array as little endian bytes
+        - from_bytes            An array of typecode read back from them
+        - atomic_write          Writes a file via a temporary file in the
+                                same directory and renames it into place, so
+                                a reader never sees half of it
+"""
+from array import array
+import os
+import sys
+
+def to_bytes( values ) :
+    """The little endian bytes of an array (byte swapped into a copy on a
+        big endian machine)
+    """
+    if sys.byteorder != 'little' :
+        values = array( values.typecode, values )
+        values.byteswap()
+    return( values.tobytes() )
+
+def from_bytes( typecode, data ) :
+    """An array of typecode read from little endian bytes
+    """
+    values = array( typecode )
+    values.frombytes( data )
+    if sys.byteorder != 'little' :
+        values.byteswap()
+    return( values )
+
+def atomic_write( path, data ) :
+    """Write data (a bytes-like object, or a sequence of them written one
+        after the other) to path
+    """
+    if isinstance( data, ( bytes, bytearray, memoryview )) :
+        data = ( data, )
+
+    temp_path = '{}.{}.tmp'.format( path, os.getpid() )
+    try :
+        with open( temp_path, 'wb' ) as fh :
+            for part in data :
+                fh.write( part )
+        os.replace( temp_path, path )
+    except BaseException :
+        if os.path.exists( temp_path ) :
+            os.remove( temp_path )
+        raise
@@ -0,0 +1,200 @@
+"""Instruction Boundaries:
+
+    For a linear sweep where each instruction starts only depends on the
+    lengths of the ones before it, so the start addresses can be found
+    without building an Instruction (or any text) for each op-code.
+    instruction_starts() returns them as an array, which answers 'how many
+    instructions and where do they start' and lets the decoding and
+    rendering be shared out on exact instruction boundaries.
+
+    If NumPy is installed the work is done on whole arrays:
+
+        - lengths               The decode table entry, and so the length,
+                                of an instruction starting at every byte is
+                                found in one gather over the image (with the
+                                prefix bytes and the 'DD CB' / 'FD CB'
+                                indexed bit op-codes handled the same way as
+                                decoder.opcode_entry())
+        - chain                 The image is cut into blocks. The real chain
+                                of instructions enters a block at one of its
+                                first MAX_INSTRUCTION_LENGTH bytes, so a
+                                walker is started from each of them, all of
+                                the blocks at once, to find where each leaves
+                                its block. Following those exits from block
+                                to block picks out the real entry of each
+                                block and a second walk from just those
+                                entries marks the start addresses.
+
+    The walks take one array operation per step, and a block is at most
+    MAX_BLOCK_SIZE steps long, so there is very little Python work per byte.
+    Without NumPy the chain is followed one instruction at a time, which is
+    still quicker than disassemble() as no records are made.
+
+    Like disassemble() an undefined op-code raises a KeyError and an
+    instruction that runs off the end of memory an IndexError, both from
+    decoder.decode() on the instruction that failed.
+"""
+from array import array
+import importlib.machinery
+import importlib.util
+from math import isqrt
+import os
+import sys
+import sysconfig
+from decoder import decode, opcode_entry, PREFIXES, LENGTHS, INDEXED_TABLES, SOURCE_DIRECTORY, \
+                    EXTENDED_OPCODE_OFFSET, INDEXED_OPCODE_OFFSET, MAX_INSTRUCTION_LENGTH
+
+def _import_numpy() :
+    """NumPy, or None if it is not installed. NumPy imports the standard
+        library's opcode module (through inspect and dis), which opcode.py
+        here hides when this directory is first on the path. If it has not
+        been imported yet the standard library module is loaded from the
+        standard library directory, under its own name, before NumPy is
+        imported; sys.path is left alone.
+    """
+    if importlib.util.find_spec( 'numpy' ) is None :
+        return( None )
+
+    if 'opcode' not in sys.modules :
+        spec = importlib.util.find_spec( 'opcode' )
+        if spec is not None and os.path.dirname( os.path.abspath( spec.origin )) == SOURCE_DIRECTORY :
+            spec = importlib.machinery.PathFinder.find_spec( 'opcode', [ sysconfig.get_path( 'stdlib' )] )
+            module = importlib.util.module_from_spec( spec )
+            sys.modules[ 'opcode' ] = module
+            try :
+                spec.loader.exec_module( module )
+            except BaseException :
+                del sys.modules[ 'opcode' ]
+                raise
+
+    try :
+        import numpy
+    except ImportError :
+        numpy = None
+
+    return( numpy )
+
+numpy = _import_numpy()
+
+MIN_BLOCK_SIZE = 64
+MAX_BLOCK_SIZE = 4096
+# How many steps the walkers take between checks that they are all done
+STEPS_PER_CHECK = 16
+
+def _raise_at( memory, pc ) :
+    """Raise the error that decoding the (bad) instruction at pc does
+    """
+    decode( memory, pc )
+    raise IndexError( 'instruction at {:04X} runs off the end of memory'.format( pc ))
+
+def _python_starts( memory, start, end ) :
+    mem_size = len( memory )
+    starts = array( 'q' )
+    pc = start
+    while pc < end :
+        starts.append( pc )
+        length = LENGTHS[ opcode_entry( pc, memory ) ]
+        if pc + length > mem_size :
+            _raise_at( memory, pc )
+        pc += length
+
+    return( starts )
+
+def instruction_lengths( memory, start=0, end=None ) :
+    """NumPy array of the length of the instruction that would start at each
+        byte from start to end, 0 where the op-code is not defined. Bytes past
+        the end of memory are read as 0 so a length near the end can overrun it.
+    """
+    if end is None :
+        end = len( memory )
+
+    window = numpy.frombuffer( memory, dtype=numpy.uint8 )[ start:end + MAX_INSTRUCTION_LENGTH - 1 ]
+    size = end - start
+    values = numpy.zeros( size + MAX_INSTRUCTION_LENGTH - 1, dtype=numpy.int16 )
+    values[ :len( window ) ] = window
+
+    entries = numpy.array( PREFIXES, dtype=numpy.int16 )[ values[ :size ]]
+    entries = numpy.where( entries != 0,
+                           entries + values[ EXTENDED_OPCODE_OFFSET:EXTENDED_OPCODE_OFFSET + size ],
+                           values[ :size ] )
+    for ( entry, table ) in INDEXED_TABLES.items() :
+        indexed = entries == entry
+        entries[ indexed ] = table + values[ INDEXED_OPCODE_OFFSET:INDEXED_OPCODE_OFFSET + size ][ indexed ]
+
+    return( numpy.array( LENGTHS, dtype=numpy.uint8 )[ entries ] )
+
+def _numpy_starts( memory, start, end ) :
+    size = end - start
+    if size <= 0 :
+        return( array( 'q' ))
+
+    # The next instruction after each byte, relative to start. Anything at
+    # or past end goes to the terminal index size, and an undefined or
+    # truncated instruction to the bad index size + 1 (both loop on
+    # themselves so a walker stops there).
+    lengths = instruction_lengths( memory, start, end )
+    terminal = size
+    bad = size + 1
+    following = numpy.arange( size + 2, dtype=numpy.int64 )
+    following[ :size ] += lengths
+    failed = ( lengths == 0 ) | ( following[ :size ] + start > len( memory ))
+    numpy.minimum( following[ :size ], terminal, out=following[ :size ] )
+    following[ :size ][ failed ] = bad
+
+    block_size = min( max( isqrt( size ), MIN_BLOCK_SIZE ), MAX_BLOCK_SIZE )
+    blocks = ( size + block_size - 1 ) // block_size
+    block_starts = numpy.arange( blocks, dtype=numpy.int64 ) * block_size
+    block_ends = numpy.minimum( block_starts + block_size, terminal )
+
+    # Where a walker from each of the first bytes of every block leaves it
+    position = numpy.minimum(( block_starts[ :, None ] + numpy.arange( MAX_INSTRUCTION_LENGTH )).ravel(), terminal )
+    limits = numpy.repeat( block_ends, MAX_INSTRUCTION_LENGTH )
+    while True :
+        for step in range( STEPS_PER_CHECK ) :
+            position = numpy.where( position < limits, following[ position ], position )
+        if ( position >= limits ).all() :
+            break
+    exits = position.tolist()
+
+    # Follow the real chain from block to block
+    entries = []
+    pc = 0
+    for block in range( blocks ) :
+        entries.append( pc )
+        pc = exits[ block * MAX_INSTRUCTION_LENGTH + pc - block * block_size ]
+        if pc == bad :
+            pc = entries[ -1 ]
+            while following[ pc ] != bad :
+                pc = int( following[ pc ] )
+            _raise_at( memory, start + pc )
+        if pc == terminal :
+            break
+
+    # Mark every instruction on the chain from the entries found
+    position = numpy.array( entries, dtype=numpy.int64 )
+    limits = block_ends[ :len( entries ) ]
+    is_start = numpy.zeros( size + 1, dtype=numpy.bool_ )
+    while True :
+        for step in range( STEPS_PER_CHECK ) :
+            is_start[ position ] = True
+            position = following[ position ]
+        if ( position >= limits ).all() :
+            break
+
+    starts = numpy.flatnonzero( is_start[ :size ] ).astype( numpy.int64 ) + start
+    return( array( 'q', starts.tobytes() ))
+
+def instruction_starts( memory, start=0, end=None, use_numpy=None ) :
+    """Array of the address of every instruction that disassemble() would
+        decode from start until end (or the end of memory). NumPy is used if
+        it is installed unless use_numpy is False.
+    """
+    if end is None :
+        end = len( memory )
+    if use_numpy is None :
+        use_numpy = numpy is not None
+
+    if use_numpy :
+        return( _numpy_starts( memory, start, end ))
+    else :
+        return( _python_starts( memory, start, end ))
@@ -0,0 +1,481 @@
+"""Decode Cache:
+
+    Keeps the decoded instruction stream and symbol table of images that
+    have already been disassembled, so re-running on an unchanged image goes
+    straight to rendering the listing.
+
+    The cache key is a hash of the image bytes and of the decode tables, so a
+    change to opcode.py never serves a stale decode. Each entry is one file in
+    the cache directory holding:
+
+        - header                MAGIC, format version and the counts
+        - op-codes              Op-code bytes of each instruction, without
+                                its operand or displacement (8 bit, one to
+                                three per instruction)
+        - byte operands         Operand of each instruction with a one byte
+                                operand, in order (8 bit)
+        - word operands         Operand of each instruction with a two byte
+                                operand, in order (16 bit)
+        - symbols               Symbol addresses in the order they were added
+                                to the symbol table (signed 32 bit)
+        - reference targets     Target of every instruction that references
+                                a symbol, sorted (signed 32 bit)
+        - reference addresses   Address of each of those instructions, in
+                                the same order (signed 32 bit)
+        - checkpoints           For each 256 byte block of the image, the
+                                address, op-code position, byte operand and
+                                word operand index of the first instruction
+                                that starts in or after it (32 bit, four
+                                each)
+
+    The instruction addresses are not stored as a linear sweep starts at 0 and
+    each instruction follows the last. The op-code bytes give the decode table
+    entry, whose layout says which operand list (if any) the operand is in, so
+    an entry is a little over the size of the image plus 8 bytes for each
+    reference. The checkpoints let a walk over the instructions start at any
+    block rather than at 0. Reading an entry touches its
+    modified time and the oldest files are removed to make room before a new
+    entry is written, so the cache never grows past its size limit and behaves
+    as a least recently used cache. An entry bigger than the whole limit is
+    not written at all.
+
+    An image that was patched from one already in the cache is not decoded
+    from scratch: Entry.patch() re-decodes the window around each run of
+    bytes that changed (see incremental.py) and splices it into the arrays of
+    the old entry, moving the references and checkpoints with it.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+import hashlib
+import os
+import struct
+from binio import to_bytes, from_bytes, atomic_write
+from decoder import disassemble, symbol_label, Instruction, MNEMONICS, LENGTHS, \
+                    LAYOUTS, PREFIXES, TABLE_PREFIXES, TABLE_SIZE, TABLE_DDCB, INDEXED_TABLES, \
+                    OPERAND_NONE, OPERAND_WORD, OPERAND_INDEXED_BYTE, EXTENDED_CB, MAX_INSTRUCTION_LENGTH, \
+                    WORD_FORMAT
+
+MAGIC = b'Z80D'
+FORMAT_VERSION = 3
+HEADER = struct.Struct( '<4sIIIIIIII' )
+CHECKPOINT_SIZE = 256
+CACHE_EXTENSION = '.z80d'
+CACHE_SIZE = 256 * 1024 * 1024
+
+def _opcode_tables() :
+    """The op-code bytes stored for each entry, and the table each prefix
+        entry leads on to (0 if the entry is an instruction)
+    """
+    opcode_bytes = []
+    for entry in range( len( LAYOUTS )) :
+        table = entry // TABLE_SIZE
+        prefix = bytes(( TABLE_PREFIXES[ table ], )) if table else b''
+        if entry >= TABLE_DDCB :
+            prefix += bytes(( EXTENDED_CB, ))
+        opcode_bytes.append( prefix + bytes(( entry % TABLE_SIZE, )))
+
+    next_tables = list( PREFIXES ) + [ 0 ] * ( len( LAYOUTS ) - TABLE_SIZE )
+    for ( entry, table ) in INDEXED_TABLES.items() :
+        next_tables[ entry ] = table
+
+    return( opcode_bytes, next_tables )
+
+( OPCODE_BYTES, NEXT_TABLES ) = _opcode_tables()
+
+_table_version = None
+
+def table_version() :
+    """A hash of the decode tables, worked out the first time it is needed
+    """
+    global _table_version
+    if _table_version is None :
+        digest = hashlib.blake2b( digest_size=16 )
+        for ( mnenomic, length, layout ) in zip( MNEMONICS, LENGTHS, LAYOUTS ) :
+            digest.update( '{}|{}|{}\n'.format( mnenomic, length, layout ).encode( 'utf-8' ))
+        _table_version = digest.digest()
+
+    return( _table_version )
+
+def cache_key( memory ) :
+    digest = hashlib.blake2b( table_version(), digest_size=20 )
+    digest.update( memory )
+    return( digest.hexdigest() )
+
+class Entry :
+    """A decode as it is kept in the cache (see the file layout above). The
+        references are two parallel arrays sorted by target and then by the
+        address of the referencing instruction. checkpoints holds four
+        numbers for each CHECKPOINT_SIZE bytes of the image, the address and
+        op-code, byte operand and word operand positions of the first
+        instruction that starts at or after the block (or of the end).
+    """
+    __slots__ = ( 'instruction_count', 'opcodes', 'byte_operands', 'word_operands', 'symbols',
+                  'reference_targets', 'reference_addresses', 'checkpoints' )
+
+    def __init__( self ) :
+        self.instruction_count = 0
+        self.opcodes = bytearray()
+        self.byte_operands = array( 'B' )
+        self.word_operands = array( 'H' )
+        self.symbols = array( 'i' )
+        self.reference_targets = array( 'i' )
+        self.reference_addresses = array( 'i' )
+        self.checkpoints = array( 'I' )
+
+    def size( self ) :
+        """The size in bytes of the cache file
+        """
+        return( HEADER.size + len( self.opcodes ) + len( self.byte_operands ) + 2 * len( self.word_operands ) +
+                4 * ( len( self.symbols ) + 2 * len( self.reference_targets ) + len( self.checkpoints )))
+
+    def _walk( self, block ) :
+        """Generator of ( address, op-code position, byte operand position,
+            word operand position, entry, operand ) for each instruction from
+            the checkpoint of block on
+        """
+        ( pc, position, byte_index, word_index ) = self.checkpoints[ 4 * block:4 * block + 4 ]
+        opcodes = self.opcodes
+        byte_operands = self.byte_operands
+        word_operands = self.word_operands
+        count = len( opcodes )
+        while position < count :
+            start = position
+            entry = opcodes[ position ]
+            position += 1
+            table = NEXT_TABLES[ entry ]
+            while table :
+                entry = table + opcodes[ position ]
+                position += 1
+                table = NEXT_TABLES[ entry ]
+
+            layout = LAYOUTS[ entry ]
+            if layout == OPERAND_NONE :
+                yield( pc, start, byte_index, word_index, entry, None )
+            elif layout == OPERAND_WORD or layout == OPERAND_INDEXED_BYTE :
+                yield( pc, start, byte_index, word_index, entry, word_operands[ word_index ] )
+                word_index += 1
+            else :
+                yield( pc, start, byte_index, word_index, entry, byte_operands[ byte_index ] )
+                byte_index += 1
+            pc += LENGTHS[ entry ]
+
+    def _references( self, target ) :
+        """The ( first, end ) positions of the references to target
+        """
+        first = bisect_left( self.reference_targets, target )
+        return( first, bisect_right( self.reference_targets, target, first ))
+
+    def _first_reference( self, target ) :
+        """The address of the first instruction that references target (None
+            if none does)
+        """
+        ( first, end ) = self._references( target )
+        return( self.reference_addresses[ first ] if first < end else None )
+
+    def _symbol_position( self, address ) :
+        """Where a symbol first referenced from address goes in symbols
+        """
+        ( low, high ) = ( 0, len( self.symbols ))
+        while low < high :
+            middle = ( low + high ) // 2
+            if self._first_reference( self.symbols[ middle ] ) < address :
+                low = middle + 1
+            else :
+                high = middle
+
+        return( low )
+
+    def _update_references( self, removed, added ) :
+        """Replace the removed ( target, address ) references with the added
+            ones, and move the symbols whose first reference changes
+        """
+        targets = { target for ( target, address ) in removed + added }
+        # Take the symbols out while their first references are the old ones
+        positions = [ self._symbol_position( first ) for first in map( self._first_reference, targets )
+                      if first is not None ]
+        for position in sorted( positions, reverse=True ) :
+            del self.symbols[ position ]
+
+        for ( target, address ) in removed :
+            ( first, end ) = self._references( target )
+            index = bisect_left( self.reference_addresses, address, first, end )
+            del self.reference_targets[ index ]
+            del self.reference_addresses[ index ]
+        for ( target, address ) in added :
+            ( first, end ) = self._references( target )
+            index = bisect_left( self.reference_addresses, address, first, end )
+            self.reference_targets.insert( index, target )
+            self.reference_addresses.insert( index, address )
+
+        for target in targets :
+            first = self._first_reference( target )
+            if first is not None :
+                self.symbols.insert( self._symbol_position( first ), target )
+
+    def patch( self, memory, changes ) :
+        """Update the decode for the patched memory (the same size), where
+            changes is a list of ( start, end ) byte ranges that have changed
+            (see incremental.changed_ranges()). Only the instructions around
+            each change are decoded and spliced into the arrays. Returns the
+            number of instructions that were decoded.
+
+            An undefined or truncated instruction raises the error from
+            decode() and leaves the entry as it was before that change.
+        """
+        from incremental import decode_window
+
+        decoded = 0
+        # From the end back, so a change never moves the positions of the
+        # ones still to be patched
+        for ( change_start, change_end ) in sorted( changes, reverse=True ) :
+            # The first instruction that could have read a changed byte (an
+            # instruction never looks further than MAX_INSTRUCTION_LENGTH
+            # bytes from its start) and the ones after it
+            start = max( 0, change_start - MAX_INSTRUCTION_LENGTH + 1 )
+            old = self._walk( start // CHECKPOINT_SIZE )
+            first = next( record for record in old if record[ 0 ] >= start )
+            walked = [ first ]
+            def old_starts() :
+                for record in old :
+                    walked.append( record )
+                    yield( record[ 0 ] )
+
+            starts = old_starts()
+            ( instructions, pc, truncated ) = decode_window( memory, first[ 0 ], change_end, starts )
+            if truncated is not None :
+                raise truncated
+            if pc < len( memory ) :
+                last = walked.pop()[ 1:4 ]
+            else :
+                for address in starts :
+                    pass
+                last = ( len( self.opcodes ), len( self.byte_operands ), len( self.word_operands ))
+
+            ( position, byte_index, word_index ) = first[ 1:4 ]
+            opcodes = bytearray()
+            byte_operands = array( 'B' )
+            word_operands = array( 'H' )
+            states = []
+            for instruction in instructions :
+                states.append(( instruction.address, position + len( opcodes ), byte_index + len( byte_operands ),
+                                word_index + len( word_operands )))
+                entry = instruction.entry
+                opcodes += OPCODE_BYTES[ entry ]
+                layout = LAYOUTS[ entry ]
+                if layout == OPERAND_WORD or layout == OPERAND_INDEXED_BYTE :
+                    word_operands.append( instruction.operand )
+                elif layout != OPERAND_NONE :
+                    byte_operands.append( instruction.operand )
+            end_state = ( pc, position + len( opcodes ), byte_index + len( byte_operands ),
+                          word_index + len( word_operands ))
+
+            self.opcodes[ position:last[ 0 ]] = opcodes
+            self.byte_operands[ byte_index:last[ 1 ]] = byte_operands
+            self.word_operands[ word_index:last[ 2 ]] = word_operands
+            self.instruction_count += len( instructions ) - len( walked )
+
+            removed = []
+            for ( address, opcode_position, byte_position, word_position, entry, operand ) in walked :
+                target = Instruction( address, entry, operand ).target
+                if target is not None :
+                    removed.append(( target, address ))
+            self._update_references( removed, [( instruction.target, instruction.address )
+                                               for instruction in instructions if instruction.target is not None ] )
+
+            # The checkpoints in the window are worked out again and the ones
+            # after it move with the arrays
+            checkpoints = self.checkpoints
+            shifts = [ new - old for ( new, old ) in zip( end_state[ 1: ], last )]
+            index = 0
+            for block in range( first[ 0 ] // CHECKPOINT_SIZE + 1, len( checkpoints ) // 4 ) :
+                address = block * CHECKPOINT_SIZE
+                if address <= pc :
+                    while index < len( states ) and states[ index ][ 0 ] < address :
+                        index += 1
+                    checkpoints[ 4 * block:4 * block + 4 ] = array( 'I', states[ index ] if index < len( states )
+                                                                         else end_state )
+                else :
+                    for field in range( 3 ) :
+                        checkpoints[ 4 * block + 1 + field ] += shifts[ field ]
+
+            decoded += len( instructions )
+
+        return( decoded )
+
+def save( path, entry ) :
+    """Write an Entry to a cache file
+    """
+    atomic_write( path, ( HEADER.pack( MAGIC, FORMAT_VERSION, entry.instruction_count, len( entry.opcodes ),
+                                       len( entry.byte_operands ), len( entry.word_operands ), len( entry.symbols ),
+                                       len( entry.reference_targets ), len( entry.checkpoints )),
+                          entry.opcodes, to_bytes( entry.byte_operands ), to_bytes( entry.word_operands ),
+                          to_bytes( entry.symbols ), to_bytes( entry.reference_targets ),
+                          to_bytes( entry.reference_addresses ), to_bytes( entry.checkpoints )))
+
+def load( path ) :
+    """Read an Entry from a cache file, or None if the file is not a valid
+        cache file
+    """
+    with open( path, 'rb' ) as fh :
+        data = fh.read()
+
+    if len( data ) < HEADER.size :
+        return( None )
+    ( magic, version, instruction_count, opcode_count, byte_count, word_count, symbol_count,
+      reference_count, checkpoint_count ) = HEADER.unpack_from( data )
+    sizes = ( opcode_count, byte_count, 2 * word_count, 4 * symbol_count, 4 * reference_count,
+              4 * reference_count, 4 * checkpoint_count )
+    if magic != MAGIC or version != FORMAT_VERSION or len( data ) != HEADER.size + sum( sizes ) :
+        return( None )
+
+    parts = []
+    offset = HEADER.size
+    for size in sizes :
+        parts.append( data[ offset:offset + size ] )
+        offset += size
+    entry = Entry()
+    entry.instruction_count = instruction_count
+    entry.opcodes = bytearray( parts[ 0 ] )
+    for ( name, typecode, part ) in zip( Entry.__slots__[ 2: ], 'BHiiiI', parts[ 1: ] ) :
+        setattr( entry, name, from_bytes( typecode, part ))
+
+    return( entry )
+
+def evict( cache_dir, max_bytes=CACHE_SIZE ) :
+    """Remove the least recently used cache files until the cache is no
+        bigger than max_bytes
+    """
+    files = []
+    total = 0
+    for name in os.listdir( cache_dir ) :
+        if name.endswith( CACHE_EXTENSION ) :
+            path = os.path.join( cache_dir, name )
+            stat = os.stat( path )
+            files.append(( stat.st_mtime, stat.st_size, path ))
+            total += stat.st_size
+
+    files.sort()
+    for ( mtime, size, path ) in files :
+        if total <= max_bytes :
+            break
+        try :
+            os.remove( path )
+        except FileNotFoundError :
+            pass
+        total -= size
+
+def instructions( opcodes, byte_operands, word_operands, start=0 ) :
+    """Generator that rebuilds the Instruction records of a linear sweep from
+        the cached arrays, without decoding anything
+    """
+    byte_operands = iter( byte_operands )
+    word_operands = iter( word_operands )
+    pc = start
+    table = 0
+    for value in opcodes :
+        entry = table + value
+        table = NEXT_TABLES[ entry ]
+        if table :
+            continue
+
+        layout = LAYOUTS[ entry ]
+        if layout == OPERAND_NONE :
+            yield Instruction( pc, entry )
+        elif layout == OPERAND_WORD or layout == OPERAND_INDEXED_BYTE :
+            yield Instruction( pc, entry, next( word_operands ))
+        else :
+            yield Instruction( pc, entry, next( byte_operands ))
+        pc += LENGTHS[ entry ]
+
+def _new_entry( records, size ) :
+    """The cache Entry for the Instruction records of a linear sweep of size
+        bytes
+    """
+    entry = Entry()
+    opcodes = entry.opcodes
+    byte_operands = entry.byte_operands
+    word_operands = entry.word_operands
+    symbols = entry.symbols
+    checkpoints = entry.checkpoints
+    references = []
+    seen = set()
+    checkpoint = 0
+    for instruction in records :
+        pc = instruction.address
+        while pc >= checkpoint :
+            checkpoints.extend(( pc, len( opcodes ), len( byte_operands ), len( word_operands )))
+            checkpoint += CHECKPOINT_SIZE
+        entry.instruction_count += 1
+        entry_number = instruction.entry
+        opcodes += OPCODE_BYTES[ entry_number ]
+        layout = LAYOUTS[ entry_number ]
+        if layout == OPERAND_WORD or layout == OPERAND_INDEXED_BYTE :
+            word_operands.append( instruction.operand )
+        elif layout != OPERAND_NONE :
+            byte_operands.append( instruction.operand )
+        target = instruction.target
+        if target is not None :
+            references.append(( target, pc ))
+            if target not in seen :
+                seen.add( target )
+                symbols.append( target )
+
+    while checkpoint < size :
+        checkpoints.extend(( size, len( opcodes ), len( byte_operands ), len( word_operands )))
+        checkpoint += CHECKPOINT_SIZE
+    references.sort()
+    entry.reference_targets = array( 'i', [ target for ( target, address ) in references ] )
+    entry.reference_addresses = array( 'i', [ address for ( target, address ) in references ] )
+
+    return( entry )
+
+def _entry_path( cache_dir, memory ) :
+    return( os.path.join( cache_dir, cache_key( memory ) + CACHE_EXTENSION ))
+
+def _load_entry( path ) :
+    """The cache entry in path (touching it as it is used) or None
+    """
+    cached = None
+    if os.path.exists( path ) :
+        cached = load( path )
+    if cached is not None :
+        os.utime( path )
+
+    return( cached )
+
+def cached_decode( memory, cache_dir, max_bytes=CACHE_SIZE, names=None, base=None ) :
+    """Linear sweep disassembly of memory through the cache. Returns
+        ( instructions, symbol_table ) where instructions is a generator of
+        Instruction records and symbol_table is the symbol table dictionary
+        as dasm.py builds it (with the labels from names where it has them).
+
+        base is the image that memory was patched from, if there is one. If
+        memory is not in the cache but base is (and is the same size) the
+        cached decode of base is patched (see Entry.patch()) instead of
+        decoding all of memory again.
+    """
+    os.makedirs( cache_dir, exist_ok=True )
+    path = _entry_path( cache_dir, memory )
+    entry = _load_entry( path )
+
+    if entry is None :
+        if base is not None and len( base ) == len( memory ) :
+            entry = _load_entry( _entry_path( cache_dir, base ))
+            if entry is not None :
+                from incremental import changed_ranges
+                entry.patch( memory, changed_ranges( base, memory ))
+        if entry is None :
+            entry = _new_entry( disassemble( memory ), len( memory ))
+
+        # Make room for the new entry first so the cache is never bigger
+        # than max_bytes, even for a moment
+        size = entry.size()
+        if size <= max_bytes :
+            evict( cache_dir, max_bytes - size )
+            save( path, entry )
+
+    symbol_table = {}
+    for address in entry.symbols :
+        symbol_table[ symbol_label( address, names ) ] = WORD_FORMAT.format( address )
+
+    return( instructions( entry.opcodes, entry.byte_operands, entry.word_operands ), symbol_table )
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""Control Flow Graph:
+
+    Cuts the decoded instructions into basic blocks and links them into a
+    control flow graph. A block starts at every jump, relative jump, DJNZ,
+    call or RST target (the branch targets that go into the symbol table)
+    and after a gap (bytes that were not decoded) and ends after a jump,
+    relative jump, DJNZ or return (see BLOCK_ENDS). A call does not end a
+    block as control comes back to the next instruction.
+
+    Building a graph out of an object per block and per edge costs far more
+    than the instructions in it, so the graph is kept in flat integer arrays
+    instead (a compressed sparse row layout), in the order of the blocks'
+    addresses:
+
+        - starts                The first address of each block
+        - ends                  One past the last address of each block
+        - offsets               Where each block's edges start in successors,
+                                plus one for the end
+        - successors            The block each edge goes to
+        - kinds                 How each edge is taken (one byte apiece):
+
+            - EDGE_NEXT         Carries on to the next block (or a condition
+                                was not met, DJNZ ended...)
+            - EDGE_JUMP         The jump, relative jump or DJNZ is taken
+            - EDGE_CALL         A CALL or RST in the block
+
+    A 64KB image comes to a few hundred KB. Targets that are not the start
+    of a block (outside the image, in data or part way into an instruction)
+    have no edge.
+
+    The graph can be written out as a Graphviz DOT file or as a binary file
+    that is read back with a single read:
+
+        - header                MAGIC, format version, the number of blocks
+                                and of edges
+        - starts, ends          (64 bit)
+        - offsets, successors   (64 bit)
+        - kinds                 (8 bit)
+
+        ./cfg.py [-r | --follow] [-s <symbol file>] [-d <dot file>] [-o <cfg file>] <binfile>
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from optparse import OptionParser
+import struct
+import sys
+from binio import to_bytes, from_bytes, atomic_write
+from decoder import disassemble_lenient, symbol_label, WORD_FORMAT
+from flow import disassemble_flow, branch_target, FLOWS, FLOW_NEXT, FLOW_BRANCH, RST_TARGETS, \
+                 DEFAULT_ENTRY_POINTS
+from symbols import REFERENCE_KINDS, REF_CALL
+
+EDGE_NEXT = 0
+EDGE_JUMP = 1
+EDGE_CALL = 2
+EDGE_NAMES = ( 'next', 'jump', 'call' )
+# How each kind of edge is drawn in a DOT file
+EDGE_STYLES = ( '', ' [style=bold]', ' [style=dashed]' )
+
+MAGIC = b'Z80G'
+FORMAT_VERSION = 1
+HEADER = struct.Struct( '<4sIQQ' )
+NO_TARGET = -1
+FLUSH_LINES = 4096
+
+def _is_call( entry ) :
+    return( REFERENCE_KINDS[ entry ] == REF_CALL or RST_TARGETS[ entry ] is not None )
+
+# Instructions that end a block (control does not simply carry on to the
+# next one and it is not a call) and the ones that start a routine
+BLOCK_ENDS = [ flow != FLOW_NEXT and not _is_call( entry ) for ( entry, flow ) in enumerate( FLOWS ) ]
+CALLS = [ _is_call( entry ) for entry in range( len( FLOWS )) ]
+# Instructions that can carry on to the next block
+FALLS_THROUGH = [ flow in ( FLOW_NEXT, FLOW_BRANCH ) for flow in FLOWS ]
+
+class ControlFlowGraph :
+    """The basic blocks and edges of an image: block i runs from starts[ i ]
+        up to ends[ i ] and its edges are successors[ offsets[ i ]:offsets[ i + 1 ]]
+        (block indexes) taken as the same slice of kinds.
+    """
+    __slots__ = ( 'starts', 'ends', 'offsets', 'successors', 'kinds' )
+
+    def __init__( self ) :
+        self.starts = array( 'q' )
+        self.ends = array( 'q' )
+        self.offsets = array( 'q', [ 0 ] )
+        self.successors = array( 'q' )
+        self.kinds = array( 'B' )
+
+    def __len__( self ) :
+        return( len( self.starts ))
+
+    def block( self, address ) :
+        """The index of the block that address is in (None if it is not in
+            one)
+        """
+        index = bisect_right( self.starts, address ) - 1
+        if index >= 0 and address < self.ends[ index ] :
+            return( index )
+
+        return( None )
+
+    def edges( self, index ) :
+        """List of ( successor block, edge kind ) for the edges of a block
+        """
+        first = self.offsets[ index ]
+        last = self.offsets[ index + 1 ]
+        return( list( zip( self.successors[ first:last ], self.kinds[ first:last ] )))
+
+    def edge_count( self ) :
+        return( len( self.successors ))
+
+def build_cfg( records ) :
+    """The ControlFlowGraph of the records (Instructions and Data, in address
+        order) of a sweep or of disassemble_flow()
+    """
+    # Only the numbers that are needed are kept from each instruction, not
+    # the records
+    addresses = array( 'q' )
+    next_addresses = array( 'q' )
+    entries = array( 'H' )
+    targets = array( 'q' )
+    leaders = set()
+    for record in records :
+        entry = record.entry
+        if entry is None :
+            continue
+        target = branch_target( record )
+        if target is None :
+            target = NO_TARGET
+        else :
+            leaders.add( target )
+        addresses.append( record.address )
+        next_addresses.append( record.next_address )
+        entries.append( entry )
+        targets.append( target )
+
+    # The blocks, with the index of the last instruction of each
+    cfg = ControlFlowGraph()
+    starts = cfg.starts
+    ends = cfg.ends
+    lasts = array( 'q' )
+    end = None
+    for ( index, address ) in enumerate( addresses ) :
+        if end is not None and ( address != end or address in leaders ) :
+            ends.append( end )
+            lasts.append( index - 1 )
+            end = None
+
+        if end is None :
+            starts.append( address )
+        end = next_addresses[ index ]
+
+        if BLOCK_ENDS[ entries[ index ]] :
+            ends.append( end )
+            lasts.append( index )
+            end = None
+
+    if end is not None :
+        ends.append( end )
+        lasts.append( len( addresses ) - 1 )
+
+    # The edges of each block: its calls, then where the last instruction
+    # goes
+    successors = cfg.successors
+    kinds = cfg.kinds
+    block_count = len( starts )
+    first = 0
+    for ( index, last ) in enumerate( lasts ) :
+        edges = []
+        for instruction in range( first, last + 1 ) :
+            if CALLS[ entries[ instruction ]] and targets[ instruction ] != NO_TARGET :
+                edges.append(( targets[ instruction ], EDGE_CALL ))
+        entry = entries[ last ]
+        if BLOCK_ENDS[ entry ] and targets[ last ] != NO_TARGET :
+            edges.append(( targets[ last ], EDGE_JUMP ))
+        if FALLS_THROUGH[ entry ] :
+            edges.append(( ends[ index ], EDGE_NEXT ))
+
+        seen = set()
+        for ( target, kind ) in edges :
+            successor = bisect_left( starts, target )
+            if successor < block_count and starts[ successor ] == target and ( successor, kind ) not in seen :
+                seen.add(( successor, kind ))
+                successors.append( successor )
+                kinds.append( kind )
+        cfg.offsets.append( len( successors ))
+        first = last + 1
+
+    return( cfg )
+
+def image_cfg( memory, follow=False, entry_points=DEFAULT_ENTRY_POINTS ) :
+    """The ControlFlowGraph of an image from a lenient linear sweep, or by
+        following the code from the entry points
+    """
+    if follow :
+        return( build_cfg( disassemble_flow( memory, entry_points )))
+
+    return( build_cfg( disassemble_lenient( memory )))
+
+def save_cfg( cfg, path ) :
+    """Write the graph as a binary file
+    """
+    atomic_write( path, [ HEADER.pack( MAGIC, FORMAT_VERSION, len( cfg ), cfg.edge_count() )] +
+                        [ to_bytes( values ) for values in ( cfg.starts, cfg.ends, cfg.offsets, cfg.successors )] +
+                        [ cfg.kinds.tobytes() ] )
+
+def load_cfg( path ) :
+    """Read a graph written by save_cfg()
+    """
+    with open( path, 'rb' ) as fh :
+        data = fh.read()
+
+    if len( data ) < HEADER.size :
+        raise ValueError( '{} is not a control flow graph'.format( path ))
+    ( magic, version, block_count, edge_count ) = HEADER.unpack_from( data )
+    if magic != MAGIC or version != FORMAT_VERSION or \
+       len( data ) != HEADER.size + 8 * ( 3 * block_count + 1 + edge_count ) + edge_count :
+        raise ValueError( '{} is not a control flow graph'.format( path ))
+
+    cfg = ControlFlowGraph()
+    position = HEADER.size
+    for ( name, count ) in (( 'starts', block_count ), ( 'ends', block_count ),
+                            ( 'offsets', block_count + 1 ), ( 'successors', edge_count )) :
+        setattr( cfg, name, from_bytes( 'q', data[ position:position + 8 * count ] ))
+        position += 8 * count
+    cfg.kinds.frombytes( data[ position: ] )
+
+    return( cfg )
+
+def write_dot( cfg, out=None, names=None, flush_lines=FLUSH_LINES ) :
+    """Write the graph to out (default STDOUT) as a Graphviz DOT digraph.
+        Each block is labelled with its address range and the name of its
+        start address if names (address -> name) has one. Jumps are drawn
+        bold and calls dashed.
+    """
+    if out is None :
+        out = sys.stdout
+
+    flush_lines = max( flush_lines, 1 )
+    lines = [ 'digraph cfg {\n', '    node [shape=box fontname=monospace];\n' ]
+    for ( index, ( start, end )) in enumerate( zip( cfg.starts, cfg.ends )) :
+        label = WORD_FORMAT.format( start ) + '-' + WORD_FORMAT.format( end - 1 )
+        if names and start in names :
+            label = symbol_label( start, names ) + '\\n' + label
+        lines.append( '    b{} [label="{}"];\n'.format( index, label ))
+        for ( successor, kind ) in cfg.edges( index ) :
+            lines.append( '    b{} -> b{}{};\n'.format( index, successor, EDGE_STYLES[ kind ] ))
+        if len( lines ) >= flush_lines :
+            out.write( ''.join( lines ))
+            lines.clear()
+    lines.append( '}\n' )
+
+    out.write( ''.join( lines ))
+
+if __name__ == "__main__" :
+    parser = OptionParser()
+    parser.add_option( '-r', '--follow', dest='follow', action='store_true', default=False)
+    parser.add_option( '-s', '--symbols', dest='symbol_file', default=None)
+    parser.add_option( '-d', '--dot', dest='dot', default=None)
+    parser.add_option( '-o', '--output', dest='output', default=None)
+    (opt, args) = parser.parse_args()
+
+    if len( args ) != 1 :
+        print( 'usage: [-r | --follow] [-s <symbol file>] [-d <dot file>] [-o <cfg file>] <binfile>')
+        sys.exit(1)
+
+    try :
+        names = None
+        if opt.symbol_file :
+            from symfile import load_symbols
+            names = load_symbols( opt.symbol_file )
+        with open( args[ 0 ], 'rb' ) as fh :
+            cfg = image_cfg( fh.read(), opt.follow )
+
+        if opt.output :
+            save_cfg( cfg, opt.output )
+        if opt.dot :
+            with open( opt.dot, 'w' ) as out :
+                write_dot( cfg, out, names )
+        elif not opt.output :
+            write_dot( cfg, sys.stdout, names )
+
+    except Exception as e :
+        print( e )
+        sys.exit(1)
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""ROM Comparison:
+
+    Text diffs of two listings are no use once code has moved, as every
+    address and every reference to it changes. This compares two images by
+    their structure instead:
+
+        - blocks                Each image is decoded and cut into the
+                                basic blocks of its control flow graph (see
+                                cfg.py): a block ends after a jump, relative
+                                jump, DJNZ or return and a new one starts at
+                                every jump or call target. A block's key is
+                                its decode table entries, so the addresses
+                                and values are masked. A run of bytes that
+                                is not decoded is a block of its own, keyed
+                                by the bytes.
+        - alignment             The two lists of block keys are aligned as a
+                                patience diff does: the keys found exactly
+                                once in each are matched, the longest run of
+                                them that is in the same order in both is
+                                kept and the gaps between are aligned the same
+                                way, along with the blocks that match at the
+                                start and end of each gap. A gap with no
+                                unique keys left is given to difflib if it is
+                                small (SMALL_GAP blocks or less a side).
+        - changes               The blocks that are not matched, and matched
+                                blocks whose byte values (not the addresses)
+                                differ, are grouped into runs and reported
+                                as deleted, inserted or changed, with the
+                                routine (the CALL or RST target, or the start
+                                of the image) each run is in.
+
+    Each step is close to linear in the number of blocks, so firmware
+    revisions can be compared in bulk.
+
+        ./compare.py [-r | --follow] <old binfile> <new binfile>
+"""
+from bisect import bisect_left, bisect_right
+from difflib import SequenceMatcher
+from optparse import OptionParser
+import sys
+from decoder import disassemble_lenient, symbol_label, LAYOUTS, WORD_FORMAT, \
+                    OPERAND_BYTE, OPERAND_INDEXED, OPERAND_INDEXED_BYTE
+from flow import disassemble_flow, branch_target, DEFAULT_ENTRY_POINTS
+from cfg import build_cfg, CALLS
+
+SMALL_GAP = 64
+
+CHANGE_DELETED = 'deleted'
+CHANGE_INSERTED = 'inserted'
+CHANGE_CHANGED = 'changed'
+NO_RANGE = 9 * '-'
+CHANGE_FORMAT = '{:9s} {:9s} {:9s} {}\n'
+
+# Layouts where the operand is a value rather than an address
+VALUE_LAYOUTS = ( OPERAND_BYTE, OPERAND_INDEXED, OPERAND_INDEXED_BYTE )
+
+class Blocks :
+    """The basic blocks of an image: for block i, starts[ i ] and ends[ i ]
+        are its first and (one past the) last address, keys[ i ] its key and
+        values[ i ] its byte values. routines is the sorted list of routine
+        start addresses.
+    """
+    __slots__ = ( 'starts', 'ends', 'keys', 'values', 'routines' )
+
+    def __init__( self, records ) :
+        records = list( records )
+        routines = { records[ 0 ].address } if records else set()
+        for record in records :
+            if record.entry is not None and CALLS[ record.entry ] :
+                target = branch_target( record )
+                if target is not None :
+                    routines.add( target )
+
+        self.starts = []
+        self.ends = []
+        self.keys = []
+        self.values = []
+        self.routines = sorted( routines )
+
+        # The code blocks are the ones in the control flow graph, so the two
+        # always agree; the runs that were not decoded go in between them
+        cfg = build_cfg( records )
+        block = 0
+        entries = []
+        values = []
+        for record in records :
+            entry = record.entry
+            if entry is None :
+                self._add( record.address, record.next_address, ( bytes( record.values ), ), () )
+                continue
+
+            if record.address == cfg.starts[ block ] :
+                entries = []
+                values = []
+            entries.append( entry )
+            if LAYOUTS[ entry ] in VALUE_LAYOUTS :
+                values.append( record.operand )
+
+            if record.next_address == cfg.ends[ block ] :
+                self._add( cfg.starts[ block ], cfg.ends[ block ], entries, values )
+                block += 1
+
+    def _add( self, start, end, entries, values ) :
+        self.starts.append( start )
+        self.ends.append( end )
+        self.keys.append( tuple( entries ))
+        self.values.append( tuple( values ))
+
+    def __len__( self ) :
+        return( len( self.starts ))
+
+    def routine( self, address ) :
+        """The start of the routine that address is in (None if it is before
+            the first)
+        """
+        index = bisect_right( self.routines, address )
+        return( self.routines[ index - 1 ] if index else None )
+
+def _longest_increasing( pairs ) :
+    """The longest run of ( i, j ) pairs, already in i order, with j
+        increasing as well
+    """
+    tails = []
+    tail_indexes = []
+    previous = [ -1 ] * len( pairs )
+    for ( index, ( i, j )) in enumerate( pairs ) :
+        position = bisect_left( tails, j )
+        if position == len( tails ) :
+            tails.append( j )
+            tail_indexes.append( index )
+        else :
+            tails[ position ] = j
+            tail_indexes[ position ] = index
+        previous[ index ] = tail_indexes[ position - 1 ] if position else -1
+
+    run = []
+    index = tail_indexes[ -1 ] if tail_indexes else -1
+    while index >= 0 :
+        run.append( pairs[ index ] )
+        index = previous[ index ]
+    run.reverse()
+
+    return( run )
+
+def align( old_keys, new_keys ) :
+    """Sorted list of the ( old index, new index ) pairs of matching keys
+    """
+    matched = []
+    gaps = [( 0, len( old_keys ), 0, len( new_keys ))]
+    while gaps :
+        ( old_start, old_end, new_start, new_end ) = gaps.pop()
+
+        # The same blocks at the start and end of the gap
+        while old_start < old_end and new_start < new_end and old_keys[ old_start ] == new_keys[ new_start ] :
+            matched.append(( old_start, new_start ))
+            old_start += 1
+            new_start += 1
+        while old_start < old_end and new_start < new_end and old_keys[ old_end - 1 ] == new_keys[ new_end - 1 ] :
+            old_end -= 1
+            new_end -= 1
+            matched.append(( old_end, new_end ))
+        if old_start == old_end or new_start == new_end :
+            continue
+
+        # Keys found once on each side
+        counts = {}
+        for index in range( old_start, old_end ) :
+            ( count, position ) = counts.get( old_keys[ index ], ( 0, None ))
+            counts[ old_keys[ index ]] = ( count + 1, index )
+        unique = {}
+        for index in range( new_start, new_end ) :
+            key = new_keys[ index ]
+            if counts.get( key, ( 0, ))[ 0 ] == 1 :
+                unique[ key ] = None if key in unique else index
+        anchors = _longest_increasing( sorted(( counts[ key ][ 1 ], index )
+                                              for ( key, index ) in unique.items() if index is not None ))
+
+        if not anchors :
+            if old_end - old_start <= SMALL_GAP and new_end - new_start <= SMALL_GAP :
+                matcher = SequenceMatcher( None, old_keys[ old_start:old_end ], new_keys[ new_start:new_end ],
+                                           autojunk=False )
+                for ( old_index, new_index, size ) in matcher.get_matching_blocks() :
+                    matched.extend(( old_start + old_index + offset, new_start + new_index + offset )
+                                   for offset in range( size ))
+            continue
+
+        matched.extend( anchors )
+        edges = [( old_start - 1, new_start - 1 )] + anchors + [( old_end, new_end )]
+        for (( old_before, new_before ), ( old_after, new_after )) in zip( edges, edges[ 1: ] ) :
+            if old_after - old_before > 1 or new_after - new_before > 1 :
+                gaps.append(( old_before + 1, old_after, new_before + 1, new_after ))
+
+    matched.sort()
+    return( matched )
+
+def compare( old, new ) :
+    """The changes from the Blocks old to the Blocks new, as a list of
+        ( kind, old block range, new block range ) where the ranges are
+        ( first, end ) block indexes
+    """
+    same = [( old_index, new_index ) for ( old_index, new_index ) in align( old.keys, new.keys )
+            if old.values[ old_index ] == new.values[ new_index ]]
+
+    changes = []
+    edges = [( -1, -1 )] + same + [( len( old ), len( new ))]
+    for (( old_before, new_before ), ( old_after, new_after )) in zip( edges, edges[ 1: ] ) :
+        old_range = ( old_before + 1, old_after )
+        new_range = ( new_before + 1, new_after )
+        if old_after - old_before > 1 and new_after - new_before > 1 :
+            changes.append(( CHANGE_CHANGED, old_range, new_range ))
+        elif old_after - old_before > 1 :
+            changes.append(( CHANGE_DELETED, old_range, new_range ))
+        elif new_after - new_before > 1 :
+            changes.append(( CHANGE_INSERTED, old_range, new_range ))
+
+    return( changes )
+
+def _address_range( blocks, block_range ) :
+    ( first, end ) = block_range
+    if first == end :
+        return( NO_RANGE )
+
+    return( WORD_FORMAT.format( blocks.starts[ first ] ) + '-' + WORD_FORMAT.format( blocks.ends[ end - 1 ] - 1 ))
+
+def _routine_label( blocks, block_range ) :
+    ( first, end ) = block_range
+    if first == end :
+        return( None )
+
+    routine = blocks.routine( blocks.starts[ first ] )
+    return( None if routine is None else symbol_label( routine ))
+
+def write_changes( old, new, changes, out ) :
+    """Write one line per change: the kind, the old and new address ranges
+        and the routine(s) it is in
+    """
+    lines = [ '; {} of {} blocks unchanged, {} changes\n'.format(
+                len( old ) - sum( end - first for ( kind, ( first, end ), new_range ) in changes ),
+                len( old ), len( changes )) ]
+    for ( kind, old_range, new_range ) in changes :
+        routines = [ label for label in ( _routine_label( old, old_range ), _routine_label( new, new_range ))
+                     if label ]
+        lines.append( CHANGE_FORMAT.format( kind, _address_range( old, old_range ),
+                                            _address_range( new, new_range ), ' -> '.join( routines )))
+
+    out.write( ''.join( lines ))
+
+def image_blocks( memory, follow=False ) :
+    """The Blocks of an image from a lenient linear sweep, or by following
+        the code from the default entry points
+    """
+    if follow :
+        return( Blocks( disassemble_flow( memory, DEFAULT_ENTRY_POINTS )))
+
+    return( Blocks( disassemble_lenient( memory )))
+
+if __name__ == "__main__" :
+    parser = OptionParser()
+    parser.add_option( '-r', '--follow', dest='follow', action='store_true', default=False)
+    (opt, args) = parser.parse_args()
+
+    if len( args ) != 2 :
+        print( 'usage: [-r | --follow] <old binfile> <new binfile>')
+        sys.exit(1)
+
+    try :
+        images = []
+        for path in args :
+            with open( path, 'rb' ) as fh :
+                images.append( image_blocks( fh.read(), opt.follow ))
+
+    except Exception as e :
+        print( e )
+        sys.exit(1)
+
+    ( old, new ) = images
+    write_changes( old, new, compare( old, new ), sys.stdout )
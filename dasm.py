@@ -9,6 +9,10 @@
     op-code size and if a label (address) needs to be generated for a symbol
     table. Normal opcode use the 'opcode' dictionary while the extended ones
     (see below) used their own: cb_opcode, dd_opcode, ed_opcode and fd_opcode.
+    The tables are generated from the Z80's encoding rules by tablegen.py
+    and compiled (see decoder.py) when the code starts into lists
+    that are indexed by the byte value, so no string formatting is needed to
+    find an op-code.
 
     The Z80 op-codes are fairly simple for most hex-values but the ones starting
     with '0xCB', '0xDD', '0xED' and '0xFD' have extended features that need to
@@ -30,53 +34,115 @@
 from optparse import OptionParser
 import os
 import sys
-from opcode import opcode, cb_opcode, dd_opcode, ed_opcode, fd_opcode
+from decoder import decode, disassemble, disassemble_lenient, add_symbol, new_anomalies, \
+                    ANOMALY_UNDEFINED, ANOMALY_TRUNCATED
+from listing import write_listing, write_symbols, write_xref, FLUSH_LINES
+from symbols import SymbolIndex
+from image import map_file, load_image, map_records, MemoryMap
+from hexfile import is_hex_file, load_hex_file
+from flow import disassemble_flow, DEFAULT_ENTRY_POINTS
 
 def init() :
     """This just handle the argument processing and reading in the dumped
-        ROM into memory for later processing
+        ROM into memory for later processing. The parsed options are
+        returned as well as the memory.
     """
     parser = OptionParser()
     parser.add_option( '-b', '--bin', dest='binfile', default=None)
+    parser.add_option( '-s', '--symbols', dest='symbol_file', default=None)
+    parser.add_option( '-m', '--mmap', dest='mmap', action='store_true', default=False)
+    parser.add_option( '--org', dest='org', default=None)
+    parser.add_option( '--segment', dest='segments', action='append', default=None)
+    parser.add_option( '-o', '--output', dest='output', default=None)
+    parser.add_option( '--flush-lines', dest='flush_lines', type='int', default=FLUSH_LINES)
+    parser.add_option( '-j', '--jobs', dest='jobs', type='int', default=1)
+    parser.add_option( '-r', '--follow', dest='follow', action='store_true', default=False)
+    parser.add_option( '-e', '--entry', dest='entry_points', action='append', default=None)
+    parser.add_option( '-k', '--keep-going', dest='keep_going', action='store_true', default=False)
+    parser.add_option( '-x', '--xref', dest='xref', action='store_true', default=False)
+    parser.add_option( '--sort-symbols', dest='sort_symbols', action='store_true', default=False)
+    parser.add_option( '--cache-dir', dest='cache_dir', default=None)
+    parser.add_option( '--cache-size', dest='cache_size', type='int', default=None)
+    parser.add_option( '--patched-from', dest='patched_from', default=None)
+    parser.add_option( '--stats', dest='stats', action='store_true', default=False)
+    parser.add_option( '--fill', dest='fill', type='int', default=None)
     (opt, arg) = parser.parse_args()
 
     if not opt.binfile :
-        print( 'usage: -b <binfile> | --bin <binfile>')
+        print( 'usage: -b <binfile> | --bin <binfile> [--org <hex address>] [--segment <binfile>@<hex address> ...]\n'
+               '       [-s <symbol file>] [-m | --mmap] [-o <outfile>] [--flush-lines <n>] [-j <jobs>]\n'
+               '       [-r | --follow] [-e <hex address> ...] [-x | --xref] [--sort-symbols]\n'
+               '       [--cache-dir <dir> [--cache-size <MB>] [--patched-from <binfile>]]\n'
+               '       [-k | --keep-going] [--stats] [--fill <min bytes>]')
         sys.exit(1)
 
     try:
-        with open( opt.binfile, 'rb' ) as fh :
-            memory = fh.read()
-    
+        # With a base address, more than one segment or an Intel HEX or
+        # S-record file (see hexfile.py) the memory is a MemoryMap (see
+        # image.py) addressed as the CPU sees it. The base address of a HEX
+        # file is added to the addresses in it.
+        start_addresses = []
+        if opt.org or opt.segments or is_hex_file( opt.binfile ) :
+            images = [( opt.binfile, int( opt.org or '0', 16 ))]
+            for segment in opt.segments or [] :
+                ( path, separator, base ) = segment.rpartition( '@' )
+                if not separator :
+                    raise ValueError( 'segment {} needs a base address: <binfile>@<hex address>'.format( segment ))
+                images.append(( path, int( base, 16 )))
+
+            memory = MemoryMap()
+            for ( path, base ) in images :
+                if is_hex_file( path ) :
+                    ( memory, start ) = load_hex_file( path, memory, base )
+                    if start is not None :
+                        start_addresses.append( start )
+                else :
+                    load_image( path, base, opt.mmap, memory )
+        else :
+            with open( opt.binfile, 'rb' ) as fh :
+                if opt.mmap :
+                    memory = map_file( fh )
+                else :
+                    memory = fh.read()
+
+        # The image the binfile was patched from, to patch its cached decode
+        opt.base = None
+        if opt.patched_from :
+            with open( opt.patched_from, 'rb' ) as fh :
+                opt.base = fh.read()
+
+        # The names for addresses (address -> name) from the symbol file
+        opt.names = None
+        if opt.symbol_file :
+            from symfile import load_symbols
+            opt.names = load_symbols( opt.symbol_file )
+
+        if opt.entry_points :
+            opt.entry_points = [ int( address, 16 ) for address in opt.entry_points ]
+        else :
+            # and the base address and the start address from a HEX file
+            opt.entry_points = DEFAULT_ENTRY_POINTS + tuple( start_addresses )
+            if opt.org :
+                opt.entry_points += ( int( opt.org, 16 ), )
+            elif isinstance( memory, MemoryMap ) and not start_addresses :
+                # A HEX file with no start address: the code is taken to
+                # start at the lowest address in it
+                ranges = memory.ranges()
+                if ranges and ranges[ 0 ][ 0 ] not in opt.entry_points :
+                    opt.entry_points += ( ranges[ 0 ][ 0 ], )
+
     except Exception as  e:
         print( e )
         sys.exit(1)
 
-    return( memory )
+    return( memory, opt )
 
 # Useful Constants...
 
-EXTENDED_CB = 0xcb
-EXTENDED_DD = 0xdd
-EXTENDED_ED = 0xed
-EXTENDED_FD = 0xfd
-
-OPCODE_NEEDS_BYTE = 2
-OPCODE_NEEDS_WORD = 3
-NORMAL_OPCODE_SIZE = 1
-EXTENDED_OPCODE_SIZE = 2
-EXTENDED_OPCODE_OFFSET = 1
-EXTEND_BYTE_OFFSET = 2
-EXTEND_HI_BYTE_OFFSET = 3
-NORMAL_BYTE_OFFSET = 1
-NORMAL_HI_BYTE_OFFSET = 2
-
-BYTE_FORMAT = '{:02X}'
-WORD_FORMAT = '{:04X}'
-ADDR_FORMAT = '{:02X}{:02X}'
 TAB_FORMAT  = '{:12.12s}'
+MEGABYTE = 1024 * 1024
 
-def get_opcode( pc, memory, symbol_table ) :
+def get_opcode( pc, memory, symbol_table, names=None ) :
     """Using the current program counter (PC), look in the loaded Z80
         memory and convert the hex-value to a mnemonic. The code returns:
 
@@ -87,111 +153,127 @@ def get_opcode( pc, memory, symbol_table ) :
             pretty_mnenomic:Printable mnemoic and symbols/values
             symbol_table:   New version of the symbol table dictionary
 
-        The code is fairly simple as it uses lookup tables to do the 
-        'heavy lifting'.
-    """
-    opcode_byte = memory[ pc ]
-    opcode_hex = BYTE_FORMAT.format( opcode_byte )
-    instruction_length = 0
-    low_byte = None
-    hi_byte = None
-    label = None
-    opcode_entry = opcode[ opcode_hex ]
-
-    # If this is one of the extended OP-codes that work out which table
-    # needs to be used and lookup that byte in it.
-    if not opcode_entry :
-        extended_opcode_hex = BYTE_FORMAT.format( memory[ pc + EXTENDED_OPCODE_OFFSET] )
-        if opcode_byte == EXTENDED_CB :
-            extended_opcode_entry = cb_opcode[ extended_opcode_hex ]
-        elif opcode_byte == EXTENDED_DD :
-            extended_opcode_entry = dd_opcode[ extended_opcode_hex ]
-        elif opcode_byte == EXTENDED_ED :
-            extended_opcode_entry = ed_opcode[ extended_opcode_hex ] 
-        elif opcode_byte == EXTENDED_FD :
-            extended_opcode_entry = fd_opcode[ extended_opcode_hex ] 
-        else :
-            print( 'Something very bad happened')
-            print( extended_opcode_hex )            
-            sys.exit(1)
-
-        ( mnenomic, instruction_length, symbols, relative_addr ) = extended_opcode_entry
+        If a names dictionary (address -> name, see symfile.py) is given the
+        labels are the names rather than SYM_XXXX where it has them.
 
-        # If the opcode uses a memory location then generate a symbol and workout the
-        # address (hi_byte and low_byte) for later conversion
-        if symbols :
-            number_value_bytes = instruction_length - EXTENDED_OPCODE_SIZE
-            low_byte = memory[pc + EXTEND_BYTE_OFFSET ]
-            if number_value_bytes == OPCODE_NEEDS_BYTE :
-                hi_byte = memory[pc + EXTEND_HI_BYTE_OFFSET ]
-
-        opcode_value =  BYTE_FORMAT.format( opcode_byte ) + " " + \
-                        BYTE_FORMAT.format( memory[ pc + EXTENDED_OPCODE_OFFSET] )
-
-    else :
-        ( mnenomic, instruction_length, symbols, relative_addr ) = opcode_entry
-
-        # If the opcode uses a memory location then generate a symbol and workout the
-        # address (hi_byte and low_byte) for later conversion
-        if symbols :
-            number_value_bytes = instruction_length - NORMAL_OPCODE_SIZE
-            low_byte = memory[pc + NORMAL_BYTE_OFFSET ]
-            if number_value_bytes == OPCODE_NEEDS_BYTE :
-                hi_byte = memory[pc + NORMAL_HI_BYTE_OFFSET ]
-        
-        opcode_value = BYTE_FORMAT.format( opcode_byte )
-
-    if low_byte == None :
-        pretty_mnenomic = mnenomic
-    elif hi_byte == None :
-        pretty_mnenomic = mnenomic.format( byte=low_byte )
-        opcode_value += " " + BYTE_FORMAT.format( low_byte )
-        
-        # Relative addressing is where the address is not absolute but
-        # based on the Z80's program counter (PC). This value is a
-        # signed 8-bit number so that it can address up and down memory
-        if relative_addr :
-            if low_byte > 127 :
-                rel_pc = low_byte - 256
-            else :
-                rel_pc = low_byte
-
-            label = 'SYM_' + WORD_FORMAT.format(pc + instruction_length + rel_pc)
-            symbol_table[ label ] = WORD_FORMAT.format(pc + instruction_length + rel_pc)
-            pretty_mnenomic += '  [{}]'.format(label)
-
-    else :
-        label = 'SYM_'+ ADDR_FORMAT.format(hi_byte, low_byte )
-        symbol_table[ label ] = ADDR_FORMAT.format(hi_byte, low_byte )
-        pretty_mnenomic = mnenomic.format( hi_byte=hi_byte, low_byte=low_byte ) + \
-                            '  [{}]'.format(label)
-        opcode_value += " " + BYTE_FORMAT.format( low_byte ) + \
-                         " " + BYTE_FORMAT.format( hi_byte )
+        The code is fairly simple as it uses the compiled lookup tables in
+        decoder.py to do the 'heavy lifting'. Code that does not need the
+        text should use decoder.decode() and skip the formatting.
+    """
+    instruction = decode( memory, pc )
+    add_symbol( instruction, symbol_table, names )
+    ( pretty_pc, opcode_value, pretty_mnenomic ) = instruction.render( names )
 
-    pretty_pc = WORD_FORMAT.format( pc )
-    
-    pc = pc + instruction_length
+    return ( instruction.next_address, pretty_pc, opcode_value, pretty_mnenomic, symbol_table )
 
-    opcode_value = '{:12.12s}'.format(opcode_value +  20*' ' )
+def sweep( memory, opt, anomalies=None ) :
+    """The records of a linear sweep of the whole of memory: lenient if an
+        anomalies dictionary is given and with the fill runs collapsed if
+        --fill was given. A MemoryMap is swept a segment at a time.
+    """
+    if isinstance( memory, MemoryMap ) :
+        return( map_records( memory, lambda data : sweep( data, opt, anomalies )))
+    if opt.fill :
+        from fill import disassemble_fill
+        return( disassemble_fill( memory, opt.fill, anomalies=anomalies ))
+    if anomalies is not None :
+        return( disassemble_lenient( memory, 0, len( memory ), anomalies ))
 
-    return ( pc, pretty_pc, opcode_value, pretty_mnenomic, symbol_table )
-                
+    return( disassemble( memory, 0, len( memory )))
 
 if __name__ == "__main__" :
-    memory = init()
+    ( memory, opt ) = init()
 
-    pc = 0
     mem_size = len(memory)
-    symbol_table = {}
+    symbols = SymbolIndex()
+    symbol_table = None
+    anomalies = new_anomalies() if opt.keep_going else None
+
+    if opt.output :
+        out = open( opt.output, 'w' )
+    else :
+        out = sys.stdout
 
     # This is a simple disassembly of the ROM and does not try to do any
     # logic follow analysis. Basically it starts a memory address 0000H 
     # and steps through memory until it runs out of opcodes to process
     # (mem_size). This means that it will disassemble any lookup tables
     # in memory but that was not seen as much of a problem.
-    while pc < mem_size :
-        ( pc, prt_pc, prt_op, mne, symbol_table ) = get_opcode( pc, memory, symbol_table )
-        print( '{} {} :           {}'.format( prt_pc, prt_op, mne ))
-    
-    for label in symbol_table :
-        print( '{} = {}'.format( label, symbol_table[ label ]))
+    #
+    # With more than one job the image is split into segments that are
+    # decoded by a pool of processes (see parallel.py), the output is the same.
+    #
+    # To only disassemble the code that can be reached from the entry points
+    # use --follow (see flow.py), everything else is listed as data.
+    #
+    # With a cache directory an image that has been seen before is not
+    # decoded again (see cache.py), the cross reference (--xref) and sorted
+    # symbols still need the symbols to be collected as the listing is written.
+    # An image patched from one in the cache (--patched-from) only has the
+    # instructions around the changed bytes decoded (see incremental.py).
+    #
+    # Normally an undefined op-code or an instruction cut off by the end of
+    # the ROM is an error. With --keep-going they are listed as data and
+    # counted (this does not use the cache).
+    #
+    # parallel.py and cache.py pull in multiprocessing and hashlib, which
+    # take longer to import than a small ROM takes to disassemble, so they
+    # are only imported when they are used.
+    #
+    # --stats writes instruction counts (see stats.py) instead of the listing,
+    # for the same instructions that --follow or --keep-going would list.
+    #
+    # --fill lists each run of at least that many FF or 00 bytes as one DEFS
+    # line (see fill.py). The runs are found before the sweep so it is done
+    # in this process, without the cache, as is an image at a base address
+    # or in segments.
+    mapped = isinstance( memory, MemoryMap )
+    ranges = memory.ranges() if mapped else None
+    if opt.stats :
+        from stats import Stats, write_stats
+        stats = Stats( mem_size, mapped=ranges )
+        if opt.follow :
+            stats.count( disassemble_flow( memory, opt.entry_points, ranges ))
+        else :
+            stats.count( sweep( memory, opt, anomalies ))
+        write_stats( stats, out )
+    elif opt.follow :
+        write_listing( disassemble_flow( memory, opt.entry_points, ranges ), out, symbols,
+                       opt.flush_lines, opt.names )
+    elif opt.fill or mapped :
+        write_listing( sweep( memory, opt, anomalies ), out, symbols, opt.flush_lines, opt.names )
+    elif opt.jobs > 1 :
+        from parallel import parallel_listing
+        parallel_listing( opt.binfile, out, symbols, opt.jobs, flush_lines=opt.flush_lines,
+                          anomalies=anomalies, names=opt.names )
+    elif opt.keep_going :
+        write_listing( sweep( memory, opt, anomalies ), out, symbols, opt.flush_lines, opt.names )
+    elif opt.cache_dir :
+        from cache import cached_decode, CACHE_SIZE
+        cache_size = CACHE_SIZE if opt.cache_size is None else opt.cache_size * MEGABYTE
+        ( instructions, symbol_table ) = cached_decode( memory, opt.cache_dir, cache_size, opt.names,
+                                                        opt.base )
+        if opt.xref or opt.sort_symbols :
+            write_listing( instructions, out, symbols, opt.flush_lines, opt.names )
+            symbol_table = None
+        else :
+            write_listing( instructions, out, None, opt.flush_lines, opt.names )
+    else :
+        write_listing( sweep( memory, opt ), out, symbols, opt.flush_lines, opt.names )
+
+    # The symbol table is in the order the symbols were found unless
+    # --sort-symbols is given
+    if not opt.stats :
+        if symbol_table is None :
+            symbol_table = symbols.symbol_table( opt.sort_symbols, opt.names )
+        write_symbols( symbol_table, out, opt.flush_lines )
+
+        if opt.xref :
+            write_xref( symbols, out, opt.flush_lines, opt.names )
+
+    if out is not sys.stdout :
+        out.close()
+
+    if anomalies and any( anomalies.values() ) :
+        print( 'warning: {} undefined op-codes, {} truncated instructions'.format(
+                anomalies[ ANOMALY_UNDEFINED ], anomalies[ ANOMALY_TRUNCATED ] ), file=sys.stderr )
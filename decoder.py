@@ -0,0 +1,635 @@
+"""Z80 Decode Tables:
+
+    The tables in opcode.py are keyed by the hex string of the op-code byte,
+    which is easy to read but means every instruction has to format a byte
+    into a string just to look it up. This module compiles those tables into
+    flat lists that are indexed directly by integer. The compiled lists are
+    shipped in decoder.snapshot (see snapshot.py, written by tablegen.py) so
+    that a run reads them back in one go instead of loading opcode.py and
+    compiling again. Importing this module never writes the snapshot: if it
+    is missing or out of date the tables are compiled in memory.
+
+    Every op-code is given an 'entry' number:
+
+        entry = table base + op-code byte
+
+    where the table base is 0 for the normal op-codes and a multiple of 256
+    for each of the extended sets ('CB', 'DD', 'ED' and 'FD'). PREFIXES maps
+    the first byte of an instruction to the base of its extended table (or 0
+    if the byte is a normal op-code) so the entry is found with two list
+    lookups and no string work.
+
+    The indexed bit instructions 'DD CB d xx' and 'FD CB d xx' have the
+    displacement before the op-code byte. Their tables (ddcb_opcode and
+    fdcb_opcode) are only looked at when the 'DD CB' / 'FD CB' entry is
+    found to be undefined, so they cost nothing for any other op-code.
+
+    The per-entry information is held in parallel lists, all indexed by entry:
+
+        - MNEMONICS             The raw mnemonic from opcode.py (None if the
+                                op-code is not defined)
+        - LENGTHS               How many bytes the instruction takes up (0 if
+                                the op-code is not defined)
+        - LAYOUTS               Where the value/address bytes are and how they
+                                are used (see OPERAND_* below)
+        - OPERAND_OFFSETS       Offset from the PC of the first value byte
+        - TEMPLATES             The mnemonic as a '%' template for the
+                                operand value (byte or 16 bit word), None if
+                                it has no value
+        - OPCODE_TEXT           The printable op-code byte(s) e.g. 'DD 21'
+
+    Decoding and printing are kept apart. decode() and disassemble() return
+    compact Instruction records (address, table entry and operand value) and
+    the text that dasm.py prints is only built when render() is called, so
+    code that only wants lengths, branch targets or statistics never does
+    any string work.
+
+    disassemble_stream() does the same linear sweep over a file that is read
+    in chunks, so images larger than memory can be disassembled.
+
+    decode() and disassemble() raise a KeyError for an undefined extended
+    op-code and an IndexError for an instruction that runs off the end of
+    memory. decode_lenient() and disassemble_lenient() carry on instead,
+    listing the bytes as DB data and counting the anomalies:
+
+        - ANOMALY_UNDEFINED     An undefined extended op-code. As on the Z80,
+                                a 'DD' or 'FD' prefix is treated as a NOP
+                                (one byte of data) and the next byte decoded
+                                as normal, and 'ED xx' as a two byte NOP.
+        - ANOMALY_TRUNCATED     The last instruction is cut off by the end of
+                                memory, its bytes are listed as data.
+"""
+import os
+import snapshot
+
+# Useful Constants...
+
+EXTENDED_CB = 0xcb
+EXTENDED_DD = 0xdd
+EXTENDED_ED = 0xed
+EXTENDED_FD = 0xfd
+
+OPCODE_NEEDS_BYTE = 2
+NORMAL_OPCODE_SIZE = 1
+EXTENDED_OPCODE_SIZE = 2
+EXTENDED_OPCODE_OFFSET = 1
+INDEXED_DISPLACEMENT_OFFSET = 2
+INDEXED_OPCODE_OFFSET = 3
+MAX_INSTRUCTION_LENGTH = 4
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# The compiled tables are kept in a snapshot next to opcode.tables (this is
+# tablegen.TABLES_FILE, named here so that tablegen.py is only imported when
+# the tables have to be compiled). SNAPSHOT_VERSION changes whenever
+# _compile() does.
+SOURCE_DIRECTORY = os.path.dirname( os.path.abspath( __file__ ))
+TABLES_FILE = os.path.join( SOURCE_DIRECTORY, 'opcode.tables' )
+SNAPSHOT_FILE = os.path.join( SOURCE_DIRECTORY, 'decoder.snapshot' )
+SNAPSHOT_VERSION = 1
+
+BYTE_FORMAT = '{:02X}'
+WORD_FORMAT = '{:04X}'
+ADDR_FORMAT = '{:02X}{:02X}'
+
+TABLE_SIZE = 256
+
+TABLE_BASE = 0 * TABLE_SIZE
+TABLE_CB = 1 * TABLE_SIZE
+TABLE_DD = 2 * TABLE_SIZE
+TABLE_ED = 3 * TABLE_SIZE
+TABLE_FD = 4 * TABLE_SIZE
+TABLE_DDCB = 5 * TABLE_SIZE
+TABLE_FDCB = 6 * TABLE_SIZE
+
+# The prefix byte for each table, indexed by entry // TABLE_SIZE
+TABLE_PREFIXES = ( 0, EXTENDED_CB, EXTENDED_DD, EXTENDED_ED, EXTENDED_FD,
+                   EXTENDED_DD, EXTENDED_FD )
+
+# The 'DD CB' and 'FD CB' entries lead on to the indexed bit tables
+INDEXED_TABLES = { TABLE_DD + EXTENDED_CB : TABLE_DDCB,
+                   TABLE_FD + EXTENDED_CB : TABLE_FDCB }
+
+SYMBOL_PREFIX = 'SYM_'
+WORD_TEMPLATE = '%04X'
+LABEL_TEMPLATE = '  [' + SYMBOL_PREFIX + WORD_TEMPLATE + ']'
+NAME_TEMPLATE = '  [%s]'
+LISTING_TEMPLATE = '%s %s :           %s'
+DATA_TEMPLATE = 'DB %s'
+FILL_TEMPLATE = 'DEFS ' + WORD_TEMPLATE + ',%s'
+DATA_BYTES_PER_LINE = 4
+OPCODE_VALUE_WIDTH = 12
+OPCODE_VALUE_PADDING = OPCODE_VALUE_WIDTH * ' '
+
+# The operand layouts. 'Relative' is a single byte that is a signed offset
+# from the PC of the next instruction. 'Indexed' is the displacement byte of
+# 'DD CB d xx' / 'FD CB d xx' that comes before the op-code. 'Indexed byte'
+# is the displacement and value of 'LD (IX+d),n', held like a word (the
+# displacement is the low byte) but not an address.
+OPERAND_NONE = 0
+OPERAND_BYTE = 1
+OPERAND_WORD = 2
+OPERAND_RELATIVE = 3
+OPERAND_INDEXED = 4
+OPERAND_INDEXED_BYTE = 5
+
+ANOMALY_UNDEFINED = 'undefined'
+ANOMALY_TRUNCATED = 'truncated'
+
+# Printable version of every byte value, with and without a leading space,
+# so the op-code text can be built without calling format()
+HEX_BYTES = [ BYTE_FORMAT.format( value ) for value in range( 256 )]
+SPACED_HEX_BYTES = [ ' ' + text for text in HEX_BYTES ]
+
+def _template( mnenomic, layout ) :
+    """The '%' template for a mnemonic. The '{hi_byte:02X}{low_byte:02X}'
+        and '{byte:02X}' labels are turned into a '%' template as that is
+        much quicker than str.format() with keywords. 'LD (IX+d),n' has the
+        low and high byte labels apart so its template takes them by name.
+        Returns None if the mnemonic has no value.
+    """
+    if layout == OPERAND_NONE :
+        return( None )
+    if layout == OPERAND_INDEXED_BYTE :
+        template = mnenomic.replace( '{low_byte:02X}', '%(low_byte)02X' ) \
+                           .replace( '{hi_byte:02X}', '%(hi_byte)02X' )
+        count = 2
+    elif layout == OPERAND_WORD :
+        template = mnenomic.replace( '{hi_byte:02X}{low_byte:02X}', WORD_TEMPLATE )
+        count = 1
+    else :
+        template = mnenomic.replace( '{byte:02X}', '%02X' )
+        count = 1
+
+    if '{' in template or template.count( '%' ) != count :
+        raise ValueError( 'can not make a template for {!r}'.format( mnenomic ))
+
+    return( template )
+
+def _compile() :
+    """Build the flat integer-indexed lists from the opcode.py dictionaries.
+        This is only run when there is no up to date snapshot.
+    """
+    # The dictionaries are the ones opcode.py holds, loaded through tablegen
+    # as the name 'opcode' may already be the standard library module (e.g.
+    # when the decoder is imported by another program)
+    from tablegen import load
+    opcode_tables = load()
+
+    tables = (
+        ( TABLE_BASE, None, opcode_tables[ 'opcode' ], NORMAL_OPCODE_SIZE ),
+        ( TABLE_CB, EXTENDED_CB, opcode_tables[ 'cb_opcode' ], EXTENDED_OPCODE_SIZE ),
+        ( TABLE_DD, EXTENDED_DD, opcode_tables[ 'dd_opcode' ], EXTENDED_OPCODE_SIZE ),
+        ( TABLE_ED, EXTENDED_ED, opcode_tables[ 'ed_opcode' ], EXTENDED_OPCODE_SIZE ),
+        ( TABLE_FD, EXTENDED_FD, opcode_tables[ 'fd_opcode' ], EXTENDED_OPCODE_SIZE ),
+        ( TABLE_DDCB, EXTENDED_DD, opcode_tables[ 'ddcb_opcode' ], INDEXED_DISPLACEMENT_OFFSET ),
+        ( TABLE_FDCB, EXTENDED_FD, opcode_tables[ 'fdcb_opcode' ], INDEXED_DISPLACEMENT_OFFSET ),
+    )
+    size = len( tables ) * TABLE_SIZE
+    prefixes = [ 0 ] * 256
+    mnemonics = [ None ] * size
+    lengths = [ 0 ] * size
+    layouts = [ OPERAND_NONE ] * size
+    operand_offsets = [ 0 ] * size
+    templates = [ None ] * size
+    opcode_text = [ None ] * size
+
+    for ( base, prefix, table, opcode_size ) in tables :
+        indexed = base in INDEXED_TABLES.values()
+        if prefix is not None and not indexed :
+            prefixes[ prefix ] = base
+
+        for ( opcode_hex, opcode_entry ) in table.items() :
+            if not opcode_entry :
+                continue
+
+            ( mnenomic, instruction_length, symbols, relative_addr ) = opcode_entry
+            value = int( opcode_hex, 16 )
+            entry = base + value
+
+            # The value bytes follow the op-code. Two value bytes are an
+            # address (or 16 bit value) unless they are the displacement and
+            # value of 'LD (IX+d),n', anything else that uses a symbol is a
+            # single byte.
+            if indexed :
+                layout = OPERAND_INDEXED
+            elif not symbols :
+                layout = OPERAND_NONE
+            elif instruction_length - opcode_size == OPCODE_NEEDS_BYTE :
+                layout = OPERAND_WORD if '{hi_byte:02X}{low_byte:02X}' in mnenomic else OPERAND_INDEXED_BYTE
+            elif relative_addr :
+                layout = OPERAND_RELATIVE
+            else :
+                layout = OPERAND_BYTE
+
+            mnemonics[ entry ] = mnenomic
+            lengths[ entry ] = instruction_length
+            layouts[ entry ] = layout
+            operand_offsets[ entry ] = opcode_size
+            templates[ entry ] = _template( mnenomic, layout )
+            if prefix is None :
+                opcode_text[ entry ] = HEX_BYTES[ value ]
+            elif indexed :
+                # The op-code byte is added after the displacement
+                opcode_text[ entry ] = HEX_BYTES[ prefix ] + SPACED_HEX_BYTES[ EXTENDED_CB ]
+            else :
+                opcode_text[ entry ] = HEX_BYTES[ prefix ] + SPACED_HEX_BYTES[ value ]
+
+    return ( prefixes, mnemonics, lengths, layouts, operand_offsets,
+             templates, opcode_text )
+
+def _load() :
+    """The compiled tables, from the snapshot if it is up to date with
+        opcode.tables, otherwise compiled in memory. Nothing is written (the
+        source directory may be read only or shared), save_snapshot() does
+        that.
+    """
+    try :
+        source_checksum = snapshot.checksum( TABLES_FILE, SNAPSHOT_VERSION )
+    except OSError :
+        return( _compile() )
+
+    tables = snapshot.load( SNAPSHOT_FILE, source_checksum )
+    if tables is None :
+        tables = _compile()
+
+    return( tables )
+
+def save_snapshot( path=None ) :
+    """Compile the tables from opcode.tables and write them to the snapshot
+        file (SNAPSHOT_FILE unless a path is given), as tablegen.py does after
+        writing new tables
+    """
+    snapshot.save( SNAPSHOT_FILE if path is None else path,
+                   snapshot.checksum( TABLES_FILE, SNAPSHOT_VERSION ), *_compile() )
+
+( PREFIXES, MNEMONICS, LENGTHS, LAYOUTS, OPERAND_OFFSETS,
+  TEMPLATES, OPCODE_TEXT ) = _load()
+
+def opcode_entry( pc, memory ) :
+    """Find the decode table entry for the instruction at the PC. This
+        raises a KeyError (like the opcode.py dictionaries) if the extended
+        op-code is not defined.
+    """
+    entry = PREFIXES[ memory[ pc ]]
+    if entry :
+        entry += memory[ pc + EXTENDED_OPCODE_OFFSET ]
+        if not LENGTHS[ entry ] :
+            if entry not in INDEXED_TABLES :
+                raise KeyError( HEX_BYTES[ memory[ pc + EXTENDED_OPCODE_OFFSET ]] )
+            entry = INDEXED_TABLES[ entry ] + memory[ pc + INDEXED_OPCODE_OFFSET ]
+    else :
+        entry = memory[ pc ]
+
+    return( entry )
+
+def signed_byte( value ) :
+    """Relative addressing is where the address is not absolute but
+        based on the Z80's program counter (PC). This value is a
+        signed 8-bit number so that it can address up and down memory
+    """
+    if value > 127 :
+        return( value - 256 )
+
+    return( value )
+
+def symbol_label( address, names=None ) :
+    """The symbol table label for an address e.g. SYM_E074, or its name if
+        it has one in the names dictionary (address -> name, see symfile.py)
+    """
+    if names :
+        name = names.get( address )
+        if name is not None :
+            return( name )
+
+    return( SYMBOL_PREFIX + WORD_FORMAT.format( address ))
+
+def encode( entry, operand=0 ) :
+    """The bytes of the instruction for a decode table entry and operand
+        value, the reverse of decode()
+    """
+    prefix = TABLE_PREFIXES[ entry // TABLE_SIZE ]
+    value = entry % TABLE_SIZE
+    layout = LAYOUTS[ entry ]
+    if layout == OPERAND_INDEXED :
+        return( bytes(( prefix, EXTENDED_CB, operand, value )))
+
+    encoding = bytearray(( prefix, value ) if prefix else ( value, ))
+    if layout == OPERAND_WORD or layout == OPERAND_INDEXED_BYTE :
+        encoding += bytes(( operand & 0xff, operand >> 8 ))
+    elif layout != OPERAND_NONE :
+        encoding.append( operand )
+
+    while len( encoding ) < LENGTHS[ entry ] :
+        encoding.append( 0 )
+
+    return( bytes( encoding ))
+
+def add_symbol( instruction, symbol_table, names=None ) :
+    """If the instruction uses a memory location then add it to the
+        symbol table
+    """
+    address = instruction.target
+    if address is not None :
+        symbol_table[ symbol_label( address, names ) ] = WORD_FORMAT.format( address )
+
+class Instruction :
+    """A single decoded instruction. Only the address, the decode table
+        entry and the operand value (the byte, or the 16 bit word built from
+        the low and high bytes) are stored; everything else is looked up
+        in the decode tables when it is asked for.
+    """
+    __slots__ = ( 'address', 'entry', 'operand' )
+
+    def __init__( self, address, entry, operand=None ) :
+        self.address = address
+        self.entry = entry
+        self.operand = operand
+
+    def __repr__( self ) :
+        return( 'Instruction({}, {!r})'.format( WORD_FORMAT.format( self.address ),
+                                                  self.render()[ 2 ] ))
+
+    @property
+    def prefix( self ) :
+        """The extended op-code prefix byte ('CB', 'DD', 'ED' or 'FD') or 0
+        """
+        return( TABLE_PREFIXES[ self.entry // TABLE_SIZE ] )
+
+    @property
+    def opcode( self ) :
+        """The op-code byte (after any prefix)
+        """
+        return( self.entry % TABLE_SIZE )
+
+    @property
+    def length( self ) :
+        return( LENGTHS[ self.entry ] )
+
+    @property
+    def next_address( self ) :
+        return( self.address + LENGTHS[ self.entry ] )
+
+    @property
+    def target( self ) :
+        """The address that would go into the symbol table, or None if the
+            instruction does not use one.
+        """
+        layout = LAYOUTS[ self.entry ]
+        if layout == OPERAND_WORD :
+            return( self.operand )
+        elif layout == OPERAND_RELATIVE :
+            return( self.address + LENGTHS[ self.entry ] + signed_byte( self.operand ))
+
+        return( None )
+
+    def render( self, names=None ) :
+        """Build the printable parts of the instruction, as returned by
+            dasm.get_opcode(): ( pretty_pc, opcode_value, pretty_mnenomic ).
+            The label is the address's name if it is in names.
+        """
+        entry = self.entry
+        layout = LAYOUTS[ entry ]
+        opcode_value = OPCODE_TEXT[ entry ]
+
+        if layout == OPERAND_NONE :
+            pretty_mnenomic = MNEMONICS[ entry ]
+
+        elif layout == OPERAND_WORD :
+            operand = self.operand
+            if names and operand in names :
+                pretty_mnenomic = TEMPLATES[ entry ] % operand + NAME_TEMPLATE % names[ operand ]
+            else :
+                pretty_mnenomic = TEMPLATES[ entry ] % operand + LABEL_TEMPLATE % operand
+            opcode_value += SPACED_HEX_BYTES[ operand & 0xff ] + SPACED_HEX_BYTES[ operand >> 8 ]
+
+        elif layout == OPERAND_INDEXED_BYTE :
+            operand = self.operand
+            pretty_mnenomic = TEMPLATES[ entry ] % { 'low_byte' : operand & 0xff, 'hi_byte' : operand >> 8 }
+            opcode_value += SPACED_HEX_BYTES[ operand & 0xff ] + SPACED_HEX_BYTES[ operand >> 8 ]
+
+        else :
+            pretty_mnenomic = TEMPLATES[ entry ] % self.operand
+            opcode_value += SPACED_HEX_BYTES[ self.operand ]
+            if layout == OPERAND_RELATIVE :
+                target = self.target
+                if names and target in names :
+                    pretty_mnenomic += NAME_TEMPLATE % names[ target ]
+                else :
+                    pretty_mnenomic += LABEL_TEMPLATE % target
+            elif layout == OPERAND_INDEXED :
+                opcode_value += SPACED_HEX_BYTES[ entry % TABLE_SIZE ]
+
+        opcode_value = ( opcode_value + OPCODE_VALUE_PADDING )[ :OPCODE_VALUE_WIDTH ]
+
+        return ( WORD_TEMPLATE % self.address, opcode_value, pretty_mnenomic )
+
+    def listing( self, names=None ) :
+        """The line dasm.py prints for this instruction
+        """
+        return( LISTING_TEMPLATE % self.render( names ))
+
+class Data :
+    """A run of bytes that is not decoded as code, printed as a DB directive
+        in the same layout as an Instruction so the two can be mixed in a
+        listing. It never uses a symbol.
+    """
+    __slots__ = ( 'address', 'values' )
+
+    entry = None
+    target = None
+
+    def __init__( self, address, values ) :
+        self.address = address
+        self.values = values
+
+    def __repr__( self ) :
+        return( 'Data({}, {!r})'.format( WORD_FORMAT.format( self.address ),
+                                           self.render()[ 2 ] ))
+
+    @property
+    def length( self ) :
+        return( len( self.values ))
+
+    @property
+    def next_address( self ) :
+        return( self.address + len( self.values ))
+
+    def render( self, names=None ) :
+        """Build the printable parts of the data, as Instruction.render()
+        """
+        hex_values = [ HEX_BYTES[ value ] for value in self.values ]
+        opcode_value = ( ' '.join( hex_values ) + OPCODE_VALUE_PADDING )[ :OPCODE_VALUE_WIDTH ]
+
+        return ( WORD_TEMPLATE % self.address, opcode_value, DATA_TEMPLATE % ','.join( hex_values ))
+
+    def listing( self, names=None ) :
+        return( LISTING_TEMPLATE % self.render() )
+
+class Fill( Data ) :
+    """A run of count of the same byte value (erased or zeroed padding)
+        printed as one DEFS directive with the count and the byte, e.g.
+        'DEFS 0100,FF'. Only the value and the count are kept, not a copy
+        of the run.
+    """
+    __slots__ = ( 'value', 'count' )
+
+    def __init__( self, address, value, count ) :
+        self.address = address
+        self.value = value
+        self.count = count
+
+    def __repr__( self ) :
+        return( 'Fill({}, {!r})'.format( WORD_FORMAT.format( self.address ),
+                                           self.render()[ 2 ] ))
+
+    @property
+    def values( self ) :
+        return( bytes(( self.value, )) * self.count )
+
+    @property
+    def length( self ) :
+        return( self.count )
+
+    @property
+    def next_address( self ) :
+        return( self.address + self.count )
+
+    def render( self, names=None ) :
+        """Build the printable parts of the fill, as Instruction.render()
+        """
+        hex_value = HEX_BYTES[ self.value ]
+        opcode_value = (( hex_value + ' ' ) * DATA_BYTES_PER_LINE + OPCODE_VALUE_PADDING )[ :OPCODE_VALUE_WIDTH ]
+
+        return ( WORD_TEMPLATE % self.address, opcode_value,
+                 FILL_TEMPLATE % ( self.count, hex_value ))
+
+def decode( memory, pc ) :
+    """Decode the instruction at the PC into an Instruction record. No
+        strings are built.
+    """
+    entry = opcode_entry( pc, memory )
+    layout = LAYOUTS[ entry ]
+    if layout == OPERAND_NONE :
+        operand = None
+    elif layout == OPERAND_WORD or layout == OPERAND_INDEXED_BYTE :
+        offset = pc + OPERAND_OFFSETS[ entry ]
+        operand = memory[ offset ] | ( memory[ offset + 1 ] << 8 )
+    else :
+        operand = memory[ pc + OPERAND_OFFSETS[ entry ]]
+
+    return( Instruction( pc, entry, operand ))
+
+def disassemble( memory, start=0, end=None ) :
+    """Generator that does a linear sweep of memory from start until end
+        (or the end of memory), yielding an Instruction for each op-code.
+        This is decode() unrolled into the loop as it is the hot path.
+    """
+    if end is None :
+        end = len( memory )
+
+    pc = start
+    while pc < end :
+        entry = opcode_entry( pc, memory )
+        layout = LAYOUTS[ entry ]
+        if layout == OPERAND_NONE :
+            yield Instruction( pc, entry )
+        elif layout == OPERAND_WORD or layout == OPERAND_INDEXED_BYTE :
+            offset = pc + OPERAND_OFFSETS[ entry ]
+            yield Instruction( pc, entry, memory[ offset ] | ( memory[ offset + 1 ] << 8 ))
+        else :
+            yield Instruction( pc, entry, memory[ pc + OPERAND_OFFSETS[ entry ]] )
+
+        pc += LENGTHS[ entry ]
+
+def new_anomalies() :
+    """A dictionary of anomaly counts for the lenient decoding
+    """
+    return({ ANOMALY_UNDEFINED : 0, ANOMALY_TRUNCATED : 0 })
+
+def decode_lenient( memory, pc, anomalies=None ) :
+    """decode() that does not raise an error. An undefined extended op-code
+        or truncated instruction is returned as Data and counted in the
+        anomalies dictionary (see new_anomalies()) if one is given.
+    """
+    try :
+        return( decode( memory, pc ))
+
+    except KeyError :
+        anomaly = ANOMALY_UNDEFINED
+        if memory[ pc ] == EXTENDED_ED :
+            record = Data( pc, memory[ pc:pc + EXTENDED_OPCODE_SIZE ] )
+        else :
+            record = Data( pc, memory[ pc:pc + NORMAL_OPCODE_SIZE ] )
+
+    except IndexError :
+        anomaly = ANOMALY_TRUNCATED
+        record = Data( pc, memory[ pc:pc + MAX_INSTRUCTION_LENGTH ] )
+
+    if anomalies is not None :
+        anomalies[ anomaly ] += 1
+
+    return( record )
+
+def disassemble_lenient( memory, start=0, end=None, anomalies=None ) :
+    """disassemble() that does not raise an error, yielding Data for the
+        bytes that can not be decoded (see decode_lenient()). The normal
+        op-codes go through disassemble() so they are just as quick.
+    """
+    if end is None :
+        end = len( memory )
+
+    pc = start
+    while pc < end :
+        try :
+            for instruction in disassemble( memory, pc, end ) :
+                pc = instruction.next_address
+                yield instruction
+
+        except ( KeyError, IndexError ) :
+            record = decode_lenient( memory, pc, anomalies )
+            pc = record.next_address
+            yield record
+
+def disassemble_stream( fileobj, base=0, chunk_size=STREAM_CHUNK_SIZE, anomalies=None ) :
+    """Generator that does a linear sweep of a binary file object, reading
+        it chunk_size bytes at a time, and yields an Instruction for each
+        op-code with its address offset by base. Any instruction that
+        straddles the end of a chunk is carried over to the next one so
+        only one chunk is ever held in memory.
+
+        If an anomalies dictionary (see new_anomalies()) is given then the
+        sweep is lenient, as disassemble_lenient().
+    """
+    address = base
+    pending = b''
+    while True :
+        chunk = fileobj.read( chunk_size )
+        if pending :
+            memory = pending + chunk
+        else :
+            memory = chunk
+
+        # Until the end of the file only decode instructions that are known
+        # to be complete in this chunk, the rest wait for the next one.
+        if chunk :
+            limit = len( memory ) - MAX_INSTRUCTION_LENGTH + 1
+        else :
+            limit = len( memory )
+
+        if anomalies is None :
+            records = disassemble( memory, 0, limit )
+        else :
+            records = disassemble_lenient( memory, 0, limit, anomalies )
+
+        pc = 0
+        for record in records :
+            pc = record.next_address
+            record.address += address
+            yield record
+
+        if not chunk :
+            break
+
+        pending = memory[ pc: ]
+        address += pc
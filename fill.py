@@ -0,0 +1,63 @@
+"""Fill Runs:
+
+    Erased flash and EPROM reads back as FF and unused space is often zeroed,
+    so a ROM can be half padding that a linear sweep decodes one RST 38 (or
+    NOP) at a time. Runs of at least min_length of the same FILL_BYTES byte
+    are found first with one regular expression search over the whole image
+    (done in C, not a byte at a time in Python) and the sweep lists each run
+    as a single 'DEFS n,FF' line (see decoder.Fill), which keeps the byte
+    and the count rather than a copy of the run.
+
+    A run is only collapsed from where the sweep reaches it, which can be
+    part way in if the instruction before it ends with the fill byte (e.g.
+    'LD A,FF'). Both fill bytes decode as one byte instructions, so the
+    instructions after a run start at exactly the same addresses as they
+    would without collapsing it.
+"""
+import re
+from decoder import disassemble, disassemble_lenient, Fill
+
+FILL_BYTES = ( 0x00, 0xff )
+MIN_FILL_LENGTH = 16
+
+def fill_runs( memory, min_length=MIN_FILL_LENGTH ) :
+    """Generator of ( start, end ) for each run of at least min_length of
+        the same fill byte, in address order
+    """
+    pattern = re.compile( b'|'.join( re.escape( bytes(( value, ))) + b'{%d,}' % min_length
+                                     for value in FILL_BYTES ))
+    for match in pattern.finditer( memory ) :
+        yield match.span()
+
+def disassemble_fill( memory, min_length=MIN_FILL_LENGTH, start=0, end=None, anomalies=None ) :
+    """disassemble() (or disassemble_lenient() if an anomalies dictionary is
+        given) that yields a Fill for what is left of each fill run from
+        where the sweep reaches it, if that is at least min_length bytes
+    """
+    if end is None :
+        end = len( memory )
+
+    pc = start
+    for ( run_start, run_end ) in fill_runs( memory, min_length ) :
+        if run_end <= pc :
+            continue
+        if run_start >= end :
+            break
+
+        if anomalies is None :
+            records = disassemble( memory, pc, run_start )
+        else :
+            records = disassemble_lenient( memory, pc, run_start, anomalies )
+        for record in records :
+            yield record
+            pc = record.next_address
+
+        run_end = min( run_end, end )
+        if run_end - pc >= min_length :
+            yield Fill( pc, memory[ pc ], run_end - pc )
+            pc = run_end
+
+    if anomalies is None :
+        yield from disassemble( memory, pc, end )
+    else :
+        yield from disassemble_lenient( memory, pc, end, anomalies )
@@ -0,0 +1,152 @@
+"""Control Flow Disassembly:
+
+    The linear sweep in dasm.py decodes everything, including any lookup
+    tables, as code. This follows the code instead: starting from the entry
+    points (the reset address and RST vectors by default) it decodes an
+    instruction, works out where execution can go next and adds those
+    addresses to a worklist. Jumps, calls and relative jumps are found from
+    the 'symbols' and 'relative_addr' flags in the op-code tables (via the
+    decoder's operand layout) and the mnemonic says how control leaves the
+    instruction:
+
+        - FLOW_NEXT             Carries on to the next instruction
+        - FLOW_JUMP             Always goes to the target (JP nn, JR e)
+        - FLOW_BRANCH           Target or next instruction (JP cc, JR cc,
+                                DJNZ, CALL, RST)
+        - FLOW_STOP             Does not come back (RET, RETI, RETN, JP (HL))
+
+    Every byte has an entry in a byte map that marks it as the start or the
+    body of an instruction, so a byte is only ever decoded once and the whole
+    trace is linear in the size of the image. Bytes that are never reached
+    are listed as DB data.
+"""
+from decoder import decode, Data, MNEMONICS, LAYOUTS, LENGTHS, OPERAND_NONE, \
+                    DATA_BYTES_PER_LINE
+
+FLOW_NEXT = 0
+FLOW_JUMP = 1
+FLOW_BRANCH = 2
+FLOW_STOP = 3
+
+MARK_NONE = 0
+MARK_START = 1
+MARK_BODY = 2
+
+RESET_ADDRESS = 0x0000
+RST_VECTORS = ( 0x08, 0x10, 0x18, 0x20, 0x28, 0x30, 0x38 )
+DEFAULT_ENTRY_POINTS = ( RESET_ADDRESS, ) + RST_VECTORS
+
+def _flow( mnenomic, layout ) :
+    """How control leaves an instruction, from its mnemonic
+    """
+    words = mnenomic.split( ' ', 1 )
+    name = words[ 0 ]
+    conditional = len( words ) > 1 and ',' in words[ 1 ]
+
+    if name in ( 'RET', 'RETI', 'RETN' ) :
+        return( FLOW_BRANCH if len( words ) > 1 else FLOW_STOP )
+    if name in ( 'JP', 'JR' ) :
+        if layout == OPERAND_NONE :
+            # JP (HL), JP (IX) and JP (IY) go somewhere we can not know
+            return( FLOW_STOP )
+        return( FLOW_BRANCH if conditional else FLOW_JUMP )
+    if name in ( 'CALL', 'DJNZ', 'RST' ) :
+        return( FLOW_BRANCH )
+
+    return( FLOW_NEXT )
+
+def _rst_target( mnenomic ) :
+    if mnenomic.startswith( 'RST ' ) :
+        return( int( mnenomic[ 4: ], 16 ))
+
+    return( None )
+
+FLOWS = [ FLOW_NEXT if mnenomic is None else _flow( mnenomic, layout )
+          for ( mnenomic, layout ) in zip( MNEMONICS, LAYOUTS ) ]
+RST_TARGETS = [ None if mnenomic is None else _rst_target( mnenomic )
+                for mnenomic in MNEMONICS ]
+
+def branch_target( instruction ) :
+    """Where a jump, call or RST goes to (None for anything else or if it
+        can not be known)
+    """
+    entry = instruction.entry
+    if FLOWS[ entry ] in ( FLOW_JUMP, FLOW_BRANCH ) :
+        if RST_TARGETS[ entry ] is not None :
+            return( RST_TARGETS[ entry ] )
+        return( instruction.target )
+
+    return( None )
+
+def trace( memory, entry_points=DEFAULT_ENTRY_POINTS ) :
+    """Follow the code from the entry points. Returns ( instructions, marks )
+        where instructions is a dictionary of the decoded Instructions by
+        address and marks is the byte map (MARK_NONE, MARK_START or
+        MARK_BODY for every byte of memory).
+
+        A path stops if it runs off the end of memory, reaches an op-code
+        that is not defined or would decode an instruction over one that
+        has already been found.
+    """
+    mem_size = len( memory )
+    marks = bytearray( mem_size )
+    instructions = {}
+    worklist = [ address for address in reversed( entry_points )
+                 if 0 <= address < mem_size ]
+
+    while worklist :
+        pc = worklist.pop()
+        while 0 <= pc < mem_size and marks[ pc ] == MARK_NONE :
+            try :
+                instruction = decode( memory, pc )
+            except ( KeyError, IndexError ) :
+                break
+
+            length = LENGTHS[ instruction.entry ]
+            if pc + length > mem_size or any( marks[ pc + 1:pc + length ] ) :
+                break
+
+            marks[ pc ] = MARK_START
+            marks[ pc + 1:pc + length ] = bytes(( MARK_BODY, )) * ( length - 1 )
+            instructions[ pc ] = instruction
+
+            flow = FLOWS[ instruction.entry ]
+            if flow == FLOW_STOP :
+                break
+
+            target = branch_target( instruction )
+            if flow == FLOW_JUMP :
+                if target is None :
+                    break
+                pc = target
+                continue
+
+            if target is not None and 0 <= target < mem_size and marks[ target ] == MARK_NONE :
+                worklist.append( target )
+            pc += length
+
+    return( instructions, marks )
+
+def disassemble_flow( memory, entry_points=DEFAULT_ENTRY_POINTS, ranges=None ) :
+    """Generator that traces the code from the entry points and then yields,
+        in address order, an Instruction for each op-code found and Data
+        (up to DATA_BYTES_PER_LINE bytes) for the bytes that were not reached.
+        Only the ( start, end ) address ranges are listed if they are given
+        (e.g. the segments of an image.MemoryMap), otherwise all of memory.
+    """
+    ( instructions, marks ) = trace( memory, entry_points )
+    if ranges is None :
+        ranges = [( 0, len( memory ))]
+
+    for ( pc, range_end ) in ranges :
+        while pc < range_end :
+            if marks[ pc ] == MARK_START :
+                instruction = instructions[ pc ]
+                yield instruction
+                pc += LENGTHS[ instruction.entry ]
+            else :
+                end = pc + 1
+                while end < range_end and end - pc < DATA_BYTES_PER_LINE and marks[ end ] != MARK_START :
+                    end += 1
+                yield Data( pc, memory[ pc:end ] )
+                pc = end
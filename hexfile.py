@@ -0,0 +1,207 @@
+"""Intel HEX and Motorola S-record Files:
+
+    EPROM programmers save images as text records, each with its own load
+    address, rather than as a raw binary. These loaders read the records in
+    one pass, a line at a time, into an image.MemoryMap: records that follow
+    on from each other are gathered into runs as they are read. The file
+    need not be in address order, so at the end the runs are sorted and any
+    that touch or overlap are joined (a later record overwriting an earlier
+    one) before they are added as segments. The load addresses and the gaps
+    are kept and nothing is converted to a binary first.
+
+    Each record is turned from hex into bytes with one bytes.fromhex() call
+    and its checksum is checked by summing those bytes with sum() (both done
+    in C), not a byte at a time in Python.
+
+        - Intel HEX             ':' count, address, type, data, checksum. The
+                                data (00), end of file (01), extended segment
+                                (02) and linear (04) address and start address
+                                (03, 05) records are read. The bytes of a
+                                record add up to 0.
+        - S-records             'S' type, count, address, data, checksum. S1,
+                                S2 and S3 are data with a 16, 24 or 32 bit
+                                address, S7, S8 and S9 the start address and
+                                S0, S5 and S6 are skipped. The bytes after the
+                                type add up to FF.
+
+    Both return the start address if the file gives one (else None) so it
+    can be used as an entry point.
+"""
+from image import MemoryMap
+
+INTEL_EXTENSIONS = ( '.hex', '.ihx', '.ihex', '.h86' )
+SREC_EXTENSIONS = ( '.s19', '.s28', '.s37', '.srec', '.mot' )
+
+INTEL_MARK = ':'
+INTEL_DATA = 0x00
+INTEL_END = 0x01
+INTEL_SEGMENT_ADDRESS = 0x02
+INTEL_SEGMENT_START = 0x03
+INTEL_LINEAR_ADDRESS = 0x04
+INTEL_LINEAR_START = 0x05
+INTEL_HEADER_SIZE = 4
+SEGMENT_SHIFT = 4
+LINEAR_SHIFT = 16
+
+SREC_MARK = 'S'
+# The size of the address for each S-record type and what the record is
+SREC_ADDRESS_SIZES = { '0' : 2, '1' : 2, '2' : 3, '3' : 4, '5' : 2, '6' : 3, '7' : 4, '8' : 3, '9' : 2 }
+SREC_DATA = '123'
+SREC_START = '789'
+SREC_CHECKSUM = 0xff
+
+class _Segments :
+    """Gathers the data records into runs, a new run starting when a record
+        does not follow on from the one before, and adds them to the map as
+        segments when the file has been read
+    """
+    __slots__ = ( 'memory_map', 'offset', 'base', 'data', 'runs' )
+
+    def __init__( self, memory_map, offset ) :
+        self.memory_map = memory_map
+        self.offset = offset
+        self.base = None
+        self.data = bytearray()
+        self.runs = []
+
+    def add( self, address, data ) :
+        if self.base is None or address != self.base + len( self.data ) :
+            self.flush()
+            self.base = address
+        self.data += data
+
+    def flush( self ) :
+        if self.data :
+            self.runs.append(( self.base, self.data ))
+            self.data = bytearray()
+
+    def close( self ) :
+        """Join the runs that touch or overlap, in address order, and add
+            each to the map as a segment
+        """
+        self.flush()
+        runs = self.runs
+        cluster = []
+        end = None
+        for index in sorted( range( len( runs )), key=lambda index : runs[ index ][ 0 ] ) :
+            ( base, data ) = runs[ index ]
+            if cluster and base > end :
+                self._add_cluster( cluster )
+                cluster = []
+            if not cluster :
+                end = base
+            cluster.append( index )
+            end = max( end, base + len( data ))
+        if cluster :
+            self._add_cluster( cluster )
+        self.runs = []
+
+    def _add_cluster( self, cluster ) :
+        """Add the runs numbered in cluster (which touch or overlap) as one
+            segment, writing them in file order so a later one wins
+        """
+        runs = self.runs
+        if len( cluster ) == 1 :
+            ( base, data ) = runs[ cluster[ 0 ]]
+        else :
+            base = runs[ cluster[ 0 ]][ 0 ]
+            data = bytearray( max( start + len( run ) for ( start, run ) in ( runs[ index ] for index in cluster )) - base )
+            for index in sorted( cluster ) :
+                ( start, run ) = runs[ index ]
+                data[ start - base:start - base + len( run )] = run
+        self.memory_map.add( base + self.offset, data )
+
+def _record( text, path, line_number ) :
+    try :
+        return( bytes.fromhex( text ))
+    except ValueError :
+        raise ValueError( '{} line {}: not a hex record'.format( path, line_number ))
+
+def load_intel_hex( lines, path='', memory_map=None, offset=0 ) :
+    """Read Intel HEX lines (e.g. an open file) into a MemoryMap (a new one
+        if none is given), with offset added to every address. Returns
+        ( memory_map, start address or None ).
+    """
+    if memory_map is None :
+        memory_map = MemoryMap()
+
+    segments = _Segments( memory_map, offset )
+    upper = 0
+    start = None
+    for ( line_number, line ) in enumerate( lines, 1 ) :
+        line = line.strip()
+        if not line :
+            continue
+        if line[ 0 ] != INTEL_MARK :
+            raise ValueError( '{} line {}: not an Intel HEX record'.format( path, line_number ))
+
+        record = _record( line[ 1: ], path, line_number )
+        if len( record ) < INTEL_HEADER_SIZE + 1 or len( record ) != record[ 0 ] + INTEL_HEADER_SIZE + 1 :
+            raise ValueError( '{} line {}: wrong record length'.format( path, line_number ))
+        if sum( record ) & 0xff :
+            raise ValueError( '{} line {}: checksum error'.format( path, line_number ))
+
+        kind = record[ 3 ]
+        data = record[ INTEL_HEADER_SIZE:-1 ]
+        if kind == INTEL_DATA :
+            segments.add( upper + int.from_bytes( record[ 1:3 ], 'big' ), data )
+        elif kind == INTEL_END :
+            break
+        elif kind == INTEL_SEGMENT_ADDRESS :
+            upper = int.from_bytes( data, 'big' ) << SEGMENT_SHIFT
+        elif kind == INTEL_LINEAR_ADDRESS :
+            upper = int.from_bytes( data, 'big' ) << LINEAR_SHIFT
+        elif kind == INTEL_SEGMENT_START :
+            start = ( int.from_bytes( data[ :2 ], 'big' ) << SEGMENT_SHIFT ) + int.from_bytes( data[ 2: ], 'big' )
+        elif kind == INTEL_LINEAR_START :
+            start = int.from_bytes( data, 'big' )
+        else :
+            raise ValueError( '{} line {}: unknown record type {:02X}'.format( path, line_number, kind ))
+
+    segments.close()
+    return( memory_map, None if start is None else start + offset )
+
+def load_srec( lines, path='', memory_map=None, offset=0 ) :
+    """Read Motorola S-record lines (e.g. an open file) into a MemoryMap (a
+        new one if none is given), with offset added to every address.
+        Returns ( memory_map, start address or None ).
+    """
+    if memory_map is None :
+        memory_map = MemoryMap()
+
+    segments = _Segments( memory_map, offset )
+    start = None
+    for ( line_number, line ) in enumerate( lines, 1 ) :
+        line = line.strip()
+        if not line :
+            continue
+        kind = line[ 1:2 ]
+        if line[ 0 ] != SREC_MARK or kind not in SREC_ADDRESS_SIZES :
+            raise ValueError( '{} line {}: not an S-record'.format( path, line_number ))
+
+        record = _record( line[ 2: ], path, line_number )
+        address_size = SREC_ADDRESS_SIZES[ kind ]
+        if len( record ) < address_size + 2 or len( record ) != record[ 0 ] + 1 :
+            raise ValueError( '{} line {}: wrong record length'.format( path, line_number ))
+        if sum( record ) & 0xff != SREC_CHECKSUM :
+            raise ValueError( '{} line {}: checksum error'.format( path, line_number ))
+
+        address = int.from_bytes( record[ 1:1 + address_size ], 'big' )
+        if kind in SREC_DATA :
+            segments.add( address, record[ 1 + address_size:-1 ] )
+        elif kind in SREC_START :
+            start = address
+
+    segments.close()
+    return( memory_map, None if start is None else start + offset )
+
+def is_hex_file( path ) :
+    return( path.lower().endswith( INTEL_EXTENSIONS + SREC_EXTENSIONS ))
+
+def load_hex_file( path, memory_map=None, offset=0 ) :
+    """Load an Intel HEX or S-record file, chosen by its extension, into a
+        MemoryMap. Returns ( memory_map, start address or None ).
+    """
+    loader = load_srec if path.lower().endswith( SREC_EXTENSIONS ) else load_intel_hex
+    with open( path, 'r' ) as fh :
+        return( loader( fh, path, memory_map, offset ))
@@ -0,0 +1,144 @@
+"""Z80 Memory Images:
+
+    Helpers for getting a dumped ROM into memory ready to be disassembled.
+
+    A ROM does not have to start at 0000H. A MemoryMap places one or more
+    images (segments) at their base addresses and is indexed by the real
+    address, so decode() and the flow trace see the addresses the CPU does.
+    Only a table of the segments is kept, sorted by base address, and each
+    segment is the image's own bytes (or memory map), so there is no copy
+    of the address space and the gaps between segments cost nothing.
+    Reading an address that is not in a segment is an IndexError, as it is
+    past the end of a plain image.
+
+    Indexing a MemoryMap is a Python call per byte, so a linear sweep does
+    not go through it: map_records() sweeps each segment's own bytes at full
+    speed and moves the records to the segment's base address. Images that
+    touch (one ends where the next starts) are joined into one segment when
+    they are added, so an instruction can run on from one into the next as
+    it would in the CPU; only a gap stops it.
+
+    Every segment must fit in the Z80's 64K address space.
+"""
+from bisect import bisect_right
+import mmap
+import os
+
+ADDRESS_SPACE = 0x10000
+
+def map_file( fh ) :
+    """Memory map an open binary file read-only. The disassembler indexes
+        the map directly so the file is never copied into a bytes object,
+        the OS page cache holds the data and only the pages that are read
+        get loaded. The map stays valid after the file is closed.
+    """
+    if os.fstat( fh.fileno() ).st_size == 0 :
+        # An empty file can not be mapped but there is nothing to copy
+        return( b'' )
+
+    return( mmap.mmap( fh.fileno(), 0, access=mmap.ACCESS_READ ))
+
+class MemoryMap :
+    """Segments of memory at their base addresses
+    """
+    __slots__ = ( '_bases', '_segments', '_last' )
+
+    def __init__( self ) :
+        self._bases = []
+        self._segments = []
+        # The index of the last segment read, which is almost always the
+        # next one read as well
+        self._last = 0
+
+    def add( self, base, data ) :
+        """Place the bytes data at the address base. The segments must not
+            overlap or go past the end of the address space. A segment that
+            touches the one before or after it is joined on to it (which
+            copies them).
+        """
+        if base < 0 :
+            raise ValueError( 'segment at negative address {}'.format( base ))
+        end = base + len( data )
+        if end > ADDRESS_SPACE :
+            raise ValueError( 'segment at {:04X} ends at {:X}, past the end of memory at FFFF'.format(
+                    base, end - 1 ))
+        index = bisect_right( self._bases, base )
+        if ( index and self._bases[ index - 1 ] + len( self._segments[ index - 1 ] ) > base ) or \
+           ( index < len( self._bases ) and end > self._bases[ index ] ) :
+            raise ValueError( 'segment at {:04X} overlaps another'.format( base ))
+
+        if index and self._bases[ index - 1 ] + len( self._segments[ index - 1 ] ) == base :
+            index -= 1
+            base = self._bases.pop( index )
+            data = b''.join(( self._segments.pop( index ), data ))
+        if index < len( self._bases ) and self._bases[ index ] == end :
+            self._bases.pop( index )
+            data = b''.join(( data, self._segments.pop( index )))
+
+        self._bases.insert( index, base )
+        self._segments.insert( index, data )
+        self._last = 0
+
+    def segments( self ) :
+        """List of ( base, data ) for each segment in address order
+        """
+        return( list( zip( self._bases, self._segments )))
+
+    def ranges( self ) :
+        """List of ( start, end ) addresses of each segment in address order
+        """
+        return([( base, base + len( data )) for ( base, data ) in zip( self._bases, self._segments )])
+
+    def __len__( self ) :
+        """The address after the end of the highest segment
+        """
+        if not self._bases :
+            return( 0 )
+
+        return( self._bases[ -1 ] + len( self._segments[ -1 ] ))
+
+    def _find( self, address ) :
+        index = self._last
+        if not ( index < len( self._bases ) and
+                 0 <= address - self._bases[ index ] < len( self._segments[ index ] )) :
+            index = bisect_right( self._bases, address ) - 1
+            if index < 0 or address - self._bases[ index ] >= len( self._segments[ index ] ) :
+                raise IndexError( 'address {:04X} is not in memory'.format( address ))
+            self._last = index
+
+        return( index )
+
+    def __getitem__( self, address ) :
+        """The byte at an address or, for a slice, the bytes from the start
+            address to the end of the slice or its segment
+        """
+        if isinstance( address, slice ) :
+            index = self._find( address.start )
+            base = self._bases[ index ]
+            stop = None if address.stop is None else address.stop - base
+            return( self._segments[ index ][ address.start - base:stop ] )
+
+        index = self._find( address )
+        return( self._segments[ index ][ address - self._bases[ index ]] )
+
+def load_image( path, base=0, use_mmap=False, memory_map=None ) :
+    """Read (or memory map) the binary file at path and add it to a
+        MemoryMap (a new one if none is given) at base. Returns the map.
+    """
+    if memory_map is None :
+        memory_map = MemoryMap()
+
+    with open( path, 'rb' ) as fh :
+        memory_map.add( base, map_file( fh ) if use_mmap else fh.read() )
+
+    return( memory_map )
+
+def map_records( memory_map, sweep ) :
+    """Generator of the records sweep( data ) yields for each segment's
+        bytes, e.g. disassemble(), with their addresses moved to the
+        segment's base
+    """
+    for ( base, data ) in memory_map.segments() :
+        for record in sweep( data ) :
+            record.address += base
+            yield record
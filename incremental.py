@@ -0,0 +1,218 @@
+"""Incremental Disassembly:
+
+    After a few bytes of a ROM have been patched there is no need to
+    disassemble the whole image again. A linear sweep can only change from
+    the last instruction boundary before a patch, and once the new stream of
+    instructions lands back on one of the old boundaries after the patch
+    everything from there on is the same as before.
+
+    A Decode holds the result of a linear sweep as flat arrays (start address,
+    decode table entry and operand of every instruction) together with the
+    addresses of the instructions that reference each symbol. patch() takes
+    the patched memory and the byte ranges that changed, re-decodes only the
+    instructions around each change and updates the symbol references.
+
+    cache.py does the same to its own arrays when an image is not in the
+    cache but the image it was patched from is (dasm.py --patched-from):
+    the cached decode of the old image is patched where changed_ranges()
+    finds bytes that differ, rather than disassembling all of the new one.
+    Both re-decode with decode_window().
+
+    changed_ranges() compares the images a block at a time with slices (a
+    memcmp in C) and only looks at the bytes of the blocks that differ.
+"""
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from decoder import decode, disassemble, symbol_label, Instruction, LAYOUTS, \
+                    OPERAND_NONE, MAX_INSTRUCTION_LENGTH, WORD_FORMAT
+
+# The block sizes changed_ranges() compares in, largest first
+COMPARE_SIZES = ( 64 * 1024, 256 )
+
+def decode_window( memory, pc, change_end, old_starts ) :
+    """Decode from pc (an old instruction boundary) until past change_end
+        and back on an old boundary, where old_starts is an iterator of the
+        old instruction start addresses after pc in order. Returns
+        ( instructions, address it stopped at, truncated ) where truncated is
+        the IndexError of an instruction cut off by the end of memory (and
+        None if there was not one).
+    """
+    instructions = []
+    old = next( old_starts, None )
+    while pc < len( memory ) :
+        while old is not None and old < pc :
+            old = next( old_starts, None )
+        if pc >= change_end and old == pc :
+            break
+
+        try :
+            instruction = decode( memory, pc )
+        except IndexError as error :
+            return( instructions, pc, error )
+        instructions.append( instruction )
+        pc = instruction.next_address
+
+    return( instructions, pc, None )
+
+class Decode :
+    """The instruction boundaries and symbol references of a linear sweep
+    """
+    __slots__ = ( 'starts', 'entries', 'operands', 'references' )
+
+    def __init__( self ) :
+        self.starts = array( 'l' )
+        self.entries = array( 'H' )
+        self.operands = array( 'H' )
+        # Symbol address -> sorted list of the addresses referencing it
+        self.references = {}
+
+    def __len__( self ) :
+        return( len( self.starts ))
+
+    def _add_reference( self, instruction ) :
+        target = instruction.target
+        if target is not None :
+            insort( self.references.setdefault( target, [] ), instruction.address )
+
+    def _remove_reference( self, index ) :
+        target = self.instruction( index ).target
+        if target is not None :
+            referrers = self.references[ target ]
+            del referrers[ bisect_left( referrers, self.starts[ index ] ) ]
+            if not referrers :
+                del self.references[ target ]
+
+    def instruction( self, index ) :
+        """The Instruction record of the index'th instruction
+        """
+        entry = self.entries[ index ]
+        if LAYOUTS[ entry ] == OPERAND_NONE :
+            return( Instruction( self.starts[ index ], entry ))
+
+        return( Instruction( self.starts[ index ], entry, self.operands[ index ] ))
+
+    def instructions( self ) :
+        """Generator of all the Instruction records in address order
+        """
+        for index in range( len( self.starts )) :
+            yield self.instruction( index )
+
+    def symbol_table( self, names=None ) :
+        """The symbol table dictionary, as dasm.py builds it. The linear sweep
+            adds a symbol the first time it is referenced, so the symbols are
+            in the order of their first reference. The labels are taken from
+            names (address -> name) where it has them.
+        """
+        symbol_table = {}
+        for target in sorted( self.references, key=lambda target : self.references[ target ][ 0 ] ) :
+            symbol_table[ symbol_label( target, names ) ] = WORD_FORMAT.format( target )
+
+        return( symbol_table )
+
+    def patch( self, memory, changes ) :
+        """Update the decode for the patched memory, where changes is a list of
+            ( start, end ) byte ranges that have changed. The length of memory
+            must not have changed. Returns the number of instructions that
+            were decoded.
+
+            An instruction cut off by the end of memory raises an IndexError,
+            as it does in disassemble(), after the decode has been updated to
+            the instructions before it (the ones disassemble() yields).
+        """
+        decoded = 0
+        for ( change_start, change_end ) in sorted( changes ) :
+            starts = self.starts
+
+            # Start from the first instruction that could have read a
+            # changed byte (an instruction never looks further than
+            # MAX_INSTRUCTION_LENGTH bytes from its start), or the end of the
+            # decode if it stopped at a truncated instruction.
+            first = bisect_right( starts, change_start - MAX_INSTRUCTION_LENGTH )
+            if first < len( starts ) :
+                pc = starts[ first ]
+            elif starts :
+                pc = self.instruction( first - 1 ).next_address
+            else :
+                pc = 0
+            if pc >= len( memory ) :
+                continue
+
+            ( new_instructions, pc, truncated ) = decode_window(
+                memory, pc, change_end, ( starts[ index ] for index in range( first + 1, len( starts ))))
+            if truncated is not None or pc >= len( memory ) :
+                # Everything from the first instruction on is replaced (a
+                # truncated instruction is the last one, so there is
+                # nothing left to patch)
+                last = len( starts )
+            else :
+                last = bisect_left( starts, pc, first )
+
+            new_starts = array( 'l', [ instruction.address for instruction in new_instructions ] )
+            new_entries = array( 'H', [ instruction.entry for instruction in new_instructions ] )
+            new_operands = array( 'H', [ instruction.operand or 0 for instruction in new_instructions ] )
+
+            for index in range( first, last ) :
+                self._remove_reference( index )
+
+            self.starts[ first:last ] = new_starts
+            self.entries[ first:last ] = new_entries
+            self.operands[ first:last ] = new_operands
+            for instruction in new_instructions :
+                self._add_reference( instruction )
+
+            decoded += len( new_instructions )
+            if truncated is not None :
+                raise truncated
+
+        return( decoded )
+
+def instructions_decode( instructions ) :
+    """A Decode of the Instruction records of a linear sweep, e.g. from
+        disassemble() or the cache
+    """
+    result = Decode()
+    for instruction in instructions :
+        result.starts.append( instruction.address )
+        result.entries.append( instruction.entry )
+        result.operands.append( instruction.operand or 0 )
+        result._add_reference( instruction )
+
+    return( result )
+
+def linear_decode( memory ) :
+    """A linear sweep of all of memory as a Decode
+    """
+    return( instructions_decode( disassemble( memory )))
+
+def changed_ranges( old_memory, new_memory ) :
+    """The ( start, end ) ranges of bytes that differ between two images of
+        the same size
+    """
+    # Narrow down to the smallest blocks that differ
+    blocks = [( 0, len( new_memory ))]
+    for block_size in COMPARE_SIZES :
+        blocks = [( block, min( block + block_size, last ))
+                  for ( first, last ) in blocks for block in range( first, last, block_size )
+                  if old_memory[ block:min( block + block_size, last )] !=
+                     new_memory[ block:min( block + block_size, last )]]
+
+    ranges = []
+    start = None
+    end = 0
+    for ( first, last ) in blocks :
+        if start is not None and first != end :
+            ranges.append(( start, end ))
+            start = None
+        for address in range( first, last ) :
+            if old_memory[ address ] != new_memory[ address ] :
+                if start is None :
+                    start = address
+            elif start is not None :
+                ranges.append(( start, address ))
+                start = None
+        end = last
+
+    if start is not None :
+        ranges.append(( start, end ))
+
+    return( ranges )
@@ -0,0 +1,87 @@
+"""Listing Output:
+
+    Writes the disassembly listing and the symbol table in the same text
+    format dasm.py has always printed.
+
+    Calling print() for every instruction costs more than decoding it, so
+    the lines are rendered into a buffer that is reused and written out as
+    one large block every flush_lines lines (and whatever is left when the
+    decode stops, even on an error).
+"""
+import sys
+from decoder import symbol_label, LISTING_TEMPLATE, WORD_TEMPLATE
+from symbols import REF_NAMES
+
+FLUSH_LINES = 4096
+
+SYMBOL_FORMAT = '{} = {}\n'
+
+def write_listing( instructions, out=None, symbols=None, flush_lines=FLUSH_LINES, names=None ) :
+    """Render each Instruction as a listing line and write them to out
+        (default STDOUT) in blocks of flush_lines. If a SymbolIndex is
+        given then the symbols used are added to it as the lines are
+        rendered. The labels are taken from names (address -> name) where
+        it has them. Returns the number of lines written.
+    """
+    if out is None :
+        out = sys.stdout
+
+    flush_lines = max( flush_lines, 1 )
+    line_template = LISTING_TEMPLATE + '\n'
+    lines = []
+    count = 0
+    # The lines already rendered are written even if the decode raises
+    # part way (an undefined op-code or a truncated tail), as print() did
+    try :
+        for instruction in instructions :
+            if symbols is not None :
+                symbols.add( instruction )
+
+            lines.append( line_template % instruction.render( names ))
+            if len( lines ) >= flush_lines :
+                out.write( ''.join( lines ))
+                count += len( lines )
+                lines.clear()
+    finally :
+        out.write( ''.join( lines ))
+        count += len( lines )
+
+    return( count )
+
+def write_symbols( symbol_table, out=None, flush_lines=FLUSH_LINES ) :
+    """Write the symbol table (label = address) to out (default STDOUT)
+        in blocks of flush_lines.
+    """
+    if out is None :
+        out = sys.stdout
+
+    flush_lines = max( flush_lines, 1 )
+    lines = []
+    for label in symbol_table :
+        lines.append( SYMBOL_FORMAT.format( label, symbol_table[ label ] ))
+        if len( lines ) >= flush_lines :
+            out.write( ''.join( lines ))
+            lines.clear()
+
+    out.write( ''.join( lines ))
+
+def write_xref( symbols, out=None, flush_lines=FLUSH_LINES, names=None ) :
+    """Write a cross reference of a SymbolIndex to out (default STDOUT), one
+        line per symbol in address order listing where it is referenced from:
+
+            SYM_E3B7 : call 0041, call 0045, call 0057
+    """
+    if out is None :
+        out = sys.stdout
+
+    flush_lines = max( flush_lines, 1 )
+    lines = []
+    for target in symbols.sorted_targets() :
+        references = ', '.join([ REF_NAMES[ kind ] + ' ' + WORD_TEMPLATE % address
+                                 for ( address, kind ) in symbols.references( target )])
+        lines.append( symbol_label( target, names ) + ' : ' + references + '\n' )
+        if len( lines ) >= flush_lines :
+            out.write( ''.join( lines ))
+            lines.clear()
+
+    out.write( ''.join( lines ))
@@ -0,0 +1,198 @@
+"""Parallel Disassembly:
+
+    The linear sweep is strictly sequential as each instruction starts where
+    the last one ended. To spread a large image over several processes it is
+    split into segments and each worker starts decoding LEAD_BYTES before its
+    segment. Z80 code quickly falls back into step with the real instruction
+    boundaries, so by the time the worker reaches the segment its boundaries
+    (almost always) match the ones a serial run would find.
+
+    Each worker returns, for every instruction it decoded, the start address,
+    the length, the symbol address (if any) and kind of reference, and the
+    rendered listing line.
+    The lines come back as one string with an array of offsets into it, which
+    is much cheaper to pass between processes than a list of strings.
+    If NumPy is installed the real instruction boundaries are found for the
+    whole image first (see boundaries.py) and each worker starts on the first
+    one in its segment instead, so no lead in is needed.
+    The segments are then stitched together in order: the PC carried over
+    from the previous segment is looked up in the worker's start addresses
+    and the worker's lines are used from there. Where the PC is not one of
+    the worker's boundaries (or the worker had to skip a byte it could not
+    decode) the instructions are decoded here until the two are back in step,
+    so the listing and symbol table are exactly those of a serial run.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+import multiprocessing
+import sys
+import boundaries
+from decoder import decode, decode_lenient, disassemble, LENGTHS, LISTING_TEMPLATE
+from image import map_file
+from listing import FLUSH_LINES
+from symbols import SymbolIndex, REFERENCE_KINDS
+
+SEGMENT_SIZE = 1024 * 1024
+LEAD_BYTES = 256
+
+# Symbol addresses can be negative (relative jumps back past 0000H) so
+# there is no value left to mean 'no symbol' other than one out of range.
+NO_TARGET = -1 << 62
+
+# Each worker keeps the files it has mapped so a file is only mapped once
+# per process however many segments it is given, and the symbol names
+# (address -> name) to use in the listing, which it is given once when it
+# starts rather than with every segment.
+_mapped_files = {}
+_names = None
+
+def _set_names( names ) :
+    global _names
+    _names = names
+
+def _map( path ) :
+    if path not in _mapped_files :
+        with open( path, 'rb' ) as fh :
+            _mapped_files[ path ] = map_file( fh )
+
+    return( _mapped_files[ path ] )
+
+def decode_segment( job ) :
+    """Worker: decode from start until the first instruction that starts
+        at or after end. Bytes that can not be decoded (the worker may not
+        be in step with the real boundaries yet) are skipped and the index
+        of the next instruction recorded as a 'break' in the chain.
+
+        Returns ( starts, lengths, targets, kinds, text, offsets, breaks ) where
+        the line for instruction i is text[ offsets[ i ]:offsets[ i + 1 ]]
+    """
+    ( path, start, end ) = job
+    memory = _map( path )
+    starts = array( 'q' )
+    lengths = array( 'B' )
+    targets = array( 'q' )
+    kinds = array( 'B' )
+    lines = []
+    breaks = []
+    line_template = LISTING_TEMPLATE + '\n'
+
+    pc = start
+    while pc < end :
+        try :
+            for instruction in disassemble( memory, pc, end ) :
+                starts.append( pc )
+                lengths.append( LENGTHS[ instruction.entry ] )
+                target = instruction.target
+                targets.append( NO_TARGET if target is None else target )
+                kinds.append( REFERENCE_KINDS[ instruction.entry ] )
+                lines.append( line_template % instruction.render( _names ))
+                pc = instruction.next_address
+
+        except ( KeyError, IndexError ) :
+            if not breaks or breaks[ -1 ] != len( starts ) :
+                breaks.append( len( starts ))
+            pc += 1
+
+    offsets = array( 'q', [ 0 ] )
+    total = 0
+    for line in lines :
+        total += len( line )
+        offsets.append( total )
+
+    return ( starts, lengths, targets, kinds, ''.join( lines ), offsets, breaks )
+
+def job_starts( memory, segments ) :
+    """Where each worker starts decoding: the first real instruction
+        boundary in its segment if they can be found quickly, otherwise
+        LEAD_BYTES before the segment
+    """
+    if boundaries.numpy is not None :
+        try :
+            starts = boundaries.instruction_starts( memory )
+        except ( KeyError, IndexError ) :
+            starts = None
+
+        if starts is not None :
+            return([ starts[ index ] if index < len( starts ) else seg_start
+                     for ( seg_start, index ) in (( seg_start, bisect_left( starts, seg_start ))
+                                                  for ( seg_start, seg_end ) in segments )])
+
+    return([ max( seg_start - LEAD_BYTES, 0 ) for ( seg_start, seg_end ) in segments ])
+
+def parallel_listing( path, out=None, symbols=None, workers=None,
+                      segment_size=SEGMENT_SIZE, flush_lines=FLUSH_LINES, anomalies=None, names=None ) :
+    """Disassemble the binary file at path using a pool of worker processes
+        and write the listing to out (default STDOUT), adding the symbols to
+        the SymbolIndex symbols. The output is the same as write_listing() on
+        a serial disassemble(), or disassemble_lenient() if an anomalies
+        dictionary is given, with the labels from names. Returns the number
+        of lines written.
+    """
+    if out is None :
+        out = sys.stdout
+    if symbols is None :
+        symbols = SymbolIndex()
+    if workers is None :
+        workers = multiprocessing.cpu_count()
+
+    with open( path, 'rb' ) as fh :
+        memory = map_file( fh )
+
+    mem_size = len( memory )
+    segments = [( seg_start, min( seg_start + segment_size, mem_size ))
+                 for seg_start in range( 0, mem_size, segment_size )]
+    job_addresses = job_starts( memory, segments )
+    line_template = LISTING_TEMPLATE + '\n'
+    lines = []
+    buffered = 0
+    count = 0
+    pc = 0
+
+    with multiprocessing.Pool( workers, _set_names, ( names, )) as pool :
+        # Only keep a couple of segments per worker in flight so the rendered
+        # lines waiting to be written do not grow with the image.
+        pending = deque()
+        next_segment = 0
+        for ( seg_start, seg_end ) in segments :
+            while next_segment < len( segments ) and len( pending ) < 2 * workers :
+                job = ( path, job_addresses[ next_segment ], segments[ next_segment ][ 1 ] )
+                pending.append( pool.apply_async( decode_segment, ( job, )))
+                next_segment += 1
+
+            ( starts, lengths, targets, kinds, text, offsets, breaks ) = pending.popleft().get()
+            index = bisect_left( starts, pc )
+            while pc < seg_end :
+                if index < len( starts ) and starts[ index ] == pc :
+                    # In step with the worker: use everything up to the next
+                    # break in its chain in one go.
+                    run_end = bisect_right( breaks, index )
+                    run_end = breaks[ run_end ] if run_end < len( breaks ) else len( starts )
+                    lines.append( text[ offsets[ index ]:offsets[ run_end ]] )
+                    for run_index in range( index, run_end ) :
+                        if targets[ run_index ] != NO_TARGET :
+                            symbols.add_reference( targets[ run_index ], starts[ run_index ], kinds[ run_index ] )
+                    pc = starts[ run_end - 1 ] + lengths[ run_end - 1 ]
+                    buffered += run_end - index
+                    index = run_end
+                else :
+                    if anomalies is None :
+                        instruction = decode( memory, pc )
+                    else :
+                        instruction = decode_lenient( memory, pc, anomalies )
+                    lines.append( line_template % instruction.render( names ))
+                    symbols.add( instruction )
+                    pc = instruction.next_address
+                    index = bisect_left( starts, pc, index )
+                    buffered += 1
+
+                if buffered >= flush_lines :
+                    out.write( ''.join( lines ))
+                    lines.clear()
+                    count += buffered
+                    buffered = 0
+
+    out.write( ''.join( lines ))
+    count += buffered
+
+    return( count )
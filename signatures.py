@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""Code Signature Index:
+
+    Finds known routines (a BIOS print, a keyboard scan...) in a collection
+    of ROMs without grepping their listings. Each image is decoded with a
+    linear sweep (as batch.py) and every run of GRAM_SIZE instructions in a
+    row is indexed by its decode table entries only, so the operands are
+    masked and code that has been moved, or loads different values, still
+    matches. Bytes that are not decoded break the runs.
+
+    A gram's key is the GRAM_SIZE entries packed ENTRY_BITS apiece into one
+    64 bit integer, first instruction in the high bits, so there are no hash
+    collisions and all of the grams that start with the same instructions
+    are next to each other. Each place a gram was found is a posting:
+    ( image number << ADDRESS_BITS ) | address of its first instruction.
+
+    The index file is laid out so it can be memory mapped and searched where
+    it is, without reading it in:
+
+        - header                MAGIC, format version, gram size, the number
+                                of images, keys and postings, the size of the
+                                names and the decode table hash (see cache.py)
+        - keys                  The distinct gram keys, sorted (64 bit)
+        - offsets               Where each key's postings start, plus one
+                                for the end (64 bit)
+        - postings              The postings of each key, sorted (64 bit)
+        - names                 The image names, UTF-8, separated by NUL
+
+    A search decodes the sequence of instructions to look for and looks up
+    a gram at every GRAM_SIZE instructions (and the last one) with a binary
+    search of the keys. Starting from the key with the fewest postings, a
+    place only matches if every other gram is found the right number of
+    bytes after it. A sequence shorter than a gram matches the range of
+    keys it is the start of.
+
+        ./signatures.py -i <index> [-j <jobs>] -b <file|dir|glob> ...
+        ./signatures.py -i <index> -q '<hex bytes>'
+        ./signatures.py -i <index> -f <binfile> -a <hex address> [-n <count>]
+"""
+from array import array
+from bisect import bisect_left
+import mmap
+from optparse import OptionParser
+import struct
+import sys
+from decoder import disassemble, disassemble_lenient, LENGTHS, WORD_FORMAT
+from cache import table_version
+from binio import to_bytes, atomic_write
+
+MAGIC = b'Z80S'
+FORMAT_VERSION = 1
+# MAGIC, format version, gram size, images, keys, postings, names size and
+# the decode table hash
+HEADER = struct.Struct( '<4sIIIQQQ16s' )
+GRAM_SIZE = 4
+ENTRY_BITS = ( len( LENGTHS ) - 1 ).bit_length()
+ADDRESS_BITS = 32
+ADDRESS_MASK = ( 1 << ADDRESS_BITS ) - 1
+NAME_SEPARATOR = '\0'
+SEARCH_COUNT = 8
+JOB_CHUNK_SIZE = 16
+
+def gram_key( entries ) :
+    """The key of a sequence of up to GRAM_SIZE decode table entries. A
+        shorter sequence gives the lowest key of the grams it starts.
+    """
+    key = 0
+    for entry in entries :
+        key = ( key << ENTRY_BITS ) | entry
+
+    return( key << ( ENTRY_BITS * ( GRAM_SIZE - len( entries ))))
+
+def image_grams( memory ) :
+    """The gram keys of an image and the address each one starts at, as
+        two arrays
+    """
+    keys = array( 'Q' )
+    addresses = array( 'L' )
+    key_mask = ( 1 << ( ENTRY_BITS * GRAM_SIZE )) - 1
+    recent = [ 0 ] * GRAM_SIZE
+    key = 0
+    run = 0
+    for record in disassemble_lenient( memory ) :
+        entry = record.entry
+        if entry is None :
+            run = 0
+            continue
+
+        key = (( key << ENTRY_BITS ) | entry ) & key_mask
+        recent[ run % GRAM_SIZE ] = record.address
+        run += 1
+        if run >= GRAM_SIZE :
+            keys.append( key )
+            addresses.append( recent[ run % GRAM_SIZE ] )
+
+    return( keys, addresses )
+
+def file_grams( filepath ) :
+    """Worker: the grams of one file, or the error that stopped it
+    """
+    try :
+        with open( filepath, 'rb' ) as fh :
+            return( image_grams( fh.read() ) + ( None, ))
+    except Exception as e :
+        return( array( 'Q' ), array( 'L' ), '{}: {}'.format( type( e ).__name__, e ))
+
+def build_index( paths, index_path, workers=1 ) :
+    """Index every file found from paths (see batch.find_files()) and write
+        the index to index_path. Returns a list of ( file, error ) for the
+        files that could not be read.
+    """
+    # batch.py pulls in multiprocessing, which a search does not need
+    from batch import find_files
+    import multiprocessing
+
+    files = [ filepath for ( filepath, output ) in find_files( paths )]
+    if workers > 1 :
+        with multiprocessing.Pool( workers ) as pool :
+            results = list( pool.imap( file_grams, files, JOB_CHUNK_SIZE ))
+    else :
+        results = [ file_grams( filepath ) for filepath in files ]
+
+    grams = {}
+    failed = []
+    for ( image, ( filepath, ( keys, addresses, error ))) in enumerate( zip( files, results )) :
+        if error :
+            failed.append(( filepath, error ))
+        image <<= ADDRESS_BITS
+        for ( key, address ) in zip( keys, addresses ) :
+            postings = grams.get( key )
+            if postings is None :
+                postings = grams[ key ] = array( 'Q' )
+            postings.append( image | address )
+
+    keys = array( 'Q', sorted( grams ))
+    offsets = array( 'Q', [ 0 ] )
+    postings = array( 'Q' )
+    for key in keys :
+        postings.extend( grams[ key ] )
+        offsets.append( len( postings ))
+    names = NAME_SEPARATOR.join( files ).encode( 'utf-8' )
+
+    atomic_write( index_path, ( HEADER.pack( MAGIC, FORMAT_VERSION, GRAM_SIZE, len( files ), len( keys ),
+                                             len( postings ), len( names ), table_version() ),
+                                to_bytes( keys ), to_bytes( offsets ), to_bytes( postings ), names ))
+
+    return( failed )
+
+class SignatureIndex :
+    """A memory mapped index file. The keys and postings are read straight
+        from the map.
+    """
+    __slots__ = ( '_map', 'keys', 'offsets', 'postings', 'names' )
+
+    def __init__( self, path ) :
+        with open( path, 'rb' ) as fh :
+            self._map = mmap.mmap( fh.fileno(), 0, access=mmap.ACCESS_READ )
+
+        if len( self._map ) < HEADER.size :
+            raise ValueError( '{} is not a signature index'.format( path ))
+        ( magic, version, gram_size, images, key_count, posting_count, names_size, tables ) = \
+            HEADER.unpack_from( self._map )
+        keys_start = HEADER.size
+        postings_start = keys_start + 8 * ( 2 * key_count + 1 )
+        names_start = postings_start + 8 * posting_count
+        if magic != MAGIC or version != FORMAT_VERSION or gram_size != GRAM_SIZE or \
+           len( self._map ) != names_start + names_size :
+            raise ValueError( '{} is not a signature index'.format( path ))
+        if tables != table_version() :
+            raise ValueError( '{} was built from other op-code tables, build it again'.format( path ))
+        if sys.byteorder != 'little' :
+            raise ValueError( 'signature indexes can only be searched on a little endian machine' )
+
+        view = memoryview( self._map )
+        self.keys = view[ keys_start:keys_start + 8 * key_count ].cast( 'Q' )
+        self.offsets = view[ keys_start + 8 * key_count:postings_start ].cast( 'Q' )
+        self.postings = view[ postings_start:names_start ].cast( 'Q' )
+        self.names = self._map[ names_start: ].decode( 'utf-8' ).split( NAME_SEPARATOR ) if images else []
+
+    def close( self ) :
+        for view in ( self.keys, self.offsets, self.postings ) :
+            view.release()
+        self._map.close()
+
+    def _key_postings( self, low, high ) :
+        """The postings of the keys from low up to (not including) high
+        """
+        first = bisect_left( self.keys, low )
+        last = bisect_left( self.keys, high, first )
+        return( self.postings[ self.offsets[ first ]:self.offsets[ last ]] )
+
+    def search( self, entries ) :
+        """Every place the sequence of decode table entries is found, as a
+            sorted list of ( image name, address ) pairs
+        """
+        if not entries :
+            return( [] )
+
+        if len( entries ) < GRAM_SIZE :
+            low = gram_key( entries )
+            found = set( self._key_postings( low, low + ( 1 << ( ENTRY_BITS * ( GRAM_SIZE - len( entries ))))))
+        else :
+            # Look up a gram every GRAM_SIZE instructions and the last one,
+            # with how many bytes into the sequence each starts
+            offsets = [ 0 ]
+            for entry in entries :
+                offsets.append( offsets[ -1 ] + LENGTHS[ entry ] )
+            positions = sorted( set( range( 0, len( entries ) - GRAM_SIZE + 1, GRAM_SIZE )) |
+                                { len( entries ) - GRAM_SIZE } )
+            grams = []
+            for position in positions :
+                key = gram_key( entries[ position:position + GRAM_SIZE ] )
+                grams.append(( self._key_postings( key, key + 1 ), offsets[ position ] ))
+            grams.sort( key=lambda gram : len( gram[ 0 ] ))
+
+            ( postings, offset ) = grams[ 0 ]
+            found = { posting - offset for posting in postings if ( posting & ADDRESS_MASK ) >= offset }
+            for ( postings, offset ) in grams[ 1: ] :
+                if not found :
+                    break
+                matched = set()
+                for place in found :
+                    index = bisect_left( postings, place + offset )
+                    if index < len( postings ) and postings[ index ] == place + offset :
+                        matched.add( place )
+                found = matched
+
+        return([( self.names[ place >> ADDRESS_BITS ], place & ADDRESS_MASK ) for place in sorted( found )])
+
+def sequence_entries( memory, start=0, count=None ) :
+    """The decode table entries of count instructions (or all of them) from
+        start, to search for
+    """
+    entries = []
+    for instruction in disassemble( memory, start ) :
+        if count is not None and len( entries ) >= count :
+            break
+        entries.append( instruction.entry )
+
+    return( entries )
+
+if __name__ == "__main__" :
+    parser = OptionParser()
+    parser.add_option( '-i', '--index', dest='index', default=None)
+    parser.add_option( '-b', '--build', dest='build', action='store_true', default=False)
+    parser.add_option( '-j', '--jobs', dest='jobs', type='int', default=1)
+    parser.add_option( '-q', '--query', dest='query', default=None)
+    parser.add_option( '-f', '--file', dest='binfile', default=None)
+    parser.add_option( '-a', '--address', dest='address', default='0')
+    parser.add_option( '-n', '--count', dest='count', type='int', default=SEARCH_COUNT)
+    (opt, args) = parser.parse_args()
+
+    if not opt.index or not ( opt.build and args or opt.query or opt.binfile ) :
+        print( 'usage: -i <index> [-j <jobs>] -b <file|dir|glob> ...\n'
+               '       -i <index> -q <hex bytes>\n'
+               '       -i <index> -f <binfile> [-a <hex address>] [-n <count>]')
+        sys.exit(1)
+
+    if opt.build :
+        failed = build_index( args, opt.index, opt.jobs )
+        for ( filepath, error ) in failed :
+            print( '{}: {}'.format( filepath, error ), file=sys.stderr )
+        sys.exit( 1 if failed else 0 )
+
+    try :
+        if opt.query :
+            entries = sequence_entries( bytes.fromhex( opt.query ))
+        else :
+            with open( opt.binfile, 'rb' ) as fh :
+                entries = sequence_entries( fh.read(), int( opt.address, 16 ), opt.count )
+        index = SignatureIndex( opt.index )
+
+    except Exception as e :
+        print( e )
+        sys.exit(1)
+
+    for ( name, address ) in index.search( entries ) :
+        print( '{} {}'.format( name, WORD_FORMAT.format( address )))
+    index.close()
@@ -0,0 +1,132 @@
+"""Decode Table Snapshot:
+
+    Building the decode tables at start up means unpacking opcode.tables and
+    compiling every entry (see decoder.py), which for a small ROM is a large
+    part of the run. The snapshot is the compiled tables saved as one binary
+    file that is read with a single read() and turned back into the lists
+    without building a Python object per entry:
+
+        - header                MAGIC, format version, the number of entries,
+                                the size of the string pool and a checksum of
+                                opcode.tables (so a changed table is never
+                                served from an old snapshot)
+        - prefixes              The table base for each first byte (16 bit)
+        - records               One fixed width record per entry of RECORD_FIELDS
+                                16 bit fields: mnemonic, length, layout, operand
+                                offset, op-code text and '%' template. The
+                                strings are indexes into the pool.
+        - string pool           Every distinct string once, UTF-8, separated
+                                by NUL. The first is empty and stands for None.
+
+    The fields are read out of the records with strided memoryview slices
+    and the pool is split once, so each distinct string is only made once.
+    All of the numbers are little endian; on a big endian machine load()
+    returns None and the tables are compiled as before. Nothing beyond sys
+    and zlib (which is small and already loaded by most Pythons) is imported
+    to load a snapshot, as struct or hashlib would cost more than the load
+    itself, so the header is read with int.from_bytes() and the checksum is
+    the CRC-32 of the file with its length in the upper 32 bits.
+"""
+import sys
+import zlib
+
+MAGIC = b'Z80T'
+FORMAT_VERSION = 1
+# MAGIC, then the format version, entry count and pool size (32 bit) and
+# the checksum (64 bit)
+HEADER_FIELDS = ( 4, 4, 4, 4, 8 )
+HEADER_SIZE = sum( HEADER_FIELDS )
+CHECKSUM_BITS = 64
+RECORD_FIELDS = 6
+FIELD_MNEMONIC = 0
+FIELD_LENGTH = 1
+FIELD_LAYOUT = 2
+FIELD_OPERAND_OFFSET = 3
+FIELD_OPCODE_TEXT = 4
+FIELD_TEMPLATE = 5
+FIELD_SIZE = 2
+PREFIX_COUNT = 256
+NO_STRING = 0
+POOL_SEPARATOR = '\0'
+
+def checksum( path, seed=0 ) :
+    """The checksum of the file that the snapshot is built from. The seed is
+        mixed in so that a change to how the file is compiled also shows.
+    """
+    with open( path, 'rb' ) as fh :
+        data = fh.read()
+
+    return(((( len( data ) << 32 ) | zlib.crc32( data )) ^ seed ) & (( 1 << CHECKSUM_BITS ) - 1 ))
+
+def save( path, source_checksum, prefixes, mnemonics, lengths, layouts,
+          operand_offsets, templates, opcode_text ) :
+    """Write the compiled tables to a snapshot file
+    """
+    pool = [ '' ]
+    indexes = {}
+    def intern( text ) :
+        if text is None :
+            return( NO_STRING )
+        if text not in indexes :
+            indexes[ text ] = len( pool )
+            pool.append( text )
+        return( indexes[ text ] )
+
+    records = []
+    for entry in range( len( mnemonics )) :
+        records.extend(( intern( mnemonics[ entry ] ), lengths[ entry ], layouts[ entry ],
+                         operand_offsets[ entry ], intern( opcode_text[ entry ] ),
+                         intern( templates[ entry ] )))
+    pool_bytes = POOL_SEPARATOR.join( pool ).encode( 'utf-8' )
+
+    header = MAGIC
+    for ( value, size ) in zip(( FORMAT_VERSION, len( mnemonics ), len( pool_bytes ), source_checksum ),
+                               HEADER_FIELDS[ 1: ] ) :
+        header += value.to_bytes( size, 'little' )
+
+    from binio import atomic_write
+    atomic_write( path, ( header, b''.join([ value.to_bytes( FIELD_SIZE, 'little' ) for value in prefixes + records ]),
+                          pool_bytes ))
+
+def load( path, source_checksum ) :
+    """Read the compiled tables from a snapshot file. Returns ( prefixes,
+        mnemonics, lengths, layouts, operand_offsets, templates, opcode_text )
+        or None if there is no valid, up to date snapshot.
+    """
+    if sys.byteorder != 'little' :
+        return( None )
+
+    try :
+        with open( path, 'rb' ) as fh :
+            data = fh.read()
+    except OSError :
+        return( None )
+
+    if len( data ) < HEADER_SIZE :
+        return( None )
+    header = []
+    offset = 0
+    for size in HEADER_FIELDS :
+        header.append( data[ offset:offset + size ] )
+        offset += size
+    ( magic, version, entries, pool_size, saved_checksum ) = \
+        [ header[ 0 ]] + [ int.from_bytes( field, 'little' ) for field in header[ 1: ]]
+    records_start = HEADER_SIZE + PREFIX_COUNT * FIELD_SIZE
+    pool_start = records_start + entries * RECORD_FIELDS * FIELD_SIZE
+    if magic != MAGIC or version != FORMAT_VERSION or saved_checksum != source_checksum or \
+       len( data ) != pool_start + pool_size :
+        return( None )
+
+    view = memoryview( data )
+    prefixes = view[ HEADER_SIZE:records_start ].cast( 'H' ).tolist()
+    fields = view[ records_start:pool_start ].cast( 'H' )
+    pool = data[ pool_start: ].decode( 'utf-8' ).split( POOL_SEPARATOR )
+    pool[ NO_STRING ] = None
+
+    def strings( field ) :
+        return( list( map( pool.__getitem__, fields[ field::RECORD_FIELDS ] )))
+
+    return ( prefixes, strings( FIELD_MNEMONIC ), fields[ FIELD_LENGTH::RECORD_FIELDS ].tolist(),
+             fields[ FIELD_LAYOUT::RECORD_FIELDS ].tolist(),
+             fields[ FIELD_OPERAND_OFFSET::RECORD_FIELDS ].tolist(),
+             strings( FIELD_TEMPLATE ), strings( FIELD_OPCODE_TEXT ))
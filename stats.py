@@ -0,0 +1,119 @@
+"""Instruction Statistics:
+
+    Counts what a disassembly is made of without rendering any text:
+
+        - per table             How many instructions came from each of the
+                                decode tables (opcode, cb_opcode, ...)
+        - per mnemonic          How many of each instruction name (LD, JP...)
+        - per address range     How many instructions start in each block of
+                                range_size bytes (for a memory map only the
+                                blocks that hold part of a segment)
+
+    The only counters updated for each instruction are two preallocated
+    integer arrays, one indexed by decode table entry and one by address
+    range. The per table and per mnemonic totals are summed from the entry
+    counts when they are asked for, so they cost nothing in the decode loop.
+    Bytes listed as data (see flow.py and the lenient decode) are counted on
+    their own.
+"""
+from array import array
+from decoder import MNEMONICS, TABLE_SIZE, WORD_FORMAT
+# The tables are numbered in the same order in decoder.py and tablegen.py
+from tablegen import TABLE_NAMES
+
+RANGE_SIZE = 0x1000
+COUNT_FORMAT = '{:16s} {}\n'
+RANGE_FORMAT = WORD_FORMAT + '-' + WORD_FORMAT
+DATA_NAME = 'data bytes'
+
+def _mnemonic_name( mnenomic ) :
+    return( mnenomic.split( ' ', 1 )[ 0 ] )
+
+# The instruction names and, for each decode table entry, the index of its
+# name (-1 if the entry is not defined)
+MNEMONIC_NAMES = sorted({ _mnemonic_name( mnenomic ) for mnenomic in MNEMONICS if mnenomic })
+_NAME_INDEXES = { name : index for ( index, name ) in enumerate( MNEMONIC_NAMES )}
+ENTRY_NAMES = [ -1 if mnenomic is None else _NAME_INDEXES[ _mnemonic_name( mnenomic ) ]
+                for mnenomic in MNEMONICS ]
+
+class Stats :
+    """Instruction counts for an image of size bytes
+    """
+    __slots__ = ( 'entries', 'ranges', 'range_size', 'mapped', 'data_bytes' )
+
+    def __init__( self, size, range_size=RANGE_SIZE, mapped=None ) :
+        """mapped is the ( start, end ) address ranges that hold the image
+            (see MemoryMap.ranges()), None if it all does
+        """
+        self.entries = array( 'q', bytes( 8 * len( MNEMONICS )))
+        self.ranges = array( 'q', bytes( 8 * max( 1, ( size + range_size - 1 ) // range_size )))
+        self.range_size = range_size
+        self.mapped = None
+        if mapped is not None :
+            self.mapped = sorted({ index for ( start, end ) in mapped if end > start
+                                   for index in range( start // range_size, ( end - 1 ) // range_size + 1 )})
+        self.data_bytes = 0
+
+    def count( self, records ) :
+        """Count every Instruction (and Data) record from records, e.g. a
+            disassemble() generator. Returns the number of records.
+        """
+        entries = self.entries
+        ranges = self.ranges
+        range_size = self.range_size
+        count = 0
+        for record in records :
+            entry = record.entry
+            if entry is None :
+                self.data_bytes += record.length
+            else :
+                entries[ entry ] += 1
+                ranges[ record.address // range_size ] += 1
+            count += 1
+
+        return( count )
+
+    def tables( self ) :
+        """Dictionary of table name -> instruction count
+        """
+        return({ name : sum( self.entries[ table * TABLE_SIZE:( table + 1 ) * TABLE_SIZE ] )
+                 for ( table, name ) in enumerate( TABLE_NAMES )})
+
+    def mnemonics( self ) :
+        """Dictionary of instruction name -> count, most used first (only the
+            names that were seen)
+        """
+        counts = [ 0 ] * len( MNEMONIC_NAMES )
+        for ( entry, count ) in enumerate( self.entries ) :
+            if count :
+                counts[ ENTRY_NAMES[ entry ]] += count
+
+        order = sorted( range( len( counts )), key=lambda index : ( -counts[ index ], MNEMONIC_NAMES[ index ] ))
+        return({ MNEMONIC_NAMES[ index ] : counts[ index ] for index in order if counts[ index ] })
+
+    def address_ranges( self ) :
+        """Dictionary of 'start-end' address range -> count
+        """
+        indexes = range( len( self.ranges )) if self.mapped is None else self.mapped
+        return({ RANGE_FORMAT.format( index * self.range_size, ( index + 1 ) * self.range_size - 1 ) : self.ranges[ index ]
+                 for index in indexes })
+
+    def as_dict( self ) :
+        return({ 'tables' : self.tables(), 'mnemonics' : self.mnemonics(),
+                 'ranges' : self.address_ranges(), DATA_NAME : self.data_bytes })
+
+def write_stats( stats, out ) :
+    """Write the counts as 'name count' lines in three sections, each headed
+        by a ';' comment
+    """
+    lines = [ '; instructions per table\n' ]
+    lines += [ COUNT_FORMAT.format( name, count ) for ( name, count ) in stats.tables().items() ]
+    lines.append( '; instructions per mnemonic\n' )
+    lines += [ COUNT_FORMAT.format( name, count ) for ( name, count ) in stats.mnemonics().items() ]
+    lines.append( '; instructions per address range\n' )
+    lines += [ COUNT_FORMAT.format( name, count ) for ( name, count ) in stats.address_ranges().items() ]
+    if stats.data_bytes :
+        lines.append( '; not decoded\n' )
+        lines.append( COUNT_FORMAT.format( DATA_NAME, stats.data_bytes ))
+
+    out.write( ''.join( lines ))
@@ -0,0 +1,150 @@
+"""Symbol Index:
+
+    The symbol table that get_opcode() builds is a dictionary of formatted
+    'SYM_XXXX' labels, which costs two formatted strings per reference and
+    loses who made the reference. The SymbolIndex is keyed by the integer
+    address instead and keeps, for every symbol, a compact array of the
+    instructions that reference it and how:
+
+        - REF_JUMP              JP to the address
+        - REF_CALL              CALL to the address
+        - REF_RELATIVE          JR or DJNZ to the address
+        - REF_LOAD              Anything else using the address or 16 bit value
+                                (LD, IN, OUT...)
+
+    Each reference is packed into one integer: ( address << 2 ) | kind.
+    The labels are only made when the table is printed.
+
+    The sorted list of addresses is built once (and kept until a new symbol
+    is added) so symbols can be printed in address order and looked up with
+    a binary search, e.g. the nearest label at or before an address. Indexes
+    from several images or workers are combined with merge_indexes(), which
+    merges their already sorted address lists rather than re-sorting.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+import heapq
+from decoder import symbol_label, MNEMONICS, LAYOUTS, OPERAND_RELATIVE, WORD_FORMAT
+
+REF_JUMP = 0
+REF_CALL = 1
+REF_RELATIVE = 2
+REF_LOAD = 3
+REF_NAMES = ( 'jump', 'call', 'relative', 'load' )
+
+REF_KIND_BITS = 2
+REF_KIND_MASK = ( 1 << REF_KIND_BITS ) - 1
+
+def _reference_kind( mnenomic, layout ) :
+    if layout == OPERAND_RELATIVE :
+        return( REF_RELATIVE )
+    if mnenomic.startswith( 'JP ' ) :
+        return( REF_JUMP )
+    if mnenomic.startswith( 'CALL ' ) :
+        return( REF_CALL )
+
+    return( REF_LOAD )
+
+REFERENCE_KINDS = [ REF_LOAD if mnenomic is None else _reference_kind( mnenomic, layout )
+                    for ( mnenomic, layout ) in zip( MNEMONICS, LAYOUTS ) ]
+
+class SymbolIndex :
+    """Symbol addresses, in the order they were first referenced, with the
+        references to each one
+    """
+    __slots__ = ( '_references', '_sorted' )
+
+    def __init__( self ) :
+        self._references = {}
+        self._sorted = None
+
+    def __len__( self ) :
+        return( len( self._references ))
+
+    def __contains__( self, address ) :
+        return( address in self._references )
+
+    def __iter__( self ) :
+        return( iter( self._references ))
+
+    def add_reference( self, target, address, kind ) :
+        """Record that the instruction at address references target
+        """
+        references = self._references.get( target )
+        if references is None :
+            references = self._references[ target ] = array( 'q' )
+            self._sorted = None
+        references.append(( address << REF_KIND_BITS ) | kind )
+
+    def add( self, instruction ) :
+        """If the instruction uses a memory location then add the reference
+        """
+        target = instruction.target
+        if target is not None :
+            self.add_reference( target, instruction.address, REFERENCE_KINDS[ instruction.entry ] )
+
+    def references( self, target ) :
+        """List of ( address, kind ) for each reference to target
+        """
+        return([( packed >> REF_KIND_BITS, packed & REF_KIND_MASK )
+                for packed in self._references.get( target, () )])
+
+    def sorted_targets( self ) :
+        """All the symbol addresses in address order
+        """
+        if self._sorted is None :
+            self._sorted = sorted( self._references )
+
+        return( self._sorted )
+
+    def nearest( self, address ) :
+        """The symbol address at or before address (None if there is not one)
+        """
+        targets = self.sorted_targets()
+        index = bisect_right( targets, address )
+        if index :
+            return( targets[ index - 1 ] )
+
+        return( None )
+
+    def targets_between( self, start, end ) :
+        """The symbol addresses from start up to (but not including) end,
+            in address order
+        """
+        targets = self.sorted_targets()
+        return( targets[ bisect_left( targets, start ):bisect_left( targets, end )] )
+
+    def symbol_table( self, ordered=False, names=None ) :
+        """The symbol table dictionary (label -> address) as get_opcode()
+            builds it, or in address order if ordered is True. The labels
+            are taken from names (address -> name) where it has them.
+        """
+        targets = self.sorted_targets() if ordered else self._references
+        return({ symbol_label( target, names ) : WORD_FORMAT.format( target )
+                 for target in targets })
+
+def merge_indexes( indexes ) :
+    """Merge several SymbolIndexes into a new one. The references to a
+        symbol are kept in the order of the indexes and the sorted address
+        list is built by merging each index's sorted list, so the cost is
+        linear in the number of references (plus a log factor for the
+        number of indexes).
+    """
+    indexes = list( indexes )
+    merged = SymbolIndex()
+    references = merged._references
+    for index in indexes :
+        for ( target, packed ) in index._references.items() :
+            existing = references.get( target )
+            if existing is None :
+                references[ target ] = array( 'q', packed )
+            else :
+                existing.extend( packed )
+
+    targets = []
+    for target in heapq.merge( *[ index.sorted_targets() for index in indexes ] ) :
+        if not targets or targets[ -1 ] != target :
+            targets.append( target )
+    merged._sorted = targets
+
+    return( merged )
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Symbol Files:
+
+    Loads the names of addresses so the listing can say 'CALL E3B7  [PRINT]'
+    instead of 'SYM_E3B7'. The names are kept in a dictionary keyed by the
+    integer address, so finding the name for an operand is one lookup.
+
+    A symbol file is text, one symbol to a line, in any of these forms:
+
+        PRINT = E3B7            As dasm.py writes its symbol table (the value
+                                is hex)
+        PRINT EQU 0E3B7H        Assembler style, also with a ':' after the
+        PRINT: .EQU $E3B7       name, DEFL or .EQU, and the value marked as hex
+        PRINT EQU 0xE3B7        with an H suffix or a $, #, & or 0x prefix.
+        PRINT EQU 58295         An EQU value with no mark is decimal if it is
+                                all digits.
+
+    Anything after a ';' is a comment and lines that are not symbols are
+    skipped. If an address is given more than one name the first is used.
+
+    The file is read a line at a time with one regular expression match per
+    line. For a large shared file that is loaded on every run it can be
+    turned into a binary index once:
+
+        ./symfile.py symbol.txt symbol.z80n
+
+    which is loaded (by the same -s option) with a single read:
+
+        - header                MAGIC, format version, the number of symbols
+                                and the size of the names
+        - addresses             The address of each symbol (signed 64 bit)
+        - names                 The names, UTF-8, separated by NUL
+"""
+from array import array
+import re
+import struct
+import sys
+from binio import to_bytes, from_bytes, atomic_write
+
+MAGIC = b'Z80N'
+FORMAT_VERSION = 1
+HEADER = struct.Struct( '<4sIII' )
+NAME_SEPARATOR = '\0'
+HEX_BASE = 16
+DECIMAL_BASE = 10
+
+SYMBOL_LINE = re.compile( r'\s*([A-Za-z_.?@][\w.?@$]*)\s*:?\s*(=|\.?EQU\b|DEFL\b)\s*'
+                          r'(\$|0X|#|&)?([0-9A-F]+)(H)?\s*(?:;.*)?$', re.IGNORECASE )
+
+def _value( directive, prefix, digits, suffix ) :
+    if prefix or suffix or directive == '=' or not digits.isdigit() :
+        return( int( digits, HEX_BASE ))
+
+    return( int( digits, DECIMAL_BASE ))
+
+def parse_symbols( lines ) :
+    """Dictionary of address -> name from the lines of a text symbol file
+    """
+    names = {}
+    match = SYMBOL_LINE.match
+    for line in lines :
+        found = match( line )
+        if found :
+            ( name, directive, prefix, digits, suffix ) = found.groups()
+            names.setdefault( _value( directive, prefix, digits, suffix ), name )
+
+    return( names )
+
+def save_index( names, path ) :
+    """Write the names (address -> name) as a binary index
+    """
+    addresses = array( 'q', names )
+    pool = NAME_SEPARATOR.join( names.values() ).encode( 'utf-8' )
+    atomic_write( path, ( HEADER.pack( MAGIC, FORMAT_VERSION, len( addresses ), len( pool )),
+                          to_bytes( addresses ), pool ))
+
+def _load_index( data, path ) :
+    ( magic, version, count, pool_size ) = HEADER.unpack_from( data )
+    if version != FORMAT_VERSION or len( data ) != HEADER.size + 8 * count + pool_size :
+        raise ValueError( '{} is not a valid symbol index, make it again'.format( path ))
+
+    addresses = from_bytes( 'q', data[ HEADER.size:HEADER.size + 8 * count ] )
+    pool = data[ HEADER.size + 8 * count: ].decode( 'utf-8' )
+
+    return( dict( zip( addresses, pool.split( NAME_SEPARATOR ))) if count else {} )
+
+def load_symbols( path ) :
+    """Dictionary of address -> name from a text symbol file or a binary
+        index made from one
+    """
+    with open( path, 'rb' ) as fh :
+        if fh.read( len( MAGIC )) == MAGIC :
+            return( _load_index( MAGIC + fh.read(), path ))
+
+    with open( path, 'r', errors='replace' ) as fh :
+        return( parse_symbols( fh ))
+
+if __name__ == "__main__" :
+    if len( sys.argv ) != 3 :
+        print( 'usage: <symbol file> <index file>' )
+        sys.exit(1)
+
+    try :
+        names = load_symbols( sys.argv[ 1 ] )
+        save_index( names, sys.argv[ 2 ] )
+    except Exception as e :
+        print( e )
+        sys.exit(1)
+
+    print( '{} symbols'.format( len( names )))
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""Z80 Table Generator:
+
+    Builds the op-code tables that opcode.py loads from the rules the Z80
+    uses to encode its instructions, rather than typing in every entry. Each
+    op-code byte is split into the bit fields:
+
+        x = bits 7-6            y = bits 5-3            z = bits 2-0
+                                p = bits 5-4            q = bit 3
+
+    x picks the group (e.g. x = 1 is 'LD r,r'), z the kind of operation
+    inside the group and y (or p and q) the register, condition or ALU
+    operation. The tables are:
+
+        - opcode                The normal op-codes
+        - cb_opcode             'CB xx' rotates, shifts and bit operations
+        - ed_opcode             'ED xx' (the undefined ones are left out)
+        - dd_opcode             'DD xx', the normal op-codes with HL, H, L and
+                                (HL) replaced by IX, IXH, IXL and (IX+d). Only
+                                the op-codes the prefix changes are included.
+        - fd_opcode             'FD xx', the same with IY
+        - ddcb_opcode           'DD CB d xx', the CB op-codes on (IX+d)
+        - fdcb_opcode           'FD CB d xx', the same with IY
+
+    in the format described in opcode.py. They are written with marshal to
+    opcode.tables, which loads much quicker than importing the tables as
+    dictionary literals. Run this again after changing any of the rules:
+
+        ./tablegen.py [--check]
+
+    Writing opcode.tables also brings decoder.py's snapshot of the compiled
+    tables (decoder.snapshot, see snapshot.py) up to date; this is the only
+    place the snapshot is written. --check does not write anything. It
+    rebuilds the tables, checks every encoding (see verify()) and that
+    opcode.tables and the snapshot are up to date.
+"""
+import marshal
+import os
+import sys
+
+TABLES_FILE = os.path.join( os.path.dirname( os.path.abspath( __file__ )), 'opcode.tables' )
+TABLES_VERSION = 1
+
+BYTE = '{byte:02X}'
+WORD = '{hi_byte:02X}{low_byte:02X}'
+LOW_BYTE = '{low_byte:02X}'
+HIGH_BYTE = '{hi_byte:02X}'
+
+REGISTERS = ( 'B', 'C', 'D', 'E', 'H', 'L', '(HL)', 'A' )
+REGISTER_PAIRS = ( 'BC', 'DE', 'HL', 'SP' )
+STACK_PAIRS = ( 'BC', 'DE', 'HL', 'AF' )
+CONDITIONS = ( 'NZ', 'Z', 'NC', 'C', 'PO', 'PE', 'P', 'M' )
+ALU_OPERATIONS = ( 'ADD A,', 'ADC A,', 'SUB A,', 'SBC A,', 'AND ', 'XOR ', 'OR ', 'CP ' )
+ROTATES = ( 'RLC', 'RRC', 'RL', 'RR', 'SLA', 'SRA', 'SLL', 'SRL' )
+BIT_OPERATIONS = ( None, 'BIT', 'RES', 'SET' )
+ACCUMULATOR_OPERATIONS = ( 'RLCA', 'RRCA', 'RLA', 'RRA', 'DAA', 'CPL', 'SCF', 'CCF' )
+EXCHANGE_OPERATIONS = ( None, None, 'OUT (' + BYTE + '),A', 'IN A,(' + BYTE + ')',
+                        'EX (SP),HL', 'EX DE,HL', 'DI', 'EI' )
+INTERRUPT_MODES = ( '0', '0', '1', '2', '0', '0', '1', '2' )
+ED_REGISTER_OPERATIONS = ( 'LD I,A', 'LD R,A', 'LD A,I', 'LD A,R', 'RRD', 'RLD', 'NOP', 'NOP' )
+BLOCK_OPERATIONS = (
+    ( 'LDI', 'CPI', 'INI', 'OUTI' ),
+    ( 'LDD', 'CPD', 'IND', 'OUTD' ),
+    ( 'LDIR', 'CPIR', 'INIR', 'OTIR' ),
+    ( 'LDDR', 'CPDR', 'INDR', 'OTDR' ),
+)
+
+PREFIX_CB = 0xCB
+PREFIX_DD = 0xDD
+PREFIX_ED = 0xED
+PREFIX_FD = 0xFD
+PREFIXES = ( PREFIX_CB, PREFIX_DD, PREFIX_ED, PREFIX_FD )
+INDEX_REGISTERS = { PREFIX_DD : 'IX', PREFIX_FD : 'IY' }
+
+# Bytes before the operands: the op-code, the prefix and op-code, or the
+# prefix, 'CB' and op-code of the indexed bit operations (the displacement
+# between them is the operand)
+OPCODE_SIZE = 1
+EXTENDED_SIZE = 2
+INDEXED_BIT_SIZE = 3
+
+TABLE_NAMES = ( 'opcode', 'cb_opcode', 'dd_opcode', 'ed_opcode',
+                'fd_opcode', 'ddcb_opcode', 'fdcb_opcode' )
+
+def fields( value ) :
+    """Split an op-code byte into ( x, y, z, p, q )
+    """
+    y = ( value >> 3 ) & 7
+    return ( value >> 6, y, value & 7, y >> 1, y & 1 )
+
+def operand_size( mnenomic ) :
+    """The number of operand bytes, from the format labels in the mnemonic
+    """
+    return( mnenomic.count( BYTE ) + mnenomic.count( LOW_BYTE ) + mnenomic.count( HIGH_BYTE ))
+
+def _entry( mnenomic, opcode_size, relative=False ) :
+    operands = operand_size( mnenomic )
+    return ( mnenomic, opcode_size + operands, operands > 0, relative )
+
+def _main_mnemonic( value, index=None ) :
+    """The mnemonic of a normal op-code and whether it is a relative jump,
+        or None for a prefix. With index 'IX' or 'IY' the op-code is
+        decoded as if it followed a 'DD' or 'FD' prefix.
+    """
+    ( x, y, z, p, q ) = fields( value )
+
+    if index is None :
+        hl = 'HL'
+        registers = REGISTERS
+    else :
+        hl = index
+        registers = ( 'B', 'C', 'D', 'E', index + 'H', index + 'L',
+                      '(' + index + '+' + BYTE + ')', 'A' )
+    pairs = ( 'BC', 'DE', hl, 'SP' )
+
+    if x == 0 :
+        if z == 0 :
+            if y == 0 :
+                return ( 'NOP', False )
+            if y == 1 :
+                return ( 'EX AF,AF’', False )
+            if y == 2 :
+                return ( 'DJNZ ' + BYTE, True )
+            if y == 3 :
+                return ( 'JR ' + BYTE, True )
+            return ( 'JR ' + CONDITIONS[ y - 4 ] + ',' + BYTE, True )
+
+        if z == 1 :
+            if q == 0 :
+                return ( 'LD ' + pairs[ p ] + ',' + WORD, False )
+            return ( 'ADD ' + hl + ',' + pairs[ p ], False )
+
+        if z == 2 :
+            if p < 2 :
+                memory = '(' + REGISTER_PAIRS[ p ] + ')'
+                register = 'A'
+            else :
+                memory = '(' + WORD + ')'
+                register = hl if p == 2 else 'A'
+            if q == 0 :
+                return ( 'LD ' + memory + ',' + register, False )
+            return ( 'LD ' + register + ',' + memory, False )
+
+        if z == 3 :
+            return (( 'INC ', 'DEC ' )[ q ] + pairs[ p ], False )
+        if z == 4 :
+            return ( 'INC ' + registers[ y ], False )
+        if z == 5 :
+            return ( 'DEC ' + registers[ y ], False )
+        if z == 6 :
+            if y == 6 and index is not None :
+                # The displacement and then the value
+                return ( 'LD (' + index + '+' + LOW_BYTE + '),' + HIGH_BYTE, False )
+            return ( 'LD ' + registers[ y ] + ',' + BYTE, False )
+
+        return ( ACCUMULATOR_OPERATIONS[ y ], False )
+
+    if x == 1 :
+        if y == 6 and z == 6 :
+            return ( 'HALT', False )
+        if y == 6 or z == 6 :
+            # With (IX+d) the other register is the real H or L
+            return ( 'LD ' + ( registers[ y ] if y == 6 else REGISTERS[ y ] ) + ',' +
+                     ( registers[ z ] if z == 6 else REGISTERS[ z ] ), False )
+        return ( 'LD ' + registers[ y ] + ',' + registers[ z ], False )
+
+    if x == 2 :
+        return ( ALU_OPERATIONS[ y ] + registers[ z ], False )
+
+    if z == 0 :
+        return ( 'RET ' + CONDITIONS[ y ], False )
+    if z == 1 :
+        if q == 0 :
+            return ( 'POP ' + ( 'BC', 'DE', hl, 'AF' )[ p ], False )
+        return (( 'RET', 'EXX', 'JP (' + hl + ')', 'LD SP,' + hl )[ p ], False )
+    if z == 2 :
+        return ( 'JP ' + CONDITIONS[ y ] + ',' + WORD, False )
+    if z == 3 :
+        if y == 0 :
+            return ( 'JP ' + WORD, False )
+        if y == 1 :
+            return( None )
+        if y == 4 :
+            return ( 'EX (SP),' + hl, False )
+        return ( EXCHANGE_OPERATIONS[ y ], False )
+    if z == 4 :
+        return ( 'CALL ' + CONDITIONS[ y ] + ',' + WORD, False )
+    if z == 5 :
+        if q == 0 :
+            return ( 'PUSH ' + ( 'BC', 'DE', hl, 'AF' )[ p ], False )
+        if p == 0 :
+            return ( 'CALL ' + WORD, False )
+        return( None )
+    if z == 6 :
+        return ( ALU_OPERATIONS[ y ] + BYTE, False )
+
+    return ( 'RST {:02X}'.format( y * 8 ), False )
+
+def main_table() :
+    table = {}
+    for value in range( 256 ) :
+        decoded = _main_mnemonic( value )
+        key = '{:02X}'.format( value )
+        table[ key ] = None if decoded is None else _entry( decoded[ 0 ], OPCODE_SIZE, decoded[ 1 ] )
+
+    return( table )
+
+def index_table( prefix ) :
+    """The 'DD xx' or 'FD xx' table: every normal op-code that the prefix
+        changes, i.e. that uses HL, H, L or (HL)
+    """
+    table = {}
+    for value in range( 256 ) :
+        if value in PREFIXES :
+            continue
+
+        decoded = _main_mnemonic( value, INDEX_REGISTERS[ prefix ] )
+        if decoded[ 0 ] != _main_mnemonic( value )[ 0 ] :
+            table[ '{:02X}'.format( value ) ] = _entry( decoded[ 0 ], EXTENDED_SIZE, decoded[ 1 ] )
+
+    return( table )
+
+def cb_table() :
+    table = {}
+    for value in range( 256 ) :
+        ( x, y, z, p, q ) = fields( value )
+        if x == 0 :
+            mnenomic = ROTATES[ y ] + ' ' + REGISTERS[ z ]
+        else :
+            mnenomic = BIT_OPERATIONS[ x ] + ' {},'.format( y ) + REGISTERS[ z ]
+        table[ '{:02X}'.format( value ) ] = _entry( mnenomic, EXTENDED_SIZE )
+
+    return( table )
+
+def indexed_bit_table( prefix ) :
+    """The 'DD CB d xx' or 'FD CB d xx' table. Each op-code works on (IX+d)
+        like the '(HL)' form of its group. The undocumented forms that are
+        not '(HL)' also copy the result into a register, which is shown
+        after the memory operand, e.g. 'RLC (IX+05),B'.
+    """
+    memory = '(' + INDEX_REGISTERS[ prefix ] + '+' + BYTE + ')'
+    table = {}
+    for value in range( 256 ) :
+        ( x, y, z, p, q ) = fields( value )
+        if x == 0 :
+            mnenomic = ROTATES[ y ] + ' ' + memory
+        else :
+            mnenomic = BIT_OPERATIONS[ x ] + ' {},'.format( y ) + memory
+        if z != 6 and x != 1 :
+            mnenomic += ',' + REGISTERS[ z ]
+        table[ '{:02X}'.format( value ) ] = _entry( mnenomic, INDEXED_BIT_SIZE )
+
+    return( table )
+
+def ed_table() :
+    """The 'ED xx' table. Only x = 1 and the block operations in x = 2 are
+        defined; the rest act as a two byte NOP and are left out.
+    """
+    table = {}
+    for value in range( 256 ) :
+        ( x, y, z, p, q ) = fields( value )
+        if x == 1 :
+            if z == 0 :
+                mnenomic = 'IN ' + ( 'F' if y == 6 else REGISTERS[ y ] ) + ',(C)'
+            elif z == 1 :
+                mnenomic = 'OUT (C),' + ( '0' if y == 6 else REGISTERS[ y ] )
+            elif z == 2 :
+                mnenomic = ( 'SBC HL,', 'ADC HL,' )[ q ] + REGISTER_PAIRS[ p ]
+            elif z == 3 :
+                if q == 0 :
+                    mnenomic = 'LD (' + WORD + '),' + REGISTER_PAIRS[ p ]
+                else :
+                    mnenomic = 'LD ' + REGISTER_PAIRS[ p ] + ',(' + WORD + ')'
+            elif z == 4 :
+                mnenomic = 'NEG'
+            elif z == 5 :
+                mnenomic = 'RETI' if y == 1 else 'RETN'
+            elif z == 6 :
+                mnenomic = 'IM ' + INTERRUPT_MODES[ y ]
+            else :
+                mnenomic = ED_REGISTER_OPERATIONS[ y ]
+        elif x == 2 and z <= 3 and y >= 4 :
+            mnenomic = BLOCK_OPERATIONS[ y - 4 ][ z ]
+        else :
+            continue
+
+        table[ '{:02X}'.format( value ) ] = _entry( mnenomic, EXTENDED_SIZE )
+
+    return( table )
+
+def generate() :
+    """Build all of the tables, as a dictionary of table name -> table
+    """
+    return({
+        'opcode' : main_table(),
+        'cb_opcode' : cb_table(),
+        'dd_opcode' : index_table( PREFIX_DD ),
+        'ed_opcode' : ed_table(),
+        'fd_opcode' : index_table( PREFIX_FD ),
+        'ddcb_opcode' : indexed_bit_table( PREFIX_DD ),
+        'fdcb_opcode' : indexed_bit_table( PREFIX_FD ),
+    })
+
+def save( tables, path=TABLES_FILE ) :
+    with open( path, 'wb' ) as fh :
+        fh.write( marshal.dumps(( TABLES_VERSION, tables )))
+
+def load( path=TABLES_FILE ) :
+    """The tables saved in path, or built again if that file is missing or
+        from an older version
+    """
+    try :
+        with open( path, 'rb' ) as fh :
+            ( version, tables ) = marshal.loads( fh.read() )
+        if version == TABLES_VERSION :
+            return( tables )
+    except ( OSError, EOFError, ValueError, TypeError ) :
+        pass
+
+    return( generate() )
+
+def verify( tables ) :
+    """Check every encoding in the tables. Returns a list of problems (empty
+        if there are none):
+
+        - the length is the op-code bytes plus the operand bytes the
+          mnemonic has labels for, and only single byte operands are relative
+        - the mnemonic is made of known names and operands (this is what
+          catches a mangled or cut short entry)
+        - the 'FD' tables are the 'DD' tables with IY for IX
+        - encoding the op-code and decoding it with decoder.py gives back
+          the same entry, length and text
+    """
+    from decoder import decode, encode, opcode_entry
+    import decoder
+
+    names = { 'NOP', 'EX', 'DJNZ', 'JR', 'LD', 'ADD', 'ADC', 'SUB', 'SBC', 'AND',
+              'XOR', 'OR', 'CP', 'INC', 'DEC', 'HALT', 'RET', 'RETI', 'RETN', 'POP',
+              'PUSH', 'EXX', 'JP', 'CALL', 'RST', 'OUT', 'IN', 'DI', 'EI', 'NEG', 'IM',
+              'BIT', 'RES', 'SET', 'RRD', 'RLD' }
+    names.update( ROTATES, ACCUMULATOR_OPERATIONS, *BLOCK_OPERATIONS )
+    registers = set( REGISTERS ) | set( REGISTER_PAIRS ) | set( STACK_PAIRS ) | set( CONDITIONS )
+    registers.update(( 'AF’', '(SP)', '(C)', 'F', '0', 'I', 'R', '(BC)', '(DE)', '(' + WORD + ')',
+                       '(' + BYTE + ')', BYTE, WORD ))
+    registers.update( str( bit ) for bit in range( 8 ))
+    registers.update( '{:02X}'.format( value ) for value in range( 0, 0x40, 8 ))
+    for index in INDEX_REGISTERS.values() :
+        registers.update(( index, index + 'H', index + 'L', '(' + index + ')',
+                           '(' + index + '+' + BYTE + ')', '(' + index + '+' + LOW_BYTE + ')',
+                           HIGH_BYTE ))
+
+    problems = []
+    sizes = ( OPCODE_SIZE, EXTENDED_SIZE, EXTENDED_SIZE, EXTENDED_SIZE, EXTENDED_SIZE,
+              INDEXED_BIT_SIZE, INDEXED_BIT_SIZE )
+    count = 0
+    for ( name, opcode_size ) in zip( TABLE_NAMES, sizes ) :
+        for ( key, entry ) in sorted( tables[ name ].items() ) :
+            if entry is None :
+                continue
+
+            count += 1
+            ( mnenomic, length, symbols, relative ) = entry
+            where = '{} {}: {!r}'.format( name, key, mnenomic )
+            operands = operand_size( mnenomic )
+            if length != opcode_size + operands or symbols != ( operands > 0 ) or \
+               ( relative and operands != 1 ) :
+                problems.append( '{} has the wrong length or flags {}'.format( where, entry[ 1: ] ))
+
+            words = mnenomic.split( ' ', 1 )
+            if words[ 0 ] not in names or \
+               ( len( words ) > 1 and not all( operand in registers for operand in words[ 1 ].split( ',' ))) :
+                problems.append( '{} is not a valid mnemonic'.format( where ))
+
+    for ( dd_name, fd_name ) in (( 'dd_opcode', 'fd_opcode' ), ( 'ddcb_opcode', 'fdcb_opcode' )) :
+        mirrored = { key : ( entry[ 0 ].replace( 'IX', 'IY' ), ) + entry[ 1: ]
+                     for ( key, entry ) in tables[ dd_name ].items() }
+        if mirrored != tables[ fd_name ] :
+            problems.append( '{} is not {} with IY'.format( fd_name, dd_name ))
+
+    # The round trip through the compiled decode tables
+    table_bases = { 'opcode' : decoder.TABLE_BASE, 'cb_opcode' : decoder.TABLE_CB,
+                    'dd_opcode' : decoder.TABLE_DD, 'ed_opcode' : decoder.TABLE_ED,
+                    'fd_opcode' : decoder.TABLE_FD, 'ddcb_opcode' : decoder.TABLE_DDCB,
+                    'fdcb_opcode' : decoder.TABLE_FDCB }
+    for ( name, base ) in table_bases.items() :
+        for ( key, entry ) in tables[ name ].items() :
+            if entry is None :
+                continue
+
+            table_entry = base + int( key, 16 )
+            if decoder.MNEMONICS[ table_entry ] != entry[ 0 ] :
+                problems.append( '{} {}: decoder.py has {!r} (regenerate opcode.tables)'.format(
+                        name, key, decoder.MNEMONICS[ table_entry ] ))
+                continue
+
+            operand = 0x1234 if operand_size( entry[ 0 ] ) == 2 else 0x12
+            memory = encode( table_entry, operand )
+            instruction = decode( memory, 0 )
+            text = instruction.render()[ 2 ]
+            if opcode_entry( 0, memory ) != table_entry or len( memory ) != entry[ 1 ] or \
+               instruction.operand not in ( None, operand ) or '{' in text :
+                problems.append( '{} {}: does not decode back ({!r})'.format( name, key, text ))
+
+    return( problems, count )
+
+if __name__ == "__main__" :
+    from optparse import OptionParser
+
+    parser = OptionParser( usage='%prog [--check]' )
+    parser.add_option( '--check', dest='check', action='store_true', default=False)
+    (opt, args) = parser.parse_args()
+
+    tables = generate()
+    if not opt.check :
+        save( tables )
+        import decoder
+        decoder.save_snapshot()
+        print( 'wrote {} and {}'.format( TABLES_FILE, decoder.SNAPSHOT_FILE ))
+        sys.exit(0)
+
+    ( problems, count ) = verify( tables )
+    with open( TABLES_FILE, 'rb' ) as fh :
+        if marshal.loads( fh.read() ) != ( TABLES_VERSION, tables ) :
+            problems.append( '{} is out of date (run ./tablegen.py)'.format( os.path.basename( TABLES_FILE )))
+    import decoder
+    import snapshot
+    if snapshot.load( decoder.SNAPSHOT_FILE, snapshot.checksum( TABLES_FILE, decoder.SNAPSHOT_VERSION )) is None :
+        problems.append( '{} is out of date (run ./tablegen.py)'.format( os.path.basename( decoder.SNAPSHOT_FILE )))
+
+    for problem in problems :
+        print( problem )
+    print( '{} encodings checked, {} problems'.format( count, len( problems )))
+    sys.exit( 1 if problems else 0 )
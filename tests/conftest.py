@@ -0,0 +1,14 @@
+"""Test Set Up:
+
+    The modules are not a package, so the directory above this one is put on
+    the path. Run the tests with pytest from the top directory:
+
+        ~/Projects/Z80$ pytest tests
+
+    not 'python -m pytest', which would put opcode.py in front of the
+    standard library module of the same name before pytest has loaded it.
+"""
+import os
+import sys
+
+sys.path.insert( 0, os.path.dirname( os.path.dirname( os.path.abspath( __file__ ))))
@@ -0,0 +1,71 @@
+"""Tests for batch.py: finding the input files and the batch run
+"""
+import json
+import os
+import pytest
+from batch import find_files, run_batch, OUTPUT_EXTENSION, MANIFEST_NAME
+
+@pytest.fixture
+def roms( tmp_path ) :
+    """A directory of ROMs, one in a sub-directory and one with an undefined
+        op-code and a truncated last instruction
+    """
+    directory = tmp_path / 'roms'
+    ( directory / 'bank' ).mkdir( parents=True )
+    ( directory / 'a.bin' ).write_bytes( bytes.fromhex( '3E05C374E0' ))
+    ( directory / 'bank' / 'b.bin' ).write_bytes( bytes.fromhex( 'CD3412C9' ))
+    ( directory / 'c.bin' ).write_bytes( bytes.fromhex( '00ED00C3' ))
+    return( directory )
+
+def _inputs( summaries ) :
+    return( sorted( os.path.basename( summary[ 'file' ] ) for summary in summaries ))
+
+def test_find_files( roms, tmp_path ) :
+    other = tmp_path / 'other'
+    other.mkdir()
+    ( other / 'a.bin' ).write_bytes( b'\x00' )
+
+    files = find_files([ str( roms ), str( other / '*.bin' ), str( tmp_path / 'missing' )])
+    assert( [ output for ( filepath, output ) in files ] ==
+            [ 'a.bin.asm', 'c.bin.asm', os.path.join( 'bank', 'b.bin.asm' ), 'a.bin.1.asm' ] )
+
+def test_run_batch( roms, tmp_path ) :
+    outdir = tmp_path / 'listings'
+    summaries = run_batch([ str( roms )], str( outdir ), 1 )
+
+    assert( _inputs( summaries ) == [ 'a.bin', 'b.bin', 'c.bin' ] )
+    assert( ( outdir / 'a.bin.asm' ).read_text().splitlines() == [
+        '0000 3E 05        :           LD A,05',
+        '0002 C3 74 E0     :           JP E074  [SYM_E074]',
+        'SYM_E074 = E074' ])
+    assert( ( outdir / 'bank' / 'b.bin.asm' ).exists() )
+    with open( str( outdir / MANIFEST_NAME )) as fh :
+        manifest = json.load( fh )
+    assert( manifest == summaries )
+    bad = [ summary for summary in summaries if summary[ 'file' ].endswith( 'c.bin' )][ 0 ]
+    assert( bad[ 'anomalies' ] == { 'undefined' : 1, 'truncated' : 1 } and bad[ 'error' ] is None )
+
+@pytest.mark.parametrize( 'outdir', [ 'listings', '.' ] )
+def test_rerun_with_output_inside_input( roms, outdir ) :
+    # The second run must not pick up the listings or manifest of the first
+    outdir = str( roms / outdir )
+    first = run_batch([ str( roms )], outdir, 1 )
+    second = run_batch([ str( roms )], outdir, 1 )
+
+    assert( _inputs( first ) == [ 'a.bin', 'b.bin', 'c.bin' ] )
+    assert( _inputs( second ) == _inputs( first ))
+    assert( not [ summary for summary in second if summary[ 'file' ].endswith( OUTPUT_EXTENSION )] )
+
+def test_output_directory_not_walked( roms ) :
+    # A file in the output directory that is not a listing is not an input
+    # either, but if the output directory is the input directory only the
+    # listings are left out
+    listings = roms / 'listings'
+    listings.mkdir()
+    ( listings / 'notes.bin' ).write_bytes( b'\x00' )
+    assert( len( find_files([ str( roms )], str( listings ))) == 3 )
+    assert( len( find_files([ str( roms )], str( roms ))) == 4 )
+
+def test_unreadable_file( tmp_path ) :
+    summaries = run_batch([ str( tmp_path / 'missing.bin' ), str( tmp_path )], str( tmp_path / 'out' ), 1 )
+    assert( summaries == [] )
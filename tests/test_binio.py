@@ -0,0 +1,32 @@
+"""Tests for binio.py: the array bytes and the file writes
+"""
+import os
+from array import array
+import pytest
+from binio import to_bytes, from_bytes, atomic_write
+
+def test_round_trip() :
+    for ( typecode, values ) in (( 'B', [ 0, 255 ] ), ( 'H', [ 0x1234, 0xffff ] ), ( 'i', [ -1, 0x10070 ] ),
+                                 ( 'q', [ -2, 1 << 40 ] )) :
+        data = to_bytes( array( typecode, values ))
+        assert( data == b''.join( value.to_bytes( array( typecode ).itemsize, 'little', signed=value < 0 )
+                                  for value in values ))
+        assert( from_bytes( typecode, data ) == array( typecode, values ))
+
+def test_atomic_write( tmp_path ) :
+    path = str( tmp_path / 'file.bin' )
+    atomic_write( path, b'one' )
+    atomic_write( path, ( b'two', bytearray( b'-' ), memoryview( b'three' )))
+    with open( path, 'rb' ) as fh :
+        assert( fh.read() == b'two-three' )
+    assert( os.listdir( str( tmp_path )) == [ 'file.bin' ] )
+
+def test_atomic_write_error( tmp_path ) :
+    # The old file is kept and no temporary file is left behind
+    path = str( tmp_path / 'file.bin' )
+    atomic_write( path, b'old' )
+    with pytest.raises( TypeError ) :
+        atomic_write( path, ( b'new', 'not bytes' ))
+    with open( path, 'rb' ) as fh :
+        assert( fh.read() == b'old' )
+    assert( os.listdir( str( tmp_path )) == [ 'file.bin' ] )
@@ -0,0 +1,77 @@
+"""Tests for boundaries.py: the instruction start addresses
+"""
+import os
+import random
+import subprocess
+import sys
+import pytest
+import boundaries
+from boundaries import instruction_starts
+from decoder import decode, disassemble, LENGTHS
+from benchmark import make_image
+
+SOURCE_DIRECTORY = os.path.dirname( os.path.dirname( os.path.abspath( __file__ )))
+
+# Run the way dasm.py is run, with this directory first on the path and the
+# standard library opcode module not imported yet
+IMPORT_CHECK = '''
+import sys
+sys.path.insert( 0, {!r} )
+path = sys.path[:]
+import boundaries
+import opcode
+print( boundaries.numpy is not None, sys.path == path, hasattr( opcode, 'opmap' ))
+'''
+
+def test_import_numpy() :
+    # NumPy (if it is installed) is imported without changing the path, and
+    # the opcode module anything imports after it is the standard library's.
+    # Without NumPy nothing is imported at all.
+    result = subprocess.run(( sys.executable, '-c', IMPORT_CHECK.format( SOURCE_DIRECTORY )),
+                            stdout=subprocess.PIPE, universal_newlines=True, check=True )
+    ( has_numpy, same_path, standard_opcode ) = result.stdout.split()
+    assert( same_path == 'True' )
+    assert( standard_opcode == has_numpy )
+
+@pytest.fixture( params=[ False, True ], ids=[ 'python', 'numpy' ] )
+def use_numpy( request ) :
+    if request.param and boundaries.numpy is None :
+        pytest.skip( 'NumPy is not installed' )
+    return( request.param )
+
+def _addresses( memory, start=0, end=None ) :
+    return( [ instruction.address for instruction in disassemble( memory, start, end )] )
+
+@pytest.mark.parametrize( 'size', [ None, 1, 5000, 70000 ] )
+def test_instruction_starts( use_numpy, size ) :
+    memory = b'' if size is None else make_image( size )
+    assert( list( instruction_starts( memory, use_numpy=use_numpy )) == _addresses( memory ))
+
+def test_start_and_end( use_numpy ) :
+    memory = make_image( 1 )
+    for ( start, end ) in (( 3, None ), ( 0, 1000 ), ( 1234, 2345 )) :
+        # The instruction at start may be a real one or not, either way the
+        # chain from it must be the same as disassemble() from there
+        try :
+            expected = _addresses( memory, start, end )
+        except ( KeyError, IndexError ) :
+            continue
+        assert( list( instruction_starts( memory, start, end, use_numpy )) == expected )
+
+def test_errors( use_numpy ) :
+    with pytest.raises( KeyError ) :
+        instruction_starts( bytes.fromhex( '00' * 300 + 'ED00' + '00' * 300 ), use_numpy=use_numpy )
+    with pytest.raises( IndexError ) :
+        instruction_starts( bytes.fromhex( '00' * 300 + 'C3' ), use_numpy=use_numpy )
+
+def test_instruction_lengths() :
+    if boundaries.numpy is None :
+        pytest.skip( 'NumPy is not installed' )
+    memory = random.Random( 1 ).randbytes( 2000 )
+    lengths = boundaries.instruction_lengths( memory, 100, 1900 )
+    for pc in range( 100, 1900 ) :
+        try :
+            expected = LENGTHS[ decode( memory, pc ).entry ]
+        except KeyError :
+            expected = 0
+        assert( lengths[ pc - 100 ] == expected )
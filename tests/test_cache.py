@@ -0,0 +1,111 @@
+"""Tests for cache.py: the decode cache files and the size limit
+"""
+import os
+import cache
+from decoder import disassemble, add_symbol
+from cache import cached_decode, load, save, instructions, CACHE_EXTENSION
+from benchmark import make_image
+
+def _records( records ) :
+    return( [( record.address, record.entry, record.operand ) for record in records ] )
+
+def _expected( memory, names=None ) :
+    symbol_table = {}
+    records = []
+    for instruction in disassemble( memory ) :
+        records.append( instruction )
+        add_symbol( instruction, symbol_table, names )
+    return( _records( records ), symbol_table )
+
+def _cache_files( cache_dir ) :
+    return( sorted( name for name in os.listdir( str( cache_dir )) if name.endswith( CACHE_EXTENSION )))
+
+def _cache_bytes( cache_dir ) :
+    return( sum( os.path.getsize( os.path.join( str( cache_dir ), name )) for name in _cache_files( cache_dir )))
+
+def test_cached_decode( tmp_path ) :
+    memory = make_image( 1 )
+    names = { 0x0101 : 'START' }
+    ( expected, expected_symbols ) = _expected( memory, names )
+
+    for run in ( 'miss', 'hit' ) :
+        ( records, symbol_table ) = cached_decode( memory, str( tmp_path ), names=names )
+        assert( _records( records ) == expected )
+        assert( list( symbol_table.items() ) == list( expected_symbols.items() ))
+    assert( len( _cache_files( tmp_path )) == 1 )
+
+def test_entry_size( tmp_path ) :
+    # The instructions take no more room than the image itself
+    memory = make_image( 64 * 1024 )
+    cached_decode( memory, str( tmp_path ))
+    ( name, ) = _cache_files( tmp_path )
+    entry = load( str( tmp_path / name ))
+
+    assert( len( entry.opcodes ) + len( entry.byte_operands ) + 2 * len( entry.word_operands ) <= len( memory ))
+    # The references take 8 bytes each and the checkpoints 16 bytes per block
+    assert( os.path.getsize( str( tmp_path / name )) == entry.size() <=
+            len( memory ) + 4 * len( entry.symbols ) + 8 * len( entry.reference_targets ) +
+            16 * (( len( memory ) + cache.CHECKPOINT_SIZE - 1 ) // cache.CHECKPOINT_SIZE ) + cache.HEADER.size )
+    assert( entry.instruction_count == len( _expected( memory )[ 0 ] ))
+
+def test_round_trip( tmp_path ) :
+    memory = bytes.fromhex( '00' 'CB07' 'DD2134 12' 'DDCB05 06' 'FDCBFE 1E' 'ED4B 0080' '1805' '3E7F' )
+    ( expected, expected_symbols ) = _expected( memory )
+    path = str( tmp_path / ( 'test' + CACHE_EXTENSION ))
+    cached_decode( memory, str( tmp_path ))
+    ( name, ) = _cache_files( tmp_path )
+
+    entry = load( str( tmp_path / name ))
+    assert( entry.opcodes == bytes.fromhex( '00' 'CB07' 'DD21' 'DDCB06' 'FDCB1E' 'ED4B' '18' '3E' ))
+    assert( list( entry.byte_operands ) == [ 0x05, 0xfe, 0x05, 0x7f ] )
+    assert( list( entry.word_operands ) == [ 0x1234, 0x8000 ] )
+    assert( _records( instructions( entry.opcodes, entry.byte_operands, entry.word_operands )) == expected )
+    # LD IX,1234 at 0003, LD BC,(8000) at 000F and JR 001A at 0013
+    assert( list( entry.symbols ) == [ 0x1234, 0x8000, 0x1a ] )
+    assert(( list( entry.reference_targets ), list( entry.reference_addresses )) ==
+           ([ 0x1a, 0x1234, 0x8000 ], [ 0x13, 0x03, 0x0f ] ))
+    assert( list( entry.checkpoints ) == [ 0, 0, 0, 0 ] )
+
+    save( path, entry )
+    loaded = load( path )
+    for name in cache.Entry.__slots__ :
+        assert( getattr( loaded, name ) == getattr( entry, name ))
+
+def test_bad_file( tmp_path ) :
+    memory = make_image( 1 )
+    cached_decode( memory, str( tmp_path ))
+    ( name, ) = _cache_files( tmp_path )
+    path = tmp_path / name
+    data = path.read_bytes()
+
+    for bad in ( b'', data[ :10 ], data[ :-1 ], b'Z80X' + data[ 4: ] ) :
+        path.write_bytes( bad )
+        assert( load( str( path )) is None )
+        # A bad file is decoded again and replaced
+        ( records, symbol_table ) = cached_decode( memory, str( tmp_path ))
+        assert( _records( records ) == _expected( memory )[ 0 ] )
+        assert( path.read_bytes() == data )
+
+def test_size_limit( tmp_path ) :
+    images = [ make_image( 1 )[ :3000 + size ] for size in range( 0, 400, 100 ) ]
+    cached_decode( images[ 0 ], str( tmp_path ))
+    limit = 2 * _cache_bytes( tmp_path ) + 1000
+
+    for ( count, memory ) in enumerate( images ) :
+        # Make the modified times distinct and in the order the images were
+        # added
+        for ( age, name ) in enumerate( sorted( _cache_files( tmp_path ),
+                                                key=lambda name : os.path.getmtime( str( tmp_path / name )))) :
+            os.utime( str( tmp_path / name ), ( 1000 + age, 1000 + age ))
+        cached_decode( memory, str( tmp_path ), limit )
+        assert( _cache_bytes( tmp_path ) <= limit )
+
+    # Only the two most recently used images are left
+    assert( _cache_files( tmp_path ) == sorted( cache.cache_key( memory ) + CACHE_EXTENSION
+                                                for memory in images[ -2: ] ))
+
+def test_entry_bigger_than_limit( tmp_path ) :
+    memory = make_image( 1 )
+    ( records, symbol_table ) = cached_decode( memory, str( tmp_path ), 1000 )
+    assert( _records( records ) == _expected( memory )[ 0 ] )
+    assert( _cache_files( tmp_path ) == [] )
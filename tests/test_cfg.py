@@ -0,0 +1,84 @@
+"""Tests for cfg.py: the basic blocks and edges of the control flow graph
+"""
+import io
+import pytest
+from cfg import build_cfg, image_cfg, save_cfg, load_cfg, write_dot, MAGIC, EDGE_NEXT, EDGE_JUMP, EDGE_CALL
+from compare import Blocks
+from decoder import disassemble_lenient
+from benchmark import make_image
+
+# 0000 LD A,05  0002 CALL 000A  0005 JR Z,0002  0007 JP 000B  000A RET
+# 000B NOP  000C RET
+CODE = bytes.fromhex( '3E05' 'CD0A00' '28FB' 'C30B00' 'C9' '00' 'C9' )
+
+def _blocks( cfg ) :
+    return( list( zip( cfg.starts, cfg.ends )))
+
+def test_blocks() :
+    cfg = image_cfg( CODE )
+    assert( _blocks( cfg ) == [( 0x00, 0x02 ), ( 0x02, 0x07 ), ( 0x07, 0x0a ), ( 0x0a, 0x0b ), ( 0x0b, 0x0d )] )
+    assert( cfg.block( 0x04 ) == 1 and cfg.block( 0x0c ) == 4 and cfg.block( 0x0d ) is None )
+
+def test_edges() :
+    cfg = image_cfg( CODE )
+    assert( [ cfg.edges( index ) for index in range( len( cfg ))] == [
+        [( 1, EDGE_NEXT )],
+        [( 3, EDGE_CALL ), ( 1, EDGE_JUMP ), ( 2, EDGE_NEXT )],
+        [( 4, EDGE_JUMP )],
+        [],
+        [] ])
+    assert( cfg.edge_count() == 5 )
+
+def test_gaps_and_targets() :
+    # Bytes that were not decoded split a block, and a target outside the
+    # image or part way into an instruction has no edge
+    cfg = image_cfg( bytes.fromhex( 'C30100' '3E05' 'ED00' 'CD0080' '00' ))
+    assert( _blocks( cfg ) == [( 0x00, 0x03 ), ( 0x03, 0x05 ), ( 0x07, 0x0b )] )
+    assert( [ cfg.edges( index ) for index in range( len( cfg ))] == [[], [], []] )
+
+def test_follow() :
+    # Only the code reached from the entry point is in the graph
+    memory = bytes.fromhex( 'C30500' 'FFFF' '3E05' 'C9' )
+    cfg = image_cfg( memory, follow=True, entry_points=( 0, ))
+    assert( _blocks( cfg ) == [( 0x00, 0x03 ), ( 0x05, 0x08 )] )
+    assert( cfg.edges( 0 ) == [( 1, EDGE_JUMP )] )
+
+def test_compare_blocks() :
+    # The blocks are the ones compare.py finds, less the undecoded bytes
+    memory = make_image( 2 ) + bytes.fromhex( 'ED00' ) + CODE
+    records = list( disassemble_lenient( memory ))
+    data = { record.address for record in records if record.entry is None }
+    blocks = Blocks( records )
+    assert( _blocks( build_cfg( records )) ==
+            [( start, end ) for ( start, end ) in zip( blocks.starts, blocks.ends ) if start not in data ] )
+
+def test_save_load( tmp_path ) :
+    cfg = image_cfg( make_image( 2 ) + CODE )
+    path = str( tmp_path / 'image.cfg' )
+    save_cfg( cfg, path )
+    with open( path, 'rb' ) as fh :
+        assert( fh.read( len( MAGIC )) == MAGIC )
+
+    loaded = load_cfg( path )
+    for name in ( 'starts', 'ends', 'offsets', 'successors', 'kinds' ) :
+        assert( getattr( loaded, name ) == getattr( cfg, name ))
+
+    save_cfg( image_cfg( b'' ), path )
+    assert( len( load_cfg( path )) == 0 and load_cfg( path ).edge_count() == 0 )
+
+def test_bad_file( tmp_path ) :
+    path = tmp_path / 'bad.cfg'
+    for data in ( b'', MAGIC + bytes( 40 )) :
+        path.write_bytes( data )
+        with pytest.raises( ValueError ) :
+            load_cfg( str( path ))
+
+def test_write_dot() :
+    out = io.StringIO()
+    write_dot( image_cfg( CODE ), out, { 0x0a : 'DELAY' }, flush_lines=1 )
+    lines = out.getvalue().splitlines()
+    assert( lines[ 0 ] == 'digraph cfg {' and lines[ -1 ] == '}' )
+    assert( '    b1 [label="0002-0006"];' in lines )
+    assert( '    b3 [label="DELAY\\n000A-000A"];' in lines )
+    assert( [ line for line in lines if line.startswith( '    b1 ->' )] ==
+            [ '    b1 -> b3 [style=dashed];', '    b1 -> b1 [style=bold];', '    b1 -> b2;' ] )
@@ -0,0 +1,80 @@
+"""Tests for compare.py: basic blocks, their alignment and the changes
+"""
+import io
+import itertools
+import random
+from compare import Blocks, align, compare, write_changes, image_blocks, _longest_increasing, \
+                    CHANGE_DELETED, CHANGE_INSERTED, CHANGE_CHANGED
+from decoder import disassemble_lenient
+
+# Routines that end with a return, each a different shape
+ROUTINES = [ bytes.fromhex( code ) for code in (
+    '3E05' 'D301' 'C9',
+    '210040' '7E' '23' 'B7' '20FA' 'C9',
+    '0610' 'AF' '10FD' 'C9',
+    '3A0080' 'FE0D' 'C8' '3C' '320080' 'C9',
+    'DD210000' 'DD7E05' 'C9',
+    'ED4B0080' '0B' '78' 'B1' 'C0' 'C9',
+)]
+
+def _image( routines ) :
+    return( b''.join( routines ))
+
+def test_blocks() :
+    # 0000 JP 0006  0003 DB ED,00  0005 NOP  0006 LD A,05  0008 JR Z,0006  000A RET
+    blocks = Blocks( disassemble_lenient( bytes.fromhex( 'C30600' 'ED00' '00' '3E05' '28FC' 'C9' )))
+    assert( blocks.starts == [ 0x00, 0x03, 0x05, 0x06, 0x0a ] )
+    assert( blocks.ends == [ 0x03, 0x05, 0x06, 0x0a, 0x0b ] )
+    assert( blocks.keys[ 1 ] == ( bytes.fromhex( 'ED00' ), ))
+    assert( blocks.keys[ 3 ] == ( 0x3e, 0x28 ) and blocks.values[ 3 ] == ( 0x05, ))
+    assert( blocks.routines == [ 0 ] and blocks.routine( 0x0a ) == 0 )
+
+def test_longest_increasing() :
+    generator = random.Random( 20 )
+    for trial in range( 50 ) :
+        pairs = sorted( zip( generator.sample( range( 20 ), 8 ), generator.sample( range( 20 ), 8 )))
+        run = _longest_increasing( pairs )
+        assert( all( a[ 1 ] < b[ 1 ] for ( a, b ) in zip( run, run[ 1: ] )))
+        longest = max( size for size in range( len( pairs ) + 1 )
+                       for subset in itertools.combinations( pairs, size )
+                       if all( a[ 1 ] < b[ 1 ] for ( a, b ) in zip( subset, subset[ 1: ] )))
+        assert( len( run ) == longest )
+
+def test_align() :
+    old = list( 'abcdefgh' )
+    new = list( 'xabdefyh' )
+    matched = align( old, new )
+    assert( all( old[ i ] == new[ j ] for ( i, j ) in matched ))
+    assert( matched == sorted( matched ) and [ j for ( i, j ) in matched ] == sorted( j for ( i, j ) in matched ))
+    assert( matched == [( 0, 1 ), ( 1, 2 ), ( 3, 3 ), ( 4, 4 ), ( 5, 5 ), ( 7, 7 )] )
+    assert( align( old, old ) == [( i, i ) for i in range( len( old ))] )
+
+def test_same_image() :
+    blocks = image_blocks( _image( ROUTINES ))
+    assert( compare( blocks, blocks ) == [] )
+
+def test_moved_code() :
+    # Inserting a routine moves everything after it, which only shows up as
+    # the one insertion
+    old = image_blocks( _image( ROUTINES ))
+    new = image_blocks( _image( ROUTINES[ :2 ] + [ bytes.fromhex( '00' '00' 'C9' )] + ROUTINES[ 2: ] ))
+    changes = compare( old, new )
+    assert( len( changes ) == 1 and changes[ 0 ][ 0 ] == CHANGE_INSERTED )
+    ( first, end ) = changes[ 0 ][ 2 ]
+    assert(( new.starts[ first ], new.ends[ end - 1 ] ) == ( len( _image( ROUTINES[ :2 ] )), len( _image( ROUTINES[ :2 ] )) + 3 ))
+
+def test_changes() :
+    routines = list( ROUTINES )
+    old = image_blocks( _image( routines ))
+    routines[ 0 ] = bytes.fromhex( '3E06' 'D301' 'C9' )
+    del routines[ 3 ]
+    new = image_blocks( _image( routines ))
+    changes = compare( old, new )
+    assert( [ kind for ( kind, old_range, new_range ) in changes ] == [ CHANGE_CHANGED, CHANGE_DELETED ] )
+
+    out = io.StringIO()
+    write_changes( old, new, changes, out )
+    lines = out.getvalue().splitlines()
+    assert( lines[ 0 ].startswith( '; ' ) and lines[ 0 ].endswith( ' 2 changes' ))
+    assert( lines[ 1 ].split()[ :3 ] == [ CHANGE_CHANGED, '0000-0004', '0000-0004' ] )
+    assert( lines[ 2 ].split()[ 0 ] == CHANGE_DELETED and lines[ 2 ].split()[ 2 ] == '---------' )
@@ -0,0 +1,150 @@
+"""Tests for decoder.py: the compiled decode tables and the linear sweep
+"""
+import io
+import pytest
+import decoder
+from decoder import opcode_entry, PREFIXES, MNEMONICS, LENGTHS, TABLE_CB, TABLE_DD, TABLE_ED, \
+                    TABLE_FD, TABLE_DDCB, TABLE_FDCB
+from dasm import get_opcode
+from benchmark import make_image
+
+def test_prefixes() :
+    assert( PREFIXES[ 0xcb ] == TABLE_CB )
+    assert( PREFIXES[ 0xdd ] == TABLE_DD )
+    assert( PREFIXES[ 0xed ] == TABLE_ED )
+    assert( PREFIXES[ 0xfd ] == TABLE_FD )
+    assert( [ value for value in range( 256 ) if PREFIXES[ value ]] == [ 0xcb, 0xdd, 0xed, 0xfd ] )
+
+def test_table_entries() :
+    assert(( MNEMONICS[ 0x00 ], LENGTHS[ 0x00 ] ) == ( 'NOP', 1 ))
+    assert( LENGTHS[ 0xc3 ] == 3 )
+    assert(( MNEMONICS[ TABLE_ED + 0xb0 ], LENGTHS[ TABLE_ED + 0xb0 ] ) == ( 'LDIR', 2 ))
+    assert( LENGTHS[ TABLE_DD + 0x21 ] == 4 )
+    assert( MNEMONICS[ TABLE_ED + 0x00 ] is None and LENGTHS[ TABLE_ED + 0x00 ] == 0 )
+
+def test_opcode_entry() :
+    assert( opcode_entry( 0, b'\x3e\x05' ) == 0x3e )
+    assert( opcode_entry( 1, b'\x00\xcb\x07' ) == TABLE_CB + 0x07 )
+    assert( opcode_entry( 0, b'\xdd\xcb\x05\x06' ) == TABLE_DDCB + 0x06 )
+    assert( opcode_entry( 0, b'\xfd\xcb\xfe\xc6' ) == TABLE_FDCB + 0xc6 )
+
+def test_opcode_entry_undefined() :
+    with pytest.raises( KeyError ) :
+        opcode_entry( 0, b'\xed\x00' )
+
+@pytest.mark.parametrize( 'code, expected', [
+    ( 'C374E0', ( 3, '0000', 'C3 74 E0    ', 'JP E074  [SYM_E074]' )),
+    ( '3E05', ( 2, '0000', '3E 05       ', 'LD A,05' )),
+    ( '18FE', ( 2, '0000', '18 FE       ', 'JR FE  [SYM_0000]' )),
+    ( 'DD360580', ( 4, '0000', 'DD 36 05 80 ', 'LD (IX+05),80' )),
+    ( 'ED4B3412', ( 4, '0000', 'ED 4B 34 12 ', 'LD BC,(1234)  [SYM_1234]' )),
+])
+def test_get_opcode( code, expected ) :
+    symbol_table = {}
+    assert( get_opcode( 0, bytes.fromhex( code ), symbol_table )[ :4 ] == expected )
+
+def test_get_opcode_symbol_table() :
+    symbol_table = {}
+    memory = bytes.fromhex( 'C374E0' 'CD0010' '3E05' )
+    pc = 0
+    while pc < len( memory ) :
+        pc = get_opcode( pc, memory, symbol_table )[ 0 ]
+
+    assert( symbol_table == { 'SYM_E074' : 'E074', 'SYM_1000' : '1000' } )
+
+def test_get_opcode_undefined() :
+    with pytest.raises( KeyError ) :
+        get_opcode( 0, b'\xed\x00', {} )
+
+def test_decode_record() :
+    instruction = decoder.decode( bytes.fromhex( '00DD7E05' ), 1 )
+    assert(( instruction.address, instruction.entry, instruction.operand ) == ( 1, TABLE_DD + 0x7e, 0x05 ))
+    assert(( instruction.prefix, instruction.opcode, instruction.length ) == ( 0xdd, 0x7e, 3 ))
+    assert( instruction.next_address == 4 )
+    assert( instruction.target is None )
+
+def test_targets() :
+    assert( decoder.decode( bytes.fromhex( 'CD3412' ), 0 ).target == 0x1234 )
+    # Relative to the next instruction, and forwards and backwards
+    assert( decoder.decode( bytes.fromhex( '00001805' ), 2 ).target == 0x0009 )
+    assert( decoder.decode( bytes.fromhex( '000010FC' ), 2 ).target == 0x0000 )
+    assert( decoder.decode( bytes.fromhex( '3E05' ), 0 ).target is None )
+
+def test_render() :
+    instruction = decoder.decode( bytes.fromhex( 'C374E0' ), 0 )
+    assert( instruction.render() == ( '0000', 'C3 74 E0    ', 'JP E074  [SYM_E074]' ))
+    assert( instruction.render({ 0xe074 : 'START' }) == ( '0000', 'C3 74 E0    ', 'JP E074  [START]' ))
+    assert( instruction.listing() == '0000 C3 74 E0     :           JP E074  [SYM_E074]' )
+
+def test_disassemble() :
+    memory = bytes.fromhex( '3E05' 'C374E0' 'ED4B3412' 'DDCB0506' )
+    records = list( decoder.disassemble( memory ))
+    assert( [ record.address for record in records ] == [ 0, 2, 5, 9 ] )
+    assert( records[ 3 ].render()[ 1: ] == ( 'DD CB 05 06 ', 'RLC (IX+05)' ))
+    assert( [ record.address for record in decoder.disassemble( memory, 2, 9 )] == [ 2, 5 ] )
+
+def test_disassemble_errors() :
+    with pytest.raises( IndexError ) :
+        list( decoder.disassemble( bytes.fromhex( '00C374' )))
+    with pytest.raises( KeyError ) :
+        list( decoder.disassemble( bytes.fromhex( '00ED00' )))
+
+def test_encode() :
+    for code in ( '3E05', 'C374E0', 'ED4B3412', 'DDCB0506', 'DD360580', '18FE' ) :
+        memory = bytes.fromhex( code )
+        instruction = decoder.decode( memory, 0 )
+        assert( decoder.encode( instruction.entry, instruction.operand or 0 ) == memory )
+
+def _sweep( records ) :
+    return( [ ( record.address, record.entry, getattr( record, 'operand', None )) for record in records ] )
+
+@pytest.mark.parametrize( 'chunk_size', [ 1, 3, 4, 5, 64, 4096 ] )
+def test_disassemble_stream( chunk_size ) :
+    # Every defined op-code, so every length of instruction crosses a chunk
+    memory = make_image( 1 )
+    expected = _sweep( decoder.disassemble( memory ))
+    assert( _sweep( decoder.disassemble_stream( io.BytesIO( memory ), chunk_size=chunk_size )) == expected )
+
+    moved = [( address + 0x8000, entry, operand ) for ( address, entry, operand ) in expected ]
+    assert( _sweep( decoder.disassemble_stream( io.BytesIO( memory ), 0x8000, chunk_size )) == moved )
+
+def test_disassemble_stream_lenient() :
+    memory = bytes.fromhex( '3E05' 'ED00' '00' 'C374' )
+    anomalies = decoder.new_anomalies()
+    records = list( decoder.disassemble_stream( io.BytesIO( memory ), chunk_size=2, anomalies=anomalies ))
+    assert( [ record.listing() for record in records ] == [
+        '0000 3E 05        :           LD A,05',
+        '0002 ED 00        :           DB ED,00',
+        '0004 00           :           NOP',
+        '0005 C3 74        :           DB C3,74' ])
+    assert( anomalies == { decoder.ANOMALY_UNDEFINED : 1, decoder.ANOMALY_TRUNCATED : 1 } )
+
+def test_disassemble_stream_truncated() :
+    with pytest.raises( IndexError ) :
+        list( decoder.disassemble_stream( io.BytesIO( bytes.fromhex( '00C374' )), chunk_size=2 ))
+
+def test_disassemble_lenient() :
+    # An undefined DD/FD prefix is one byte of data, an undefined ED pair two
+    # and the truncated instruction at the end the rest of the bytes
+    memory = bytes.fromhex( 'DD00' 'ED00' '3E05' 'FDFD21' 'C3' )
+    anomalies = decoder.new_anomalies()
+    records = list( decoder.disassemble_lenient( memory, anomalies=anomalies ))
+    assert( [ record.listing() for record in records ] == [
+        '0000 DD           :           DB DD',
+        '0001 00           :           NOP',
+        '0002 ED 00        :           DB ED,00',
+        '0004 3E 05        :           LD A,05',
+        '0006 FD           :           DB FD',
+        '0007 FD 21 C3     :           DB FD,21,C3' ])
+    assert( anomalies == { decoder.ANOMALY_UNDEFINED : 3, decoder.ANOMALY_TRUNCATED : 1 } )
+    assert( sum( record.length for record in records ) == len( memory ))
+
+def test_disassemble_lenient_range() :
+    memory = make_image( 1 )
+    anomalies = decoder.new_anomalies()
+    assert( _sweep( decoder.disassemble_lenient( memory, anomalies=anomalies )) ==
+            _sweep( decoder.disassemble( memory )))
+    assert( not any( anomalies.values() ))
+    # From a start address, without an anomalies dictionary
+    records = list( decoder.disassemble_lenient( bytes.fromhex( '00ED00C3' ), 1 ))
+    assert( [( record.address, record.entry ) for record in records ] == [( 1, None ), ( 3, None )] )
@@ -0,0 +1,68 @@
+"""Tests for fill.py: collapsing runs of FF / 00 padding
+"""
+import random
+from decoder import disassemble, new_anomalies, Fill
+from fill import fill_runs, disassemble_fill
+from benchmark import make_image
+
+def _runs( memory, min_length ) :
+    runs = []
+    start = 0
+    while start < len( memory ) :
+        end = start
+        while end < len( memory ) and memory[ end ] == memory[ start ] :
+            end += 1
+        if memory[ start ] in ( 0x00, 0xff ) and end - start >= min_length :
+            runs.append(( start, end ))
+        start = end
+    return( runs )
+
+def test_fill_runs() :
+    generator = random.Random( 21 )
+    memory = bytes( generator.choice(( 0x00, 0xff, 0x3e )) for count in range( 5000 ))
+    for min_length in ( 1, 2, 5, 16 ) :
+        assert( list( fill_runs( memory, min_length )) == _runs( memory, min_length ))
+
+def test_same_addresses() :
+    # Every line outside the fill runs is at the same address as without
+    # collapsing them
+    memory = make_image( 1 ) + b'\xff' * 100 + b'\x3e' + b'\xff' * 40 + make_image( 1 ) + bytes( 17 )
+    records = list( disassemble_fill( memory, 16 ))
+    plain = { record.address : record.entry for record in disassemble( memory )}
+    covered = set()
+    for record in records :
+        covered.update( range( record.address, record.next_address ))
+        if not isinstance( record, Fill ) :
+            assert( plain[ record.address ] == record.entry )
+    assert( covered == set( range( len( memory ))))
+    fills = [ record.listing() for record in records if isinstance( record, Fill )]
+    assert( fills == [ '{:04X} FF FF FF FF  :           DEFS 0064,FF'.format( 3472 ),
+                       # LD A,FF takes the first byte of the second run
+                       '{:04X} FF FF FF FF  :           DEFS 0027,FF'.format( 3472 + 102 ),
+                       '{:04X} 00 00 00 00  :           DEFS 0011,00'.format( 2 * 3472 + 141 )] )
+
+def test_fill_record() :
+    # A fill keeps the byte and the count, not the run
+    memory = bytes.fromhex( '3E05' ) + b'\xff' * 60000 + bytes.fromhex( 'C9' )
+    fill = list( disassemble_fill( memory, 16 ))[ 1 ]
+    assert(( fill.address, fill.value, fill.count ) == ( 2, 0xff, 60000 ))
+    assert( fill.length == 60000 and fill.next_address == 60002 and fill.values == memory[ 2:60002 ] )
+    assert( not hasattr( fill, '__dict__' ))
+
+def test_short_runs() :
+    memory = bytes.fromhex( '3E05' ) + b'\xff' * 15 + bytes.fromhex( 'C9' )
+    assert( [ record.entry for record in disassemble_fill( memory, 16 )] ==
+            [ record.entry for record in disassemble( memory )] )
+
+def test_range_and_lenient() :
+    memory = bytes.fromhex( 'ED00' ) + b'\xff' * 32 + bytes.fromhex( '3E05' ) + bytes( 20 ) + bytes.fromhex( 'C3' )
+    anomalies = new_anomalies()
+    records = list( disassemble_fill( memory, 16, anomalies=anomalies ))
+    assert( [( record.address, type( record ).__name__ ) for record in records ] ==
+            [( 0, 'Data' ), ( 2, 'Fill' ), ( 34, 'Instruction' ), ( 36, 'Fill' ), ( 56, 'Data' )] )
+    assert( anomalies == { 'undefined' : 1, 'truncated' : 1 } )
+
+    # Only what is left of a run inside the range counts
+    records = list( disassemble_fill( memory, 16, 10, 40, new_anomalies() ))
+    assert( [( record.address, record.next_address ) for record in records ] ==
+            [( 10, 34 ), ( 34, 36 ), ( 36, 37 ), ( 37, 38 ), ( 38, 39 ), ( 39, 40 )] )
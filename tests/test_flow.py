@@ -0,0 +1,62 @@
+"""Tests for flow.py: following the code from the entry points
+"""
+import pytest
+from decoder import decode, MNEMONICS
+from flow import trace, disassemble_flow, branch_target, FLOWS, FLOW_NEXT, FLOW_JUMP, \
+                 FLOW_BRANCH, FLOW_STOP, MARK_NONE, MARK_START, MARK_BODY
+
+# 0000  JP 0008             0010  LD A,01
+# 0003  (five bytes of data) 0012  JP (HL)
+# 0008  CALL 0010           0013  (two bytes of data)
+# 000B  JR Z,000F
+# 000D  JR 000D
+# 000F  RET
+PROGRAM = bytes.fromhex( 'C30800' '0102030405' 'CD1000' '2802' '18FE' 'C9' '3E01' 'E9' 'FFFF' )
+
+def _layout( records ) :
+    return( [( record.address, record.entry is not None ) for record in records ] )
+
+@pytest.mark.parametrize( 'code, flow', [
+    ( '00', FLOW_NEXT ), ( 'C30000', FLOW_JUMP ), ( '1800', FLOW_JUMP ), ( 'CA0000', FLOW_BRANCH ),
+    ( '2000', FLOW_BRANCH ), ( '1000', FLOW_BRANCH ), ( 'CD0000', FLOW_BRANCH ), ( 'FF', FLOW_BRANCH ),
+    ( 'C8', FLOW_BRANCH ), ( 'C9', FLOW_STOP ), ( 'ED4D', FLOW_STOP ), ( 'E9', FLOW_STOP ),
+    ( 'DDE9', FLOW_STOP ),
+])
+def test_flows( code, flow ) :
+    assert( FLOWS[ decode( bytes.fromhex( code ), 0 ).entry ] == flow )
+
+def test_branch_target() :
+    assert( branch_target( decode( bytes.fromhex( 'C33412' ), 0 )) == 0x1234 )
+    assert( branch_target( decode( bytes.fromhex( 'EF' ), 0 )) == 0x28 )
+    assert( branch_target( decode( bytes.fromhex( '2100E0' ), 0 )) is None )
+    assert( branch_target( decode( bytes.fromhex( 'E9' ), 0 )) is None )
+
+def test_trace() :
+    ( instructions, marks ) = trace( PROGRAM, ( 0, ))
+    assert( sorted( instructions ) == [ 0x00, 0x08, 0x0b, 0x0d, 0x0f, 0x10, 0x12 ] )
+    assert( marks[ 0:3 ] == bytes(( MARK_START, MARK_BODY, MARK_BODY )))
+    assert( marks[ 3:8 ] == bytes( 5 ) and marks[ 0x13: ] == bytes(( MARK_NONE, MARK_NONE )))
+
+def test_disassemble_flow() :
+    records = list( disassemble_flow( PROGRAM, ( 0, )))
+    assert( _layout( records ) == [( 0x00, True ), ( 0x03, False ), ( 0x07, False ), ( 0x08, True ),
+                                   ( 0x0b, True ), ( 0x0d, True ), ( 0x0f, True ), ( 0x10, True ),
+                                   ( 0x12, True ), ( 0x13, False )] )
+    assert( records[ 1 ].listing() == '0003 01 02 03 04  :           DB 01,02,03,04' )
+
+def test_disassemble_flow_ranges() :
+    records = list( disassemble_flow( PROGRAM, ( 0, ), [( 0x08, 0x0d ), ( 0x12, 0x15 )] ))
+    assert( _layout( records ) == [( 0x08, True ), ( 0x0b, True ), ( 0x12, True ), ( 0x13, False )] )
+
+def test_bad_paths() :
+    # Entry points outside memory, an undefined op-code, an instruction off
+    # the end of memory and one that would overlap code already found all
+    # stop the path without an error
+    memory = bytes.fromhex( 'ED00' '00' 'C3' )
+    ( instructions, marks ) = trace( memory, ( -1, 0, 2, 100 ))
+    assert( sorted( instructions ) == [ 2 ] )
+
+    ( instructions, marks ) = trace( bytes.fromhex( '010000' ), ( 0, 1 ))
+    assert( sorted( instructions ) == [ 0 ] )
+    ( instructions, marks ) = trace( bytes.fromhex( '00C30000' ), ( 2, 1 ))
+    assert( sorted( instructions ) == [ 2, 3 ] and MNEMONICS[ instructions[ 2 ].entry ] == 'NOP' )
@@ -0,0 +1,126 @@
+"""Tests for hexfile.py: Intel HEX and S-record loading
+"""
+import pytest
+from hexfile import load_intel_hex, load_srec, load_hex_file, is_hex_file
+from image import MemoryMap
+from test_image import run_dasm
+
+def intel_record( kind, address, data ) :
+    record = bytes([ len( data )]) + address.to_bytes( 2, 'big' ) + bytes([ kind ]) + data
+    return( ':' + ( record + bytes([ -sum( record ) & 0xff ])).hex().upper() )
+
+def srec_record( kind, address, data ) :
+    size = { '1' : 2, '2' : 3, '3' : 4, '7' : 4, '8' : 3, '9' : 2 }[ kind ]
+    record = bytes([ size + len( data ) + 1 ]) + address.to_bytes( size, 'big' ) + data
+    return( 'S' + kind + ( record + bytes([ 0xff - sum( record ) & 0xff ])).hex().upper() )
+
+INTEL_END = ':00000001FF'
+
+def test_intel_hex() :
+    lines = [ intel_record( 0, 0x8000, bytes.fromhex( '3E05' )),
+              intel_record( 0, 0x8002, bytes.fromhex( 'C9' )),
+              '',
+              intel_record( 0, 0x9000, bytes.fromhex( '00' )),
+              intel_record( 5, 0, ( 0x8000 ).to_bytes( 4, 'big' )),
+              INTEL_END,
+              'anything after the end' ]
+    ( memory, start ) = load_intel_hex( lines )
+    assert( start == 0x8000 )
+    assert( memory.ranges() == [( 0x8000, 0x8003 ), ( 0x9000, 0x9001 )] )
+    assert( memory[ 0x8000:0x8003 ] == bytes.fromhex( '3E05C9' ))
+
+def test_intel_extended_address() :
+    lines = [ intel_record( 2, 0, bytes.fromhex( '0100' )),
+              intel_record( 0, 0x0010, b'\x01' ),
+              intel_record( 4, 0, bytes.fromhex( '0000' )),
+              intel_record( 0, 0x0020, b'\x02' ),
+              intel_record( 3, 0, bytes.fromhex( '01000004' )),
+              INTEL_END ]
+    ( memory, start ) = load_intel_hex( lines )
+    assert( memory.ranges() == [( 0x0020, 0x0021 ), ( 0x1010, 0x1011 )] )
+    assert( start == 0x1004 )
+
+def test_srec() :
+    lines = [ 'S00600004844521B',
+              srec_record( '1', 0x4000, bytes.fromhex( '210080' )),
+              srec_record( '2', 0x004003, bytes.fromhex( '7E' )),
+              srec_record( '3', 0x00004004, bytes.fromhex( 'C9' )),
+              srec_record( '9', 0x4000, b'' ) ]
+    ( memory, start ) = load_srec( lines )
+    assert( start == 0x4000 )
+    assert( memory.ranges() == [( 0x4000, 0x4005 )] )
+    assert( memory[ 0x4000:0x4005 ] == bytes.fromhex( '2100807EC9' ))
+
+def test_offset() :
+    memory = MemoryMap()
+    memory.add( 0x0000, b'\x00' )
+    ( memory, start ) = load_srec([ srec_record( '1', 0x0010, b'\xc9' ), srec_record( '9', 0x0010, b'' )],
+                                  memory_map=memory, offset=0x2000 )
+    assert( memory.ranges() == [( 0x0000, 0x0001 ), ( 0x2010, 0x2011 )] )
+    assert( start == 0x2010 )
+
+def test_out_of_order() :
+    # Records that follow on from each other in memory but not in the file
+    # make one segment, so LD C,02 is not split
+    lines = [ intel_record( 0, 0xe060, bytes.fromhex( '02C9' )),
+              intel_record( 0, 0xe05c, bytes.fromhex( '3E0506' )),
+              intel_record( 0, 0xe05f, bytes.fromhex( '0E' )),
+              intel_record( 0, 0xf000, bytes.fromhex( '00' )),
+              INTEL_END ]
+    ( memory, start ) = load_intel_hex( lines )
+    assert( start is None )
+    assert( memory.ranges() == [( 0xe05c, 0xe062 ), ( 0xf000, 0xf001 )] )
+    assert( memory[ 0xe05c:0xe062 ] == bytes.fromhex( '3E05060E02C9' ))
+
+def test_overlapping_records() :
+    # A later record overwrites an earlier one
+    lines = [ srec_record( '1', 0x1002, bytes.fromhex( 'AAAAAA' )),
+              srec_record( '1', 0x1000, bytes.fromhex( '00000000' )),
+              srec_record( '1', 0x1003, bytes.fromhex( 'C9' )) ]
+    ( memory, start ) = load_srec( lines )
+    assert( memory.ranges() == [( 0x1000, 0x1005 )] )
+    assert( memory[ 0x1000:0x1005 ] == bytes.fromhex( '000000C9AA' ))
+    ( memory, start ) = load_srec( lines[ 1: ] + lines[ :1 ] )
+    assert( memory[ 0x1000:0x1005 ] == bytes.fromhex( '0000AAAAAA' ))
+
+GOOD_INTEL = intel_record( 0, 0x8000, bytes.fromhex( '3E05C9' ))
+GOOD_SREC = srec_record( '1', 0x8000, bytes.fromhex( '3E05C9' ))
+
+@pytest.mark.parametrize(( 'loader', 'line' ), [
+    ( load_intel_hex, GOOD_INTEL[ :-2 ] + '00' ),                   # checksum
+    ( load_intel_hex, GOOD_INTEL[ :-4 ] + GOOD_INTEL[ -2: ] ),      # length
+    ( load_intel_hex, GOOD_INTEL[ :-1 ] ),                          # odd number of digits
+    ( load_intel_hex, ':' + GOOD_INTEL[ 3:11 ] ),                   # too short
+    ( load_intel_hex, GOOD_INTEL[ 1: ] ),                           # no ':'
+    ( load_srec, GOOD_SREC[ :-2 ] + '00' ),
+    ( load_srec, GOOD_SREC[ :-4 ] + GOOD_SREC[ -2: ] ),
+    ( load_srec, 'S4' + GOOD_SREC[ 2: ] ),                          # type
+    ( load_srec, 'X' + GOOD_SREC[ 1: ] )])
+def test_bad_records( loader, line ) :
+    assert( loader([ GOOD_INTEL if loader is load_intel_hex else GOOD_SREC ] )[ 0 ].ranges() == [( 0x8000, 0x8003 )] )
+    with pytest.raises( ValueError ) :
+        loader([ line ], 'bad.hex' )
+
+def test_unknown_intel_type() :
+    with pytest.raises( ValueError ) :
+        load_intel_hex([ intel_record( 6, 0, b'' )] )
+
+def test_dasm_hex_file( tmp_path ) :
+    path = tmp_path / 'rom.hex'
+    path.write_text( '\n'.join([ intel_record( 0, 0xe05f, bytes.fromhex( '0E02' )),
+                                 intel_record( 0, 0xe05c, bytes.fromhex( '3E0501' )),
+                                 INTEL_END ]) + '\n' )
+    assert( is_hex_file( str( path )) and not is_hex_file( 'rom.bin' ))
+    ( memory, start ) = load_hex_file( str( path ))
+    assert( memory.ranges() == [( 0xe05c, 0xe061 )] )
+    listing = run_dasm( '-b', str( path ))
+    assert( 'LD BC,020E' in listing and 'DB' not in listing )
+
+def test_dasm_follow_without_start( tmp_path ) :
+    # With no start address and no --org, -r starts at the lowest address
+    path = tmp_path / 'rom.hex'
+    path.write_text( '\n'.join([ intel_record( 0, 0xe05c, bytes.fromhex( '3E05C361E0' )),
+                                 intel_record( 0, 0xe061, bytes.fromhex( 'C9' )),
+                                 INTEL_END ]) + '\n' )
+    listing = run_dasm( '-b', str( path ), '-r' )
+    assert( 'LD A,05' in listing and 'RET' in listing and 'DB' not in listing )
@@ -0,0 +1,104 @@
+"""Tests for image.py: memory mapped images and the segmented memory map
+"""
+import os
+import subprocess
+import sys
+import pytest
+from decoder import disassemble
+from image import map_file, map_records, MemoryMap
+from benchmark import make_image
+
+DASM = os.path.join( os.path.dirname( os.path.dirname( os.path.abspath( __file__ ))), 'dasm.py' )
+
+def run_dasm( *args ) :
+    result = subprocess.run(( sys.executable, DASM ) + args, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, universal_newlines=True )
+    assert( result.returncode == 0 ), result.stdout + result.stderr
+    return( result.stdout )
+
+@pytest.fixture
+def image_file( tmp_path ) :
+    path = tmp_path / 'image.bin'
+    path.write_bytes( make_image( 1 ))
+    return( path )
+
+def test_map_file( image_file ) :
+    with open( str( image_file ), 'rb' ) as fh :
+        memory = map_file( fh )
+
+    # The map is still readable after the file is closed
+    data = image_file.read_bytes()
+    assert( len( memory ) == len( data ) and memory[ : ] == data )
+    assert( [( record.address, record.entry ) for record in disassemble( memory )] ==
+            [( record.address, record.entry ) for record in disassemble( data )] )
+
+def test_map_empty_file( tmp_path ) :
+    path = tmp_path / 'empty.bin'
+    path.write_bytes( b'' )
+    with open( str( path ), 'rb' ) as fh :
+        assert( map_file( fh ) == b'' )
+
+def test_dasm_mmap( image_file ) :
+    assert( run_dasm( '-m', '-b', str( image_file )) == run_dasm( '-b', str( image_file )))
+
+def test_memory_map() :
+    memory = MemoryMap()
+    memory.add( 0x8000, bytes.fromhex( '3E05C9' ))
+    memory.add( 0x1000, bytes.fromhex( '0000' ))
+    assert( memory.ranges() == [( 0x1000, 0x1002 ), ( 0x8000, 0x8003 )] )
+    assert( len( memory ) == 0x8003 )
+    assert( memory[ 0x8001 ] == 0x05 and memory[ 0x8000:0x8002 ] == bytes.fromhex( '3E05' ))
+    with pytest.raises( IndexError ) :
+        memory[ 0x1002 ]
+
+    for ( base, size ) in (( 0x0fff, 2 ), ( 0x1001, 1 ), ( 0x7ffe, 4 ), ( 0x8002, 1 )) :
+        with pytest.raises( ValueError ) :
+            memory.add( base, bytes( size ))
+    assert( memory.ranges() == [( 0x1000, 0x1002 ), ( 0x8000, 0x8003 )] )
+
+def test_touching_segments() :
+    # Segments that touch are joined, whichever order they are added in
+    memory = MemoryMap()
+    memory.add( 0x8003, bytes.fromhex( '02C9' ))
+    memory.add( 0x7ffe, bytes.fromhex( '0000' ))
+    memory.add( 0x8000, bytes.fromhex( '3E0501' ))
+    assert( memory.ranges() == [( 0x7ffe, 0x8005 )] )
+    assert( memory[ 0x7ffe:0x8005 ] == bytes.fromhex( '00003E050102C9' ))
+
+def test_address_space() :
+    memory = MemoryMap()
+    memory.add( 0xfff0, bytes( 0x10 ))
+    for ( base, size ) in (( 0xfff0, 0x11 ), ( -1, 1 ), ( 0x10000, 1 )) :
+        with pytest.raises( ValueError ) :
+            MemoryMap().add( base, bytes( size ))
+
+def test_map_records() :
+    memory = MemoryMap()
+    memory.add( 0x4000, bytes.fromhex( '3E05' ))
+    memory.add( 0x8000, bytes.fromhex( 'C30040' ))
+    assert( [( record.address, record.entry ) for record in map_records( memory, disassemble )] ==
+            [( 0x4000, 0x3e ), ( 0x8000, 0xc3 )] )
+
+def test_dasm_org_segment( tmp_path ) :
+    # An instruction that runs on from --org into a --segment right after it
+    # is listed as it would be from one image
+    first = tmp_path / 'first.bin'
+    first.write_bytes( bytes.fromhex( '3E0501' ))
+    second = tmp_path / 'second.bin'
+    second.write_bytes( bytes.fromhex( '02C9' ))
+    whole = tmp_path / 'whole.bin'
+    whole.write_bytes( first.read_bytes() + second.read_bytes() )
+    listing = run_dasm( '-b', str( first ), '--org', '8000', '--segment', '{}@8003'.format( second ))
+    assert( listing == run_dasm( '-b', str( whole ), '--org', '8000' ))
+    assert( 'LD BC,C902' in listing )
+
+def test_dasm_past_ffff( image_file ) :
+    result = subprocess.run(( sys.executable, DASM, '-b', str( image_file ), '--org', 'FFF0' ),
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True )
+    assert( result.returncode == 1 and 'FFFF' in result.stdout + result.stderr )
+
+def test_dasm_stats_org( image_file ) :
+    # Only the ranges that hold the image are counted
+    lines = run_dasm( '--stats', '-b', str( image_file ), '--org', 'C000' ).splitlines()
+    ranges = lines[ lines.index( '; instructions per address range' ) + 1: ]
+    assert( [ line.split()[ 0 ] for line in ranges ] == [ 'C000-CFFF' ] )
@@ -0,0 +1,176 @@
+"""Tests for incremental.py: a patched decode must be the same as decoding the
+    patched image from scratch
+"""
+import random
+import pytest
+import cache
+import incremental
+from decoder import encode, decode, disassemble, MNEMONICS
+from incremental import linear_decode, instructions_decode, changed_ranges
+from cache import cached_decode
+from benchmark import make_image
+from test_image import run_dasm
+
+DEFINED = [ entry for ( entry, mnenomic ) in enumerate( MNEMONICS ) if mnenomic is not None ]
+
+def _same( result, expected ) :
+    assert( list( result.starts ) == list( expected.starts ))
+    assert( list( result.entries ) == list( expected.entries ))
+    assert( list( result.operands ) == list( expected.operands ))
+    assert( result.references == expected.references )
+    assert( list( result.symbol_table().items() ) == list( expected.symbol_table().items() ))
+
+def _records( records ) :
+    return( [( record.address, record.entry, record.operand ) for record in records ] )
+
+def _patch( memory, generator ) :
+    """memory with a few random instructions written over it, that still
+        disassembles without an error
+    """
+    while True :
+        patched = bytearray( memory )
+        for count in range( generator.randint( 1, 4 )) :
+            code = encode( generator.choice( DEFINED ), generator.randint( 0, 0xffff ) & 0xff )
+            address = generator.randrange( len( memory ) - len( code ))
+            patched[ address:address + len( code )] = code
+        try :
+            return( bytes( patched ), linear_decode( patched ))
+        except ( IndexError, KeyError ) :
+            pass
+
+class CountingBytes( bytes ) :
+    """Counts the single bytes looked up
+    """
+    lookups = 0
+
+    def __getitem__( self, index ) :
+        if isinstance( index, int ) :
+            CountingBytes.lookups += 1
+        return( super().__getitem__( index ))
+
+def test_changed_ranges() :
+    assert( changed_ranges( b'\x00' * 8, b'\x00' * 8 ) == [] )
+    assert( changed_ranges( bytes.fromhex( '0001020304' ), bytes.fromhex( 'FF0102FEFD' )) ==
+            [( 0, 1 ), ( 3, 5 )] )
+
+    # Across block boundaries, and only the bytes of the blocks that differ
+    # are looked at one at a time
+    memory = bytes( 200000 )
+    patched = bytearray( memory )
+    changes = [( 0, 1 ), ( 255, 257 ), ( 511, 512 ), ( 65530, 65540 ), ( 70000, 70600 ), ( 199999, 200000 )]
+    for ( start, end ) in changes :
+        patched[ start:end ] = b'\xff' * ( end - start )
+    CountingBytes.lookups = 0
+    assert( changed_ranges( CountingBytes( memory ), CountingBytes( patched )) == changes )
+    assert( CountingBytes.lookups == 2 * ( 7 * 256 + 64 ))
+
+def test_random_patches() :
+    generator = random.Random( 10 )
+    memory = make_image( 1 )
+    result = linear_decode( memory )
+    for trial in range( 50 ) :
+        ( patched, expected ) = _patch( memory, generator )
+        decoded = result.patch( patched, changed_ranges( memory, patched ))
+        _same( result, expected )
+        assert( decoded < len( expected ) // 10 )
+        memory = patched
+
+def test_instructions_decode() :
+    memory = make_image( 1 )
+    _same( instructions_decode( disassemble( memory )), linear_decode( memory ))
+    assert( _records( linear_decode( memory ).instructions() ) == _records( disassemble( memory )))
+
+def test_truncated() :
+    # The truncated last instruction raises the error from disassemble(),
+    # and leaves the instructions before it
+    memory = bytes.fromhex( '000000' '3E05' '00' )
+    result = linear_decode( memory )
+    patched = bytes.fromhex( '000000' '3E05' 'C3' )
+    with pytest.raises( IndexError ) :
+        list( disassemble( patched ))
+    with pytest.raises( IndexError ) :
+        result.patch( patched, changed_ranges( memory, patched ))
+    assert( list( result.starts ) == [ 0, 1, 2, 3 ] )
+
+    # Patching the end back decodes on from where it stopped
+    result.patch( memory, changed_ranges( patched, memory ))
+    _same( result, linear_decode( memory ))
+
+def _same_entry( entry, expected ) :
+    for name in cache.Entry.__slots__ :
+        assert( getattr( entry, name ) == getattr( expected, name ))
+
+def test_patched_entry() :
+    generator = random.Random( 11 )
+    memory = make_image( 20000 )
+    entry = cache._new_entry( disassemble( memory ), len( memory ))
+    for trial in range( 50 ) :
+        ( patched, expected ) = _patch( memory, generator )
+        decoded = entry.patch( patched, changed_ranges( memory, patched ))
+        _same_entry( entry, cache._new_entry( disassemble( patched ), len( patched )))
+        assert( decoded < len( expected ) // 100 )
+        memory = patched
+
+def test_patched_entry_ends() :
+    # Changes at the start and the end, and one that runs on to the end
+    memory = make_image( 1 ) + bytes( 4 )
+    entry = cache._new_entry( disassemble( memory ), len( memory ))
+    patched = bytearray( memory )
+    patched[ 0:3 ] = bytes.fromhex( 'C30000' )
+    patched[ -3: ] = bytes.fromhex( '3E05C9' )
+    entry.patch( bytes( patched ), changed_ranges( memory, patched ))
+    _same_entry( entry, cache._new_entry( disassemble( patched ), len( patched )))
+
+    # An error leaves the entry as it was
+    truncated = bytes( patched[ :-1 ] ) + b'\xc3'
+    with pytest.raises( IndexError ) :
+        entry.patch( truncated, changed_ranges( patched, truncated ))
+    _same_entry( entry, cache._new_entry( disassemble( patched ), len( patched )))
+
+def test_cached_patch( tmp_path, monkeypatch ) :
+    memory = make_image( 64 * 1024 )
+    ( patched, expected ) = _patch( memory, random.Random( 3 ))
+    cached_decode( memory, str( tmp_path ))
+
+    # The patched image is not disassembled from scratch or walked an
+    # instruction at a time, only the instructions around the changes are
+    # decoded
+    def not_called( *args ) :
+        raise AssertionError( 'a whole image decode' )
+    monkeypatch.setattr( cache, 'disassemble', not_called )
+    monkeypatch.setattr( cache, '_new_entry', not_called )
+    decoded = []
+    def counting_decode( memory, pc ) :
+        decoded.append( pc )
+        return( decode( memory, pc ))
+    monkeypatch.setattr( incremental, 'decode', counting_decode )
+    walked = []
+    walk = cache.Entry._walk
+    def counting_walk( self, block ) :
+        for record in walk( self, block ) :
+            walked.append( record[ 0 ] )
+            yield( record )
+    monkeypatch.setattr( cache.Entry, '_walk', counting_walk )
+
+    ( records, symbol_table ) = cached_decode( patched, str( tmp_path ), base=memory )
+    assert( 0 < len( decoded ) < len( expected ) // 100 )
+    assert( len( walked ) < len( expected ) // 100 )
+    monkeypatch.undo()
+    assert( _records( records ) == _records( expected.instructions() ))
+    assert( list( symbol_table.items() ) == list( expected.symbol_table().items() ))
+
+    # and is in the cache itself now
+    ( records, symbol_table ) = cached_decode( patched, str( tmp_path ))
+    assert( _records( records ) == _records( expected.instructions() ))
+
+def test_dasm_patched_from( tmp_path ) :
+    memory = make_image( 1 )
+    ( patched, expected ) = _patch( memory, random.Random( 4 ))
+    ( tmp_path / 'rom.bin' ).write_bytes( memory )
+    ( tmp_path / 'rom.patched.bin' ).write_bytes( patched )
+    cache_dir = str( tmp_path / 'cache' )
+
+    run_dasm( '-b', str( tmp_path / 'rom.bin' ), '--cache-dir', cache_dir )
+    assert( run_dasm( '-b', str( tmp_path / 'rom.patched.bin' ), '--cache-dir', cache_dir,
+                      '--patched-from', str( tmp_path / 'rom.bin' )) ==
+            run_dasm( '-b', str( tmp_path / 'rom.patched.bin' )))
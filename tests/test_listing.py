@@ -0,0 +1,61 @@
+"""Tests for listing.py: the buffered listing and symbol table output
+"""
+import io
+import pytest
+from decoder import disassemble
+from listing import write_listing, write_symbols
+from dasm import get_opcode
+from benchmark import make_image
+
+class CountingWriter( io.StringIO ) :
+    """Counts the calls to write()
+    """
+    def __init__( self ) :
+        super().__init__()
+        self.writes = 0
+
+    def write( self, text ) :
+        self.writes += 1
+        return( super().write( text ))
+
+def _print_listing( memory ) :
+    """The listing the way dasm.py first printed it, a line at a time
+    """
+    symbol_table = {}
+    lines = []
+    pc = 0
+    while pc < len( memory ) :
+        ( pc, pretty_pc, opcode_value, pretty_mnenomic, symbol_table ) = get_opcode( pc, memory, symbol_table )
+        lines.append( '{} {} :           {}\n'.format( pretty_pc, opcode_value, pretty_mnenomic ))
+
+    return( ''.join( lines ))
+
+@pytest.mark.parametrize( 'flush_lines', [ 0, 1, 7, 4096 ] )
+def test_write_listing( flush_lines ) :
+    memory = make_image( 1 )
+    out = CountingWriter()
+    count = write_listing( disassemble( memory ), out, flush_lines=flush_lines )
+
+    assert( out.getvalue() == _print_listing( memory ))
+    assert( count == out.getvalue().count( '\n' ))
+    # One write per block of lines, and the last (maybe empty) block
+    assert( out.writes == count // max( flush_lines, 1 ) + 1 )
+
+def test_write_listing_empty() :
+    out = io.StringIO()
+    assert( write_listing( disassemble( b'' ), out ) == 0 )
+    assert( out.getvalue() == '' )
+
+def test_write_symbols() :
+    out = CountingWriter()
+    write_symbols({ 'SYM_E074' : 'E074', 'SYM_0000' : '0000', 'SYM_1234' : '1234' }, out, flush_lines=2 )
+    assert( out.getvalue() == 'SYM_E074 = E074\nSYM_0000 = 0000\nSYM_1234 = 1234\n' )
+    assert( out.writes == 2 )
+
+def test_write_listing_error() :
+    # The lines decoded before the truncated tail are still written
+    memory = make_image( 1 ) + bytes.fromhex( 'C374' )
+    out = io.StringIO()
+    with pytest.raises( IndexError ) :
+        write_listing( disassemble( memory ), out )
+    assert( out.getvalue() == _print_listing( make_image( 1 )))
@@ -0,0 +1,140 @@
+"""Tests for parallel.py: the listing from the worker processes must be the
+    same as a serial run
+"""
+import io
+import random
+import pytest
+import boundaries
+import parallel
+from decoder import disassemble, disassemble_lenient, new_anomalies
+from listing import write_listing, write_xref
+from symbols import SymbolIndex
+from parallel import parallel_listing, decode_segment
+from benchmark import make_image
+
+def _serial( memory, anomalies=None ) :
+    out = io.StringIO()
+    symbols = SymbolIndex()
+    if anomalies is None :
+        write_listing( disassemble( memory ), out, symbols )
+    else :
+        write_listing( disassemble_lenient( memory, anomalies=anomalies ), out, symbols )
+    return( out.getvalue(), symbols )
+
+def _same_symbols( symbols, expected ) :
+    assert( list( symbols.symbol_table().items() ) == list( expected.symbol_table().items() ))
+    ( xref, expected_xref ) = ( io.StringIO(), io.StringIO() )
+    write_xref( symbols, xref )
+    write_xref( expected, expected_xref )
+    assert( xref.getvalue() == expected_xref.getvalue() )
+
+@pytest.fixture( params=[ 'numpy', 'lead bytes' ] )
+def starts_mode( request, monkeypatch ) :
+    if request.param == 'lead bytes' :
+        monkeypatch.setattr( boundaries, 'numpy', None )
+    elif boundaries.numpy is None :
+        pytest.skip( 'NumPy is not installed' )
+    return( request.param )
+
+@pytest.mark.parametrize( 'workers, segment_size', [( 1, 4096 ), ( 2, 1000 ), ( 3, 65536 )] )
+def test_same_as_serial( tmp_path, starts_mode, workers, segment_size ) :
+    memory = make_image( 20000 )
+    path = tmp_path / 'image.bin'
+    path.write_bytes( memory )
+
+    out = io.StringIO()
+    symbols = SymbolIndex()
+    count = parallel_listing( str( path ), out, symbols, workers, segment_size, flush_lines=100 )
+
+    ( expected, expected_symbols ) = _serial( memory )
+    assert( out.getvalue() == expected )
+    assert( count == expected.count( '\n' ))
+    _same_symbols( symbols, expected_symbols )
+
+class RecordingPool :
+    """multiprocessing.Pool run in this process, keeping every job it is given
+    """
+    jobs = []
+
+    class Result :
+        def __init__( self, value ) :
+            self.value = value
+
+        def get( self ) :
+            return( self.value )
+
+    def __init__( self, workers, initializer, initargs ) :
+        initializer( *initargs )
+
+    def __enter__( self ) :
+        return( self )
+
+    def __exit__( self, *exception ) :
+        return( False )
+
+    def apply_async( self, function, args ) :
+        self.jobs.append( args[ 0 ] )
+        return( self.Result( function( *args )))
+
+@pytest.mark.parametrize( 'workers', [ 1, 2 ] )
+def test_job_ranges( tmp_path, monkeypatch, starts_mode, workers ) :
+    # Every job starts near the start of its own segment, the ones after the
+    # first few as well
+    memory = make_image( 64 * 1024 )
+    path = tmp_path / 'image.bin'
+    path.write_bytes( memory )
+    monkeypatch.setattr( RecordingPool, 'jobs', [] )
+    monkeypatch.setattr( parallel.multiprocessing, 'Pool', RecordingPool )
+
+    out = io.StringIO()
+    parallel_listing( str( path ), out, SymbolIndex(), workers, 4096 )
+    segments = list( range( 0, len( memory ), 4096 ))
+    assert( len( RecordingPool.jobs ) == len( segments ) > 2 * workers )
+    for ( ( job_path, start, end ), seg_start ) in zip( RecordingPool.jobs, segments ) :
+        assert( end == min( seg_start + 4096, len( memory )))
+        if starts_mode == 'numpy' :
+            assert( seg_start <= start < seg_start + 4 )
+        else :
+            assert( start == max( seg_start - parallel.LEAD_BYTES, 0 ))
+    assert( out.getvalue() == _serial( memory )[ 0 ] )
+
+def test_lenient_same_as_serial( tmp_path, starts_mode ) :
+    # Random bytes have undefined op-codes and put the workers out of step
+    memory = random.Random( 6 ).randbytes( 30000 )
+    path = tmp_path / 'random.bin'
+    path.write_bytes( memory )
+
+    out = io.StringIO()
+    symbols = SymbolIndex()
+    anomalies = new_anomalies()
+    parallel_listing( str( path ), out, symbols, 2, 997, anomalies=anomalies )
+
+    expected_anomalies = new_anomalies()
+    ( expected, expected_symbols ) = _serial( memory, expected_anomalies )
+    assert( out.getvalue() == expected )
+    assert( anomalies == expected_anomalies )
+    _same_symbols( symbols, expected_symbols )
+
+def test_names( tmp_path ) :
+    memory = make_image( 5000 )
+    path = tmp_path / 'image.bin'
+    path.write_bytes( memory )
+    names = { 0x0000 : 'START', 0x1234 : 'TABLE' }
+
+    out = io.StringIO()
+    parallel_listing( str( path ), out, None, 2, 1024, names=names )
+    expected = io.StringIO()
+    write_listing( disassemble( memory ), expected, None, names=names )
+    assert( out.getvalue() == expected.getvalue() )
+
+def test_decode_segment( tmp_path ) :
+    path = tmp_path / 'code.bin'
+    path.write_bytes( bytes.fromhex( '3E05' 'ED00' 'C374E0' 'CD' ))
+    ( starts, lengths, targets, kinds, text, offsets, breaks ) = decode_segment(( str( path ), 0, 8 ))
+
+    # ED 00 is skipped a byte at a time and 'CD' at the end is cut off
+    assert( list( starts ) == [ 0, 3, 4 ] )
+    assert( list( lengths ) == [ 2, 1, 3 ] )
+    assert( list( targets ) == [ parallel.NO_TARGET, parallel.NO_TARGET, 0xe074 ] )
+    assert( breaks == [ 1, 3 ] )
+    assert( text[ offsets[ 2 ]:offsets[ 3 ]] == '0004 C3 74 E0     :           JP E074  [SYM_E074]\n' )
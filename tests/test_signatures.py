@@ -0,0 +1,102 @@
+"""Tests for signatures.py: index searches against a brute force search of
+    the same images
+"""
+import random
+import pytest
+from decoder import encode, disassemble_lenient
+from signatures import build_index, SignatureIndex, gram_key, image_grams, sequence_entries, GRAM_SIZE
+from benchmark import make_image
+
+# A few instructions so that sequences repeat, and an undefined op-code to
+# break the runs
+CODES = [ encode( entry, 0x12 ) for entry in ( 0x00, 0x3e, 0xc3, 0x21, 0x77, 0xc9, 0x256, 0x31e ) ]
+UNDEFINED = bytes.fromhex( 'ED00' )
+
+def _image( generator, count ) :
+    parts = []
+    for index in range( count ) :
+        if generator.random() < 0.05 :
+            parts.append( UNDEFINED )
+        else :
+            parts.append( generator.choice( CODES ))
+    return( b''.join( parts ))
+
+def _runs( memory ) :
+    """The runs of decoded instructions as lists of ( address, entry )
+    """
+    runs = [[]]
+    for record in disassemble_lenient( memory ) :
+        if record.entry is None :
+            runs.append( [] )
+        else :
+            runs[ -1 ].append(( record.address, record.entry ))
+    return( runs )
+
+def _brute_force( images, entries ) :
+    found = []
+    size = max( len( entries ), GRAM_SIZE )
+    for ( name, memory ) in images :
+        for run in _runs( memory ) :
+            for index in range( len( run ) - size + 1 ) :
+                if [ entry for ( address, entry ) in run[ index:index + len( entries )]] == entries :
+                    found.append(( name, run[ index ][ 0 ] ))
+    return( sorted( found ))
+
+@pytest.fixture
+def index( tmp_path ) :
+    generator = random.Random( 19 )
+    images = []
+    for number in range( 3 ) :
+        path = tmp_path / 'rom{}.bin'.format( number )
+        path.write_bytes( _image( generator, 3000 ))
+        images.append(( str( path ), path.read_bytes() ))
+
+    index_path = str( tmp_path / 'roms.idx' )
+    assert( build_index([ str( tmp_path / '*.bin' )], index_path ) == [] )
+    index = SignatureIndex( index_path )
+    yield( index, images )
+    index.close()
+
+def test_gram_key() :
+    assert( gram_key([ 1, 2, 3, 4 ] ) > gram_key([ 1, 2, 3 ] ) == gram_key([ 1, 2, 3, 0 ] ))
+    assert( gram_key([ 1, 2, 3, 4 ] ) < gram_key([ 1, 2, 4 ] ))
+
+def test_image_grams() :
+    memory = bytes.fromhex( '00' '3E12' '00' '00' 'ED00' '00' '00' '00' '00' 'C9' )
+    ( keys, addresses ) = image_grams( memory )
+    assert( list( addresses ) == [ 0, 7, 8 ] )
+    assert( keys[ 0 ] == gram_key([ 0x00, 0x3e, 0x00, 0x00 ] ))
+
+def test_search( index ) :
+    ( index, images ) = index
+    generator = random.Random( 20 )
+    searched = 0
+    for trial in range( 40 ) :
+        ( name, memory ) = generator.choice( images )
+        run = generator.choice([ run for run in _runs( memory ) if len( run ) >= 12 ])
+        length = generator.randint( GRAM_SIZE, 12 )
+        start = generator.randrange( len( run ) - length + 1 )
+        entries = [ entry for ( address, entry ) in run[ start:start + length ]]
+
+        found = index.search( entries )
+        assert( found == _brute_force( images, entries ))
+        assert(( name, run[ start ][ 0 ] ) in found )
+        searched += len( found )
+    assert( searched > 40 )
+
+def test_short_search( index ) :
+    # A sequence shorter than a gram is found where a gram starts with it
+    ( index, images ) = index
+    for entries in ([ 0x00 ], [ 0xc3, 0xc9 ], [ 0x256, 0x31e, 0x3e ] ) :
+        assert( index.search( entries ) == _brute_force( images, entries ))
+    assert( index.search([] ) == [] )
+
+def test_not_found( index ) :
+    ( index, images ) = index
+    assert( index.search( sequence_entries( make_image( 1 ), 0, 8 )) == [] )
+
+def test_bad_index( tmp_path ) :
+    path = tmp_path / 'bad.idx'
+    path.write_bytes( b'Z80S' + bytes( 100 ))
+    with pytest.raises( ValueError ) :
+        SignatureIndex( str( path ))
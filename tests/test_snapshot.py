@@ -0,0 +1,57 @@
+"""Tests for snapshot.py and how decoder.py loads the compiled tables
+"""
+import os
+import decoder
+import snapshot
+
+def _module_tables() :
+    return( decoder.PREFIXES, decoder.MNEMONICS, decoder.LENGTHS, decoder.LAYOUTS,
+            decoder.OPERAND_OFFSETS, decoder.TEMPLATES, decoder.OPCODE_TEXT )
+
+def test_shipped_snapshot_is_up_to_date() :
+    source_checksum = snapshot.checksum( decoder.TABLES_FILE, decoder.SNAPSHOT_VERSION )
+    assert( snapshot.load( decoder.SNAPSHOT_FILE, source_checksum ) == decoder._compile() )
+
+def test_round_trip( tmp_path ) :
+    path = str( tmp_path / 'tables.snapshot' )
+    decoder.save_snapshot( path )
+    source_checksum = snapshot.checksum( decoder.TABLES_FILE, decoder.SNAPSHOT_VERSION )
+
+    assert( snapshot.load( path, source_checksum ) == _module_tables() )
+    assert( snapshot.load( path, source_checksum ^ 1 ) is None )
+    assert( not [ name for name in os.listdir( str( tmp_path )) if name.endswith( '.tmp' )] )
+
+def test_bad_snapshot( tmp_path ) :
+    path = tmp_path / 'tables.snapshot'
+    assert( snapshot.load( str( path ), 0 ) is None )
+    path.write_bytes( b'Z80T' )
+    assert( snapshot.load( str( path ), 0 ) is None )
+
+def test_load_does_not_write( tmp_path, monkeypatch ) :
+    # A missing snapshot in a directory that can not be written to: the
+    # tables are compiled in memory and nothing is saved
+    path = tmp_path / 'read-only' / 'decoder.snapshot'
+    monkeypatch.setattr( decoder, 'SNAPSHOT_FILE', str( path ))
+    assert( decoder._load() == _module_tables() )
+    assert( not path.parent.exists() )
+
+def test_checksum_changes_with_seed( tmp_path ) :
+    path = tmp_path / 'tables'
+    path.write_bytes( bytes( range( 256 )) * 3 )
+    assert( snapshot.checksum( str( path ), 1 ) != snapshot.checksum( str( path ), 2 ))
+    first = snapshot.checksum( str( path ))
+    path.write_bytes( bytes( range( 256 )) * 2 + bytes( range( 255 )) + b'\x00' )
+    assert( snapshot.checksum( str( path )) != first )
+
+def test_checksum_double_flip( tmp_path ) :
+    # Two flipped bits that a fold in half would line up on top of each
+    # other must still change the checksum
+    path = tmp_path / 'tables'
+    data = bytearray( bytes( range( 256 )) * 146 )
+    path.write_bytes( data )
+    first = snapshot.checksum( str( path ))
+    half = len( data ) * 8 // 2
+    for bit in ( 100, 100 + half ) :
+        data[ bit // 8 ] ^= 1 << ( bit % 8 )
+    path.write_bytes( data )
+    assert( snapshot.checksum( str( path )) != first )
@@ -0,0 +1,50 @@
+"""Tests for stats.py: the instruction counts
+"""
+import io
+from collections import Counter
+from decoder import disassemble, disassemble_lenient, MNEMONICS, TABLE_SIZE
+from stats import Stats, write_stats, DATA_NAME
+from tablegen import TABLE_NAMES
+from benchmark import make_image
+
+def test_counts() :
+    memory = make_image( 10000 )
+    stats = Stats( len( memory ))
+    instructions = list( disassemble( memory ))
+    assert( stats.count( iter( instructions )) == len( instructions ))
+
+    tables = Counter( TABLE_NAMES[ instruction.entry // TABLE_SIZE ] for instruction in instructions )
+    names = Counter( MNEMONICS[ instruction.entry ].split( ' ' )[ 0 ] for instruction in instructions )
+    ranges = Counter( instruction.address // 0x1000 for instruction in instructions )
+    assert( stats.tables() == { name : tables[ name ] for name in TABLE_NAMES } )
+    assert( stats.mnemonics() == dict( names ))
+    assert( list( stats.mnemonics().values() ) == sorted( names.values(), reverse=True ))
+    assert( list( stats.address_ranges().values() ) == [ ranges[ index ] for index in range( 3 )] )
+    assert( list( stats.address_ranges() ) == [ '0000-0FFF', '1000-1FFF', '2000-2FFF' ] )
+    assert( stats.data_bytes == 0 )
+
+def test_data_bytes() :
+    memory = bytes.fromhex( '3E05' 'ED00' 'CB07' 'C3' )
+    stats = Stats( len( memory ), range_size=4 )
+    stats.count( disassemble_lenient( memory ))
+    assert( stats.as_dict() == {
+        'tables' : dict( stats.tables(), opcode=1, cb_opcode=1 ),
+        'mnemonics' : { 'LD' : 1, 'RLC' : 1 },
+        'ranges' : { '0000-0003' : 1, '0004-0007' : 1 },
+        DATA_NAME : 3 })
+
+def test_write_stats() :
+    stats = Stats( 2 )
+    stats.count( disassemble( bytes.fromhex( '0000' )))
+    out = io.StringIO()
+    write_stats( stats, out )
+    lines = out.getvalue().splitlines()
+    assert( lines[ 0 ] == '; instructions per table' )
+    assert( lines[ 1 ] == 'opcode           2' )
+    assert( lines[ 1 + len( TABLE_NAMES ): ] == [
+        '; instructions per mnemonic', 'NOP              2',
+        '; instructions per address range', '0000-0FFF        2' ])
+
+def test_mapped_ranges() :
+    stats = Stats( 0x9000, mapped=[( 0x2000, 0x2001 ), ( 0x6ffe, 0x8002 ), ( 0x8800, 0x8800 )] )
+    assert( stats.address_ranges() == { '2000-2FFF' : 0, '6000-6FFF' : 0, '7000-7FFF' : 0, '8000-8FFF' : 0 } )
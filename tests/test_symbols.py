@@ -0,0 +1,86 @@
+"""Tests for symbols.py: the integer keyed symbol index and cross reference
+"""
+import io
+from decoder import decode, disassemble, add_symbol
+from symbols import SymbolIndex, merge_indexes, REF_JUMP, REF_CALL, REF_RELATIVE, REF_LOAD
+from listing import write_xref
+from benchmark import make_image
+
+# 0000  JP 0010      0007  JR 0000
+# 0003  CALL 0020    0009  LD HL,(0010)
+# 0006  NOP          000C  CALL 0010
+PROGRAM = bytes.fromhex( 'C31000' 'CD2000' '00' '18F7' '2A1000' 'CD1000' )
+
+def _index( memory ) :
+    symbols = SymbolIndex()
+    for instruction in disassemble( memory ) :
+        symbols.add( instruction )
+    return( symbols )
+
+def test_references() :
+    symbols = _index( PROGRAM )
+    assert( list( symbols ) == [ 0x10, 0x20, 0x00 ] )
+    assert( len( symbols ) == 3 and 0x20 in symbols and 0x30 not in symbols )
+    assert( symbols.references( 0x10 ) == [( 0x00, REF_JUMP ), ( 0x09, REF_LOAD ), ( 0x0c, REF_CALL )] )
+    assert( symbols.references( 0x00 ) == [( 0x07, REF_RELATIVE )] )
+    assert( symbols.references( 0x30 ) == [] )
+
+def test_symbol_table() :
+    # The same table, in the same order, as get_opcode() builds
+    memory = make_image( 1 )
+    expected = {}
+    for instruction in disassemble( memory ) :
+        add_symbol( instruction, expected )
+
+    symbols = _index( memory )
+    assert( list( symbols.symbol_table().items() ) == list( expected.items() ))
+
+def test_names() :
+    symbols = _index( PROGRAM )
+    assert( list( symbols.symbol_table( names={ 0x10 : 'START' } ).items() ) ==
+            [( 'START', '0010' ), ( 'SYM_0020', '0020' ), ( 'SYM_0000', '0000' )] )
+
+def test_write_xref() :
+    out = io.StringIO()
+    write_xref( _index( PROGRAM ), out, flush_lines=1, names={ 0x20 : 'PRINT' } )
+    assert( out.getvalue() == 'SYM_0000 : relative 0007\n'
+                              'SYM_0010 : jump 0000, load 0009, call 000C\n'
+                              'PRINT : call 0003\n' )
+
+def test_negative_target() :
+    # A relative jump back past 0000 is kept as a negative address
+    symbols = SymbolIndex()
+    symbols.add( decode( bytes.fromhex( '18FC' ), 0 ))
+    assert( list( symbols ) == [ -2 ] and symbols.references( -2 ) == [( 0, REF_RELATIVE )] )
+
+def test_sorted_lookups() :
+    symbols = _index( PROGRAM )
+    assert( symbols.sorted_targets() == [ 0x00, 0x10, 0x20 ] )
+    assert( list( symbols.symbol_table( ordered=True )) == [ 'SYM_0000', 'SYM_0010', 'SYM_0020' ] )
+    assert( [ symbols.nearest( address ) for address in ( -1, 0x00, 0x0f, 0x10, 0x1000 )] ==
+            [ None, 0x00, 0x00, 0x10, 0x20 ] )
+    assert( symbols.targets_between( 0x01, 0x20 ) == [ 0x10 ] )
+    assert( symbols.targets_between( 0x00, 0x21 ) == [ 0x00, 0x10, 0x20 ] )
+    assert( symbols.targets_between( 0x30, 0x40 ) == [] )
+
+    # A new symbol is in the next sorted list
+    symbols.add_reference( 0x08, 0x100, REF_LOAD )
+    assert( symbols.sorted_targets() == [ 0x00, 0x08, 0x10, 0x20 ] )
+    assert( symbols.nearest( 0x0f ) == 0x08 )
+
+def test_merge_indexes() :
+    # Merging the indexes of the parts of an image gives the index of the
+    # whole image
+    memory = make_image( 1 )
+    middle = len( memory ) // 2
+    instructions = list( disassemble( memory ))
+    parts = [ SymbolIndex(), SymbolIndex(), SymbolIndex() ]
+    for instruction in instructions :
+        parts[ 0 if instruction.address < middle else 1 ].add( instruction )
+
+    merged = merge_indexes( parts )
+    expected = _index( memory )
+    assert( merged.sorted_targets() == expected.sorted_targets() )
+    assert( list( merged.symbol_table().items() ) == list( expected.symbol_table().items() ))
+    assert( all( merged.references( target ) == expected.references( target ) for target in expected ))
+    assert( len( merge_indexes([])) == 0 )
@@ -0,0 +1,60 @@
+"""Tests for symfile.py: text symbol files and the binary index
+"""
+import pytest
+from symfile import parse_symbols, save_index, load_symbols, MAGIC
+from test_image import run_dasm
+
+SYMBOL_FILE = '''; Monitor entry points
+PRINT = E3B7
+KEYSCAN EQU 0E000H
+GETC: .EQU $E010        ; read a character
+PUTC DEFL #E020
+CLS equ 0xE030
+BEEP EQU &E040
+COUNT EQU 100
+MASK EQU 1F
+OTHER = E3B7
+this is not a symbol
+LD A,(HL)
+'''
+
+EXPECTED = { 0xe3b7 : 'PRINT', 0xe000 : 'KEYSCAN', 0xe010 : 'GETC', 0xe020 : 'PUTC',
+             0xe030 : 'CLS', 0xe040 : 'BEEP', 100 : 'COUNT', 0x1f : 'MASK' }
+
+def test_parse_symbols() :
+    # The first name of an address is kept, a plain EQU number is decimal
+    assert( parse_symbols( SYMBOL_FILE.splitlines() ) == EXPECTED )
+
+@pytest.mark.parametrize( 'line', [ '', '; PRINT = E3B7', 'PRINT = ', '1PRINT = E3B7', 'PRINT = E3B7 junk' ] )
+def test_not_symbols( line ) :
+    assert( parse_symbols([ line ] ) == {} )
+
+def test_index_round_trip( tmp_path ) :
+    text = tmp_path / 'symbols.txt'
+    text.write_text( SYMBOL_FILE )
+    index = str( tmp_path / 'symbols.z80n' )
+    save_index( load_symbols( str( text )), index )
+
+    with open( index, 'rb' ) as fh :
+        assert( fh.read( len( MAGIC )) == MAGIC )
+    assert( load_symbols( index ) == EXPECTED )
+
+    save_index( {}, index )
+    assert( load_symbols( index ) == {} )
+
+def test_bad_index( tmp_path ) :
+    path = tmp_path / 'bad.z80n'
+    path.write_bytes( MAGIC + bytes( 20 ))
+    with pytest.raises( ValueError ) :
+        load_symbols( str( path ))
+
+def test_dasm_names( tmp_path ) :
+    rom = tmp_path / 'rom.bin'
+    rom.write_bytes( bytes.fromhex( 'CDB7E3' 'C300E0' ))
+    symbols = tmp_path / 'symbols.txt'
+    symbols.write_text( SYMBOL_FILE )
+    assert( run_dasm( '-b', str( rom ), '-s', str( symbols )).splitlines() == [
+        '0000 CD B7 E3     :           CALL E3B7  [PRINT]',
+        '0003 C3 00 E0     :           JP E000  [KEYSCAN]',
+        'PRINT = E3B7',
+        'KEYSCAN = E000' ])
@@ -0,0 +1,157 @@
+"""Tests for tablegen.py: the generated op-code tables against a list of
+    known Z80 encodings written out by hand (not from the generator)
+"""
+import pytest
+import tablegen
+from decoder import decode, LENGTHS
+
+# The bytes of an instruction (with its operands), its text and length
+REFERENCE = [
+    # Normal op-codes
+    ( '00', 'NOP', 1 ),
+    ( '013412', 'LD BC,1234', 3 ),
+    ( '02', 'LD (BC),A', 1 ),
+    ( '08', 'EX AF,AF’', 1 ),
+    ( '09', 'ADD HL,BC', 1 ),
+    ( '10FE', 'DJNZ FE', 2 ),
+    ( '1805', 'JR 05', 2 ),
+    ( '3805', 'JR C,05', 2 ),
+    ( '223412', 'LD (1234),HL', 3 ),
+    ( '27', 'DAA', 1 ),
+    ( '2A3412', 'LD HL,(1234)', 3 ),
+    ( '3612', 'LD (HL),12', 2 ),
+    ( '3A3412', 'LD A,(1234)', 3 ),
+    ( '76', 'HALT', 1 ),
+    ( '78', 'LD A,B', 1 ),
+    ( '86', 'ADD A,(HL)', 1 ),
+    ( '8C', 'ADC A,H', 1 ),
+    ( 'A8', 'XOR B', 1 ),
+    ( 'BE', 'CP (HL)', 1 ),
+    ( 'C0', 'RET NZ', 1 ),
+    ( 'C33412', 'JP 1234', 3 ),
+    ( 'C5', 'PUSH BC', 1 ),
+    ( 'C7', 'RST 00', 1 ),
+    ( 'CD3412', 'CALL 1234', 3 ),
+    ( 'D312', 'OUT (12),A', 2 ),
+    ( 'D9', 'EXX', 1 ),
+    ( 'DB12', 'IN A,(12)', 2 ),
+    ( 'E3', 'EX (SP),HL', 1 ),
+    ( 'E9', 'JP (HL)', 1 ),
+    ( 'EB', 'EX DE,HL', 1 ),
+    ( 'F1', 'POP AF', 1 ),
+    ( 'F3', 'DI', 1 ),
+    ( 'F9', 'LD SP,HL', 1 ),
+    ( 'FE12', 'CP 12', 2 ),
+    ( 'FF', 'RST 38', 1 ),
+    # CB: rotates, shifts and bit operations (CB 30-37 SLL is undocumented)
+    ( 'CB07', 'RLC A', 2 ),
+    ( 'CB1E', 'RR (HL)', 2 ),
+    ( 'CB36', 'SLL (HL)', 2 ),
+    ( 'CB3F', 'SRL A', 2 ),
+    ( 'CB7E', 'BIT 7,(HL)', 2 ),
+    ( 'CB80', 'RES 0,B', 2 ),
+    ( 'CBC0', 'SET 0,B', 2 ),
+    # ED
+    ( 'ED4B3412', 'LD BC,(1234)', 4 ),
+    ( 'ED733412', 'LD (1234),SP', 4 ),
+    ( 'ED44', 'NEG', 2 ),
+    ( 'ED45', 'RETN', 2 ),
+    ( 'ED4D', 'RETI', 2 ),
+    ( 'ED46', 'IM 0', 2 ),
+    ( 'ED56', 'IM 1', 2 ),
+    ( 'ED5E', 'IM 2', 2 ),
+    ( 'ED47', 'LD I,A', 2 ),
+    ( 'ED57', 'LD A,I', 2 ),
+    ( 'ED5F', 'LD A,R', 2 ),
+    ( 'ED67', 'RRD', 2 ),
+    ( 'ED6F', 'RLD', 2 ),
+    ( 'ED77', 'NOP', 2 ),
+    ( 'ED4A', 'ADC HL,BC', 2 ),
+    ( 'ED42', 'SBC HL,BC', 2 ),
+    ( 'ED78', 'IN A,(C)', 2 ),
+    ( 'ED79', 'OUT (C),A', 2 ),
+    ( 'ED70', 'IN F,(C)', 2 ),
+    ( 'ED71', 'OUT (C),0', 2 ),
+    ( 'EDA0', 'LDI', 2 ),
+    ( 'EDB0', 'LDIR', 2 ),
+    ( 'EDB1', 'CPIR', 2 ),
+    ( 'EDB3', 'OTIR', 2 ),
+    ( 'EDBB', 'OTDR', 2 ),
+    # DD and FD (IXH, IXL, IYH and IYL are undocumented)
+    ( 'DD213412', 'LD IX,1234', 4 ),
+    ( 'DD09', 'ADD IX,BC', 2 ),
+    ( 'DD29', 'ADD IX,IX', 2 ),
+    ( 'DD7E05', 'LD A,(IX+05)', 3 ),
+    ( 'DD3405', 'INC (IX+05)', 3 ),
+    ( 'DD360580', 'LD (IX+05),80', 4 ),
+    ( 'DD6605', 'LD H,(IX+05)', 3 ),
+    ( 'DD7405', 'LD (IX+05),H', 3 ),
+    ( 'DD8605', 'ADD A,(IX+05)', 3 ),
+    ( 'DD24', 'INC IXH', 2 ),
+    ( 'DD6C', 'LD IXL,IXH', 2 ),
+    ( 'DD2E12', 'LD IXL,12', 3 ),
+    ( 'DDE1', 'POP IX', 2 ),
+    ( 'DDE3', 'EX (SP),IX', 2 ),
+    ( 'DDE5', 'PUSH IX', 2 ),
+    ( 'DDE9', 'JP (IX)', 2 ),
+    ( 'DDF9', 'LD SP,IX', 2 ),
+    ( 'FD213412', 'LD IY,1234', 4 ),
+    ( 'FD09', 'ADD IY,BC', 2 ),
+    ( 'FD6E05', 'LD L,(IY+05)', 3 ),
+    ( 'FD8C', 'ADC A,IYH', 2 ),
+    ( 'FD2A3412', 'LD IY,(1234)', 4 ),
+    ( 'FDE9', 'JP (IY)', 2 ),
+    # DD CB d xx and FD CB d xx. The register forms (the result also copied
+    # to a register) and SLL are undocumented, BIT ignores the register.
+    ( 'DDCB0506', 'RLC (IX+05)', 4 ),
+    ( 'DDCB0500', 'RLC (IX+05),B', 4 ),
+    ( 'DDCB050F', 'RRC (IX+05),A', 4 ),
+    ( 'DDCB0536', 'SLL (IX+05)', 4 ),
+    ( 'DDCB0546', 'BIT 0,(IX+05)', 4 ),
+    ( 'DDCB0547', 'BIT 0,(IX+05)', 4 ),
+    ( 'DDCB057E', 'BIT 7,(IX+05)', 4 ),
+    ( 'DDCB0586', 'RES 0,(IX+05)', 4 ),
+    ( 'DDCB05C7', 'SET 0,(IX+05),A', 4 ),
+    ( 'FDCBFE8E', 'RES 1,(IY+FE)', 4 ),
+    ( 'FDCB0531', 'SLL (IY+05),C', 4 ),
+    ( 'FDCB05FE', 'SET 7,(IY+05)', 4 ),
+]
+
+@pytest.mark.parametrize( 'code, text, length', REFERENCE )
+def test_reference( code, text, length ) :
+    memory = bytes.fromhex( code )
+    instruction = decode( memory, 0 )
+    assert( LENGTHS[ instruction.entry ] == length == len( memory ))
+    # The text without the symbol label
+    assert( instruction.render()[ 2 ].split( '  [' )[ 0 ] == text )
+
+@pytest.mark.parametrize( 'code', [ 'ED00', 'ED3F', 'ED80', 'EDFF', 'DD00', 'FDDD' ] )
+def test_undefined( code ) :
+    with pytest.raises( KeyError ) :
+        decode( bytes.fromhex( code ), 0 )
+
+def test_table_sizes() :
+    # All 256 op-codes of the CB and indexed bit tables, the normal op-codes
+    # apart from the four prefixes
+    tables = tablegen.generate()
+    defined = { name : len([ entry for entry in tables[ name ].values() if entry is not None ])
+                for name in tablegen.TABLE_NAMES }
+    assert( defined[ 'opcode' ] == 252 )
+    assert( defined[ 'cb_opcode' ] == defined[ 'ddcb_opcode' ] == defined[ 'fdcb_opcode' ] == 256 )
+    assert( defined[ 'dd_opcode' ] == defined[ 'fd_opcode' ] )
+
+def test_verify() :
+    tables = tablegen.generate()
+    ( problems, count ) = tablegen.verify( tables )
+    assert( problems == [] )
+    assert( count == sum( len([ entry for entry in table.values() if entry is not None ])
+                          for table in tables.values() ))
+
+def test_saved_tables( tmp_path ) :
+    path = str( tmp_path / 'opcode.tables' )
+    tables = tablegen.generate()
+    tablegen.save( tables, path )
+    assert( tablegen.load( path ) == tables )
+    assert( tablegen.load( tablegen.TABLES_FILE ) == tables )
+    # A missing file is generated again
+    assert( tablegen.load( str( tmp_path / 'missing' )) == tables )